@@ -1,6 +1,16 @@
+import abc
 import io
 import os
-import glob
+import concurrent.futures
+import contextlib
+import functools
+import hashlib
+import platform
+import shutil
+import sqlite3
+import tempfile
+import threading
+import zlib
 import unittest
 import json
 import logging
@@ -26,10 +36,12 @@ except:
   slicer.util.pip_install('pynrrd')
   import nrrd
 
+import itertools
 import math
 import time
 import datetime
 import random
+from collections import OrderedDict, deque
 
 
 #
@@ -118,6 +130,451 @@ class CloseApplicationEventFilter(qt.QWidget):
     return False
 
 
+#
+# Profiler
+#
+
+class _NullSpan:
+  """Context manager that does nothing, returned by Profiler.span() while profiling is disabled."""
+  def __enter__(self):
+    return self
+
+  def __exit__(self, excType, excValue, traceback):
+    return False
+
+
+class _ProfilerSpan:
+  """Context manager that records one complete event in the profiler when it exits."""
+  def __init__(self, profiler, name, args):
+    self.profiler = profiler
+    self.name = name
+    self.args = args
+    self.startTime = 0
+
+  def __enter__(self):
+    self.startTime = time.perf_counter()
+    return self
+
+  def __exit__(self, excType, excValue, traceback):
+    self.profiler.addSpan(self.name, self.startTime, time.perf_counter(), self.args)
+    return False
+
+
+class Profiler:
+  """
+  Records named time spans and counters, and exports them in Chrome trace event format, which can be opened in
+  chrome://tracing or https://ui.perfetto.dev. While disabled, span() returns a shared no-op context manager and
+  count() returns immediately, so instrumented code runs with negligible overhead.
+  """
+
+  CATEGORY = "SegmentationComparison"
+
+  def __init__(self):
+    self.enabled = False
+    self.events = []  # Chrome trace events. list.append is atomic, so spans can be recorded from worker threads.
+    self.counters = {}
+    self.originTime = time.perf_counter()
+    self.nullSpan = _NullSpan()
+
+  def setEnabled(self, enabled):
+    self.enabled = enabled
+
+  def clear(self):
+    self.events = []
+    self.counters = {}
+    self.originTime = time.perf_counter()
+
+  def span(self, name, **args):
+    """
+    Returns a context manager that records the time spent in its block.
+    :param name: name of the stage
+    :param args: optional values shown with the span in the trace viewer
+    """
+    if not self.enabled:
+      return self.nullSpan
+    return _ProfilerSpan(self, name, args)
+
+  def profiled(self, function):
+    """
+    Decorator that records each call of a function as a span named after the function.
+    """
+    name = function.__qualname__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+      if not self.enabled:
+        return function(*args, **kwargs)
+      with _ProfilerSpan(self, name, {}):
+        return function(*args, **kwargs)
+
+    return wrapper
+
+  def addSpan(self, name, startTime, endTime, args):
+    self.events.append({
+      "name": name,
+      "cat": self.CATEGORY,
+      "ph": "X",
+      "ts": (startTime - self.originTime) * 1e6,
+      "dur": (endTime - startTime) * 1e6,
+      "pid": os.getpid(),
+      "tid": threading.get_ident(),
+      "args": args,
+    })
+
+  def count(self, name, value=1):
+    """
+    Adds a value to a named counter. The running total is recorded as a counter event.
+    """
+    if not self.enabled:
+      return
+    total = self.counters.get(name, 0) + value
+    self.counters[name] = total
+    self.events.append({
+      "name": name,
+      "cat": self.CATEGORY,
+      "ph": "C",
+      "ts": (time.perf_counter() - self.originTime) * 1e6,
+      "pid": os.getpid(),
+      "tid": threading.get_ident(),
+      "args": {name: total},
+    })
+
+  def getSummary(self):
+    """
+    Returns the number of calls and the total and maximum time in seconds for each span name, and counter totals.
+    """
+    spans = {}
+    for event in list(self.events):
+      if event["ph"] != "X":
+        continue
+      summary = spans.setdefault(event["name"], {"count": 0, "totalSeconds": 0.0, "maxSeconds": 0.0})
+      summary["count"] += 1
+      summary["totalSeconds"] += event["dur"] / 1e6
+      summary["maxSeconds"] = max(summary["maxSeconds"], event["dur"] / 1e6)
+    return {"spans": spans, "counters": dict(self.counters)}
+
+  def exportChromeTrace(self, path):
+    """
+    Writes recorded events to a JSON file in Chrome trace event format. The summary is included as metadata.
+    :param path: output file path
+    :returns: None
+    """
+    trace = {
+      "traceEvents": list(self.events),
+      "displayTimeUnit": "ms",
+      "otherData": self.getSummary(),
+    }
+    with open(path, "w") as f:
+      json.dump(trace, f)
+
+
+profiler = Profiler()
+
+
+#
+# Rating engines
+#
+
+class RatingEngine(abc.ABC):
+  """
+  Interface of the rating systems used to rank AI models. An engine keeps its state in columns of the survey dataframe,
+  one row per model, so ratings are saved and resumed with the Elo scores csv file.
+  Comparisons are given as row indices of the two models and the score of the left model (1 win, 0.5 tie, 0 loss).
+  """
+
+  COLUMNS = {}  # Column name: initial value
+
+  def initializeColumns(self, surveyDF):
+    """
+    Adds the columns of this engine that are missing from the survey dataframe, e.g. when it was read from an older
+    csv file, and sets them to their initial values.
+    :param surveyDF: survey dataframe, modified in place
+    :returns: None
+    """
+    for columnName, initialValue in self.COLUMNS.items():
+      if columnName not in surveyDF.columns:
+        surveyDF[columnName] = float(initialValue)
+
+  def updateComparison(self, surveyDF, leftIdx, rightIdx, leftScore):
+    """
+    Updates ratings after a single comparison.
+    :param surveyDF: survey dataframe, modified in place
+    :returns: None
+    """
+    self.updateRatingPeriod(surveyDF, np.array([leftIdx]), np.array([rightIdx]), np.array([leftScore], dtype=float),
+                            updateInactive=False)
+
+  @abc.abstractmethod
+  def updateRatingPeriod(self, surveyDF, leftIndices, rightIndices, leftScores, updateInactive=True):
+    """
+    Updates ratings from all comparisons of a rating period at once. Ratings used for expected scores are the ones at
+    the start of the period, so the order of comparisons within a period does not matter.
+    :param surveyDF: survey dataframe, modified in place
+    :param leftIndices: numpy array of row indices of left models
+    :param rightIndices: numpy array of row indices of right models
+    :param leftScores: numpy array of left model scores
+    :param updateInactive: whether models that did not play in the period are updated too
+    :returns: None
+    """
+
+
+class EloRatingEngine(RatingEngine):
+  """Elo rating with a fixed K factor."""
+
+  def __init__(self, k=32, initialRating=1000):
+    self.k = k
+    self.COLUMNS = {"Elo": initialRating}
+
+  def updateRatingPeriod(self, surveyDF, leftIndices, rightIndices, leftScores, updateInactive=True):
+    elo = surveyDF["Elo"].to_numpy(dtype=float)
+    leftExpected = 1 / (1 + 10 ** ((elo[rightIndices] - elo[leftIndices]) / 400))
+    change = np.zeros(len(elo))
+    np.add.at(change, leftIndices, self.k * (leftScores - leftExpected))
+    np.add.at(change, rightIndices, -self.k * (leftScores - leftExpected))
+    surveyDF["Elo"] = elo + change
+
+
+class Glicko2RatingEngine(RatingEngine):
+  """
+  Glicko-2 rating (Glickman, "Example of the Glicko-2 system", 2013), vectorized over all models of a rating period.
+  Ratings are on the Elo scale and start at the same value as Elo. The rating deviation (RD) is the uncertainty of the
+  rating, it shrinks as a model plays and grows between rating periods it does not play in. The volatility is the
+  expected fluctuation of the rating.
+  """
+
+  SCALE = 400 / math.log(10)  # 173.7178, from Elo scale to Glicko-2 scale
+  INITIAL_RD = 350
+  INITIAL_VOLATILITY = 0.06
+  TAU = 0.5  # Constrains volatility changes
+  CONVERGENCE_TOLERANCE = 1e-6
+  MAX_ITERATIONS = 100
+
+  def __init__(self, initialRating=1000):
+    self.initialRating = initialRating
+    self.COLUMNS = {"Glicko": initialRating, "GlickoRD": self.INITIAL_RD, "GlickoVolatility": self.INITIAL_VOLATILITY}
+
+  def updateRatingPeriod(self, surveyDF, leftIndices, rightIndices, leftScores, updateInactive=True):
+    mu = (surveyDF["Glicko"].to_numpy(dtype=float) - self.initialRating) / self.SCALE
+    phi = surveyDF["GlickoRD"].to_numpy(dtype=float) / self.SCALE
+    sigma = surveyDF["GlickoVolatility"].to_numpy(dtype=float)
+    numberOfModels = len(mu)
+
+    # Each comparison is a game for both models
+    players = np.concatenate([leftIndices, rightIndices])
+    opponents = np.concatenate([rightIndices, leftIndices])
+    scores = np.concatenate([leftScores, 1.0 - leftScores])
+
+    g = 1 / np.sqrt(1 + 3 * phi[opponents] ** 2 / math.pi ** 2)
+    expected = 1 / (1 + np.exp(-g * (mu[players] - mu[opponents])))
+    informationSum = np.bincount(players, weights=g ** 2 * expected * (1 - expected), minlength=numberOfModels)
+    scoreSum = np.bincount(players, weights=g * (scores - expected), minlength=numberOfModels)
+    active = informationSum > 0
+
+    newMu = mu.copy()
+    newPhi = np.sqrt(phi ** 2 + sigma ** 2) if updateInactive else phi.copy()
+    newSigma = sigma.copy()
+    if np.any(active):
+      v = 1 / informationSum[active]
+      delta = v * scoreSum[active]
+      newSigma[active] = self.getNewVolatility(sigma[active], phi[active], v, delta)
+      phiStar = np.sqrt(phi[active] ** 2 + newSigma[active] ** 2)
+      newPhi[active] = 1 / np.sqrt(1 / phiStar ** 2 + 1 / v)
+      newMu[active] = mu[active] + newPhi[active] ** 2 * scoreSum[active]
+
+    surveyDF["Glicko"] = newMu * self.SCALE + self.initialRating
+    surveyDF["GlickoRD"] = np.minimum(newPhi * self.SCALE, self.INITIAL_RD)
+    surveyDF["GlickoVolatility"] = newSigma
+
+  def getNewVolatility(self, sigma, phi, v, delta):
+    """
+    Finds the new volatility of each model with the Illinois algorithm (step 5 of Glickman's example), iterating all
+    models together until all have converged.
+    :returns: numpy array of new volatilities
+    """
+    a = np.log(sigma ** 2)
+
+    def f(x):
+      ex = np.exp(x)
+      return ex * (delta ** 2 - phi ** 2 - v - ex) / (2 * (phi ** 2 + v + ex) ** 2) - (x - a) / self.TAU ** 2
+
+    A = a.copy()
+    B = np.empty_like(a)
+    large = delta ** 2 > phi ** 2 + v
+    B[large] = np.log(delta[large] ** 2 - phi[large] ** 2 - v[large])
+    k = np.ones_like(a)
+    searching = ~large & (f(a - self.TAU) < 0)
+    while np.any(searching) and k.max() < self.MAX_ITERATIONS:
+      k[searching] += 1
+      searching &= f(a - k * self.TAU) < 0
+    B[~large] = a[~large] - k[~large] * self.TAU
+
+    fA = f(A)
+    fB = f(B)
+    for iteration in range(self.MAX_ITERATIONS):
+      iterating = np.abs(B - A) > self.CONVERGENCE_TOLERANCE
+      if not np.any(iterating):
+        break
+      C = A + (A - B) * fA / (fB - fA)
+      fC = f(C)
+      swap = iterating & (fC * fB <= 0)
+      halve = iterating & ~swap
+      A = np.where(swap, B, A)
+      fA = np.where(swap, fB, np.where(halve, fA / 2, fA))
+      B = np.where(iterating, C, B)
+      fB = np.where(iterating, fC, fB)
+    return np.exp(A / 2)
+
+
+class StudyCoordinator:
+  """
+  Shares one study between raters working in separate Slicer instances, through an SQLite database file. The database
+  holds the ratings of all models, the comparisons of all raters, and leases of the pairs currently shown to a rater,
+  so other raters are not given the same pairs. Every operation is one short transaction that takes the write lock
+  up front (BEGIN IMMEDIATE), so concurrent raters wait for each other instead of failing when a read turns into a
+  write. Volumes are never loaded while a transaction is open.
+  """
+
+  JOURNAL_MODE = "WAL"  # Readers do not block the writer. All instances must run on the same machine.
+  LOCK_TIMEOUT = 30  # Seconds to wait for the transaction of another rater
+  LEASE_DURATION = 900  # Seconds after which a pair that was not answered can be handed out again
+
+  def __init__(self, path, raterId):
+    """
+    Opens or creates a shared study database.
+    :param path: database file
+    :param raterId: name of this rater, unique among the instances sharing the database
+    """
+    self.path = path
+    self.raterId = raterId
+    self.connection = sqlite3.connect(path, timeout=self.LOCK_TIMEOUT, isolation_level=None)  # Explicit transactions
+    self.connection.execute(f"PRAGMA journal_mode={self.JOURNAL_MODE}")
+    self.connection.execute("PRAGMA synchronous=NORMAL")
+    with self.transaction():
+      self.connection.execute("CREATE TABLE IF NOT EXISTS models (ModelName TEXT PRIMARY KEY, GamesPlayed INTEGER, "
+                              "TimeLastPlayed TEXT, Ratings TEXT)")
+      self.connection.execute("CREATE TABLE IF NOT EXISTS comparisons (Comparison INTEGER PRIMARY KEY AUTOINCREMENT, "
+                              "Rater TEXT, ScanName TEXT, LeftModel TEXT, RightModel TEXT, LeftScore REAL, "
+                              "RecordedTime REAL, Rated INTEGER)")
+      self.connection.execute("CREATE TABLE IF NOT EXISTS leases (ScanName TEXT, ModelA TEXT, ModelB TEXT, Rater TEXT, "
+                              "Expires REAL, PRIMARY KEY (ScanName, ModelA, ModelB))")
+
+  @contextlib.contextmanager
+  def transaction(self):
+    """
+    Holds the write lock of the database until the block ends. Changes are committed at the end of the block, or
+    rolled back if it raises an exception. Methods that write use their own transaction, except writeResults.
+    """
+    self.connection.execute("BEGIN IMMEDIATE")
+    try:
+      yield self.connection
+    except BaseException:
+      self.connection.execute("ROLLBACK")
+      raise
+    self.connection.execute("COMMIT")
+
+  def initializeModels(self, surveyDF, ratingColumns, history=()):
+    """
+    Adds the models that are not in the database yet, with the ratings of a survey dataframe. The first rater opening
+    the study sets the initial state, including the comparisons the ratings were computed from, and later raters
+    continue from the shared state.
+    :param surveyDF: survey dataframe
+    :param ratingColumns: names of the columns kept by the rating engines
+    :param history: list of (scanName, leftModel, rightModel, leftScore) already counted in surveyDF, e.g. of a resumed
+      session. Only added to a new study, as already rated comparisons.
+    :returns: None
+    """
+    with self.transaction():
+      isNewStudy = self.connection.execute("SELECT COUNT(*) FROM models").fetchone()[0] == 0
+      if isNewStudy:
+        now = time.time()
+        self.connection.executemany("INSERT INTO comparisons (Rater, ScanName, LeftModel, RightModel, LeftScore, RecordedTime, Rated) "
+                                    "VALUES (?, ?, ?, ?, ?, ?, 1)",
+                                    [(self.raterId, scanName, leftModel, rightModel, leftScore, now)
+                                     for scanName, leftModel, rightModel, leftScore in history])
+      self.connection.executemany(
+        "INSERT OR IGNORE INTO models (ModelName, GamesPlayed, TimeLastPlayed, Ratings) VALUES (?, ?, ?, ?)",
+        self.getModelRows(surveyDF, ratingColumns))
+
+  @staticmethod
+  def getModelRows(surveyDF, ratingColumns):
+    rows = []
+    for _, row in surveyDF.iterrows():
+      timeLastPlayed = None if pd.isnull(row["TimeLastPlayed"]) else str(row["TimeLastPlayed"])
+      ratings = json.dumps({column: float(row[column]) for column in ratingColumns})
+      rows.append((row["ModelName"], int(row["GamesPlayed"]), timeLastPlayed, ratings))
+    return rows
+
+  def readState(self):
+    """
+    Reads the shared state of the study.
+    :returns: dict with "models" dict[modelName] = dict of GamesPlayed, TimeLastPlayed and Ratings, "pairCounts" list of
+      (scanName, leftModel, rightModel, count), "pending" list of (leftModel, rightModel, leftScore) not rated by
+      Glicko-2 yet, and "leases" list of (scanName, modelA, modelB) shown to other raters
+    """
+    models = {}
+    for modelName, gamesPlayed, timeLastPlayed, ratings in self.connection.execute(
+        "SELECT ModelName, GamesPlayed, TimeLastPlayed, Ratings FROM models"):
+      models[modelName] = {"GamesPlayed": gamesPlayed, "TimeLastPlayed": timeLastPlayed, "Ratings": json.loads(ratings)}
+    pairCounts = self.connection.execute("SELECT ScanName, LeftModel, RightModel, COUNT(*) FROM comparisons "
+                                         "GROUP BY ScanName, LeftModel, RightModel").fetchall()
+    pending = self.connection.execute("SELECT LeftModel, RightModel, LeftScore FROM comparisons WHERE Rated = 0 "
+                                      "ORDER BY Comparison").fetchall()
+    leases = self.connection.execute("SELECT ScanName, ModelA, ModelB FROM leases WHERE Rater != ? AND Expires > ?",
+                                     (self.raterId, time.time())).fetchall()
+    return {"models": models, "pairCounts": pairCounts, "pending": pending, "leases": leases}
+
+  def leaseScreen(self, nextPair):
+    """
+    Leases all pairs of models of a screen to this rater, unless another rater has a lease on one of them.
+    Leases of the previous screen of this rater and expired leases are released.
+    :param nextPair: list[scanName, modelName1, modelName2, ...]
+    :returns: True if the pairs were leased
+    """
+    scanName = nextPair[0]
+    pairs = [tuple(sorted(pair)) for pair in itertools.combinations(nextPair[1:], 2)]
+    now = time.time()
+    with self.transaction():
+      self.connection.execute("DELETE FROM leases WHERE Rater = ? OR Expires <= ?", (self.raterId, now))
+      for modelA, modelB in pairs:
+        if self.connection.execute("SELECT 1 FROM leases WHERE ScanName = ? AND ModelA = ? AND ModelB = ?",
+                                   (scanName, modelA, modelB)).fetchone():
+          return False  # Released leases stay released
+      self.connection.executemany("INSERT INTO leases (ScanName, ModelA, ModelB, Rater, Expires) VALUES (?, ?, ?, ?, ?)",
+                                  [(scanName, modelA, modelB, self.raterId, now + self.LEASE_DURATION) for modelA, modelB in pairs])
+    return True
+
+  def writeResults(self, surveyDF, ratingColumns, scanName, outcomes, periodClosed):
+    """
+    Writes the ratings after a screen, the outcomes of the screen, and releases the leases of this rater.
+    Must be called in a transaction that also read the state the ratings were updated from.
+    :param surveyDF: survey dataframe with updated ratings
+    :param ratingColumns: names of the columns kept by the rating engines
+    :param scanName: patient_sequence name of the screen
+    :param outcomes: list of (leftModel, rightModel, leftScore)
+    :param periodClosed: whether the Glicko-2 rating period was closed, so all comparisons are rated
+    :returns: None
+    """
+    self.connection.executemany("UPDATE models SET GamesPlayed = ?, TimeLastPlayed = ?, Ratings = ? WHERE ModelName = ?",
+                                [(gamesPlayed, timeLastPlayed, ratings, modelName) for modelName, gamesPlayed, timeLastPlayed, ratings
+                                 in self.getModelRows(surveyDF, ratingColumns)])
+    if periodClosed:
+      self.connection.execute("UPDATE comparisons SET Rated = 1 WHERE Rated = 0")
+    now = time.time()
+    self.connection.executemany("INSERT INTO comparisons (Rater, ScanName, LeftModel, RightModel, LeftScore, RecordedTime, Rated) "
+                                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                [(self.raterId, scanName, leftModel, rightModel, leftScore, now, int(periodClosed))
+                                 for leftModel, rightModel, leftScore in outcomes])
+    self.connection.execute("DELETE FROM leases WHERE Rater = ?", (self.raterId,))
+
+  def close(self):
+    """
+    Releases the leases of this rater, so other raters can be given those pairs right away, and closes the database.
+    """
+    with self.transaction():
+      self.connection.execute("DELETE FROM leases WHERE Rater = ?", (self.raterId,))
+    self.connection.close()
+
+
 #
 # SegmentationComparisonWidget
 #
@@ -137,8 +594,14 @@ class SegmentationComparisonWidget(ScriptedLoadableModuleWidget, VTKObservationM
 
   LAYOUT_DUAL_3D = 876
   LAYOUT_DUAL_MULTIPLE_2D = 877
+  LAYOUT_TRIPLE_3D = 878
+  LAYOUT_TRIPLE_MULTIPLE_2D = 879
+  LAYOUT_QUAD_3D = 880
+  LAYOUT_QUAD_MULTIPLE_2D = 881
 
   THRESHOLD_SLIDER_RESOLUTION = 300  # Must be positive integer
+  MEMORY_USAGE_UPDATE_INTERVAL_MS = 2000
+  SCHEDULE_BUDGET_DEFAULT = 300  # Comparisons per rater suggested when generating a schedule
 
   def __init__(self, parent=None):
     """
@@ -156,12 +619,21 @@ class SegmentationComparisonWidget(ScriptedLoadableModuleWidget, VTKObservationM
     self.eloHistoryTable = None
     self.lastLeftForegroundOpacity = 0
     self.lastRightForegroundOpacity = 0
+    self.rankingStableNotified = False  # Whether the rater was told in this session that the ranking is stable
 
     # Shortcuts
     self.shortcutD = qt.QShortcut(slicer.util.mainWindow())
     self.shortcutD.setKey(qt.QKeySequence("d"))
     self.shortcutF = qt.QShortcut(slicer.util.mainWindow())
     self.shortcutF.setKey(qt.QKeySequence("f"))
+    self.shortcutL = qt.QShortcut(slicer.util.mainWindow())
+    self.shortcutL.setKey(qt.QKeySequence("l"))
+    self.shortcutG = qt.QShortcut(slicer.util.mainWindow())
+    self.shortcutG.setKey(qt.QKeySequence("g"))
+    self.shortcutUndo = qt.QShortcut(slicer.util.mainWindow())
+    self.shortcutUndo.setKey(qt.QKeySequence("u"))
+    self.shortcutRedo = qt.QShortcut(slicer.util.mainWindow())
+    self.shortcutRedo.setKey(qt.QKeySequence("Shift+U"))
 
   def setup(self):
     """
@@ -246,6 +718,7 @@ class SegmentationComparisonWidget(ScriptedLoadableModuleWidget, VTKObservationM
     self.ui.inputTypeButtonGroup.connect("buttonClicked(QAbstractButton*)", self.onInputTypeChanged)
     self.ui.csvPathSelector.connect("currentPathChanged(const QString)", self.onCSVPathChanged)
     self.ui.clearCSVPathButton.connect("clicked()", self.onClearButtonPressed)
+    self.ui.generateScheduleButton.connect("clicked()", self.onGenerateScheduleClicked)
     self.ui.inputDirectorySelector.connect("directoryChanged(const QString)", self.onInputVolumeDirectorySelected)
     inputPushButton = self.ui.inputDirectorySelector.findChild("QPushButton")
     inputPushButton.setIconSize(qt.QSize(self.ICON_SIZE_MID, self.ICON_SIZE_MID))
@@ -258,6 +731,10 @@ class SegmentationComparisonWidget(ScriptedLoadableModuleWidget, VTKObservationM
 
     self.ui.toggleContourButton.connect("clicked()", self.onContourToggled)
     self.ui.toggleOverlayPushButton.connect("clicked()", self.onOverlayToggled)
+    self.ui.showDifferenceButton.connect("toggled(bool)", self.onShowDifferenceToggled)
+    self.ui.playCineButton.connect("toggled(bool)", self.onPlayCineToggled)
+    self.ui.cineFrameRateSpinBox.connect("valueChanged(int)", self.onCineFrameRateChanged)
+    self.ui.cancelLoadingButton.connect("clicked()", self.onCancelLoadingClicked)
     self.ui.resetCameraButton.connect('clicked()', self.onResetCameraButton)
     self.ui.resetCameraButton.setIconSize(qt.QSize(self.ICON_SIZE_MID, self.ICON_SIZE_MID))
     self.ui.leftBetterButton.connect('clicked()', self.onLeftBetterClicked)
@@ -267,6 +744,9 @@ class SegmentationComparisonWidget(ScriptedLoadableModuleWidget, VTKObservationM
     self.ui.rightBetterButton.setIconSize(qt.QSize(int(self.ICON_SIZE * 1.5), self.ICON_SIZE))
     self.ui.rightBetterButton.setText("")
     self.ui.equalButton.connect('clicked()', self.onEqualClicked)
+    self.ui.submitRankingButton.connect('clicked()', self.onSubmitRankingClicked)
+    self.ui.undoButton.connect('clicked()', self.onUndoClicked)
+    self.ui.redoButton.connect('clicked()', self.onRedoClicked)
     self.ui.equalButton.setIconSize(qt.QSize(self.ICON_SIZE, self.ICON_SIZE))
     self.ui.equalButton.setText("")
     self.ui.saveButton.connect('clicked()', self.onSaveButton)
@@ -299,13 +779,53 @@ class SegmentationComparisonWidget(ScriptedLoadableModuleWidget, VTKObservationM
 
     self.ui.matchingToleranceSpinBox.connect("valueChanged(int)", self.onMatchingToleranceValueChanged)
 
+    for scheduler, schedulerText in self.logic.PAIR_SCHEDULERS:
+      self.ui.pairSchedulerComboBox.addItem(schedulerText, scheduler)
+    self.ui.pairSchedulerComboBox.connect("currentIndexChanged(int)", self.onPairSchedulerChanged)
+    self.ui.ratingPeriodSpinBox.connect("valueChanged(int)", self.onRatingPeriodValueChanged)
+    self.ui.modelsPerScreenSpinBox.connect("valueChanged(int)", self.onModelsPerScreenValueChanged)
+    self.ui.convergenceThresholdSpinBox.connect("valueChanged(double)", self.onConvergenceThresholdValueChanged)
+    self.ui.autoEndSessionCheckBox.connect("toggled(bool)", self.onAutoEndSessionToggled)
+    self.ui.nearDuplicateDiceSpinBox.connect("valueChanged(double)", self.onNearDuplicateDiceValueChanged)
+
+    pairSimilarity = slicer.util.settingsValue(self.logic.PAIR_SIMILARITY_SETTING, self.logic.PAIR_SIMILARITY_DEFAULT, converter=slicer.util.toBool)
+    self.ui.pairSimilarityCheckBox.checked = pairSimilarity
+    self.ui.pairSimilarityCheckBox.connect("stateChanged(int)", self.onPairSimilarityChecked)
+    self.ui.exportSimilarityButton.connect("clicked()", self.onExportSimilarityClicked)
+
     fov = slicer.util.settingsValue(self.logic.CAMERA_FOV_SETTING, self.logic.CAMERA_FOV_DEFAULT, converter=int)
     self.ui.fovSpinBox.value = fov
     self.ui.fovSpinBox.connect("valueChanged(int)", self.onFovValueChanged)
 
     self.ui.flip2DPushButton.connect("toggled(bool)", self.onFlip2DClicked)
+
+    snapshotMode = slicer.util.settingsValue(self.logic.SNAPSHOT_MODE_SETTING, self.logic.SNAPSHOT_MODE_DEFAULT, converter=slicer.util.toBool)
+    self.ui.snapshotModeCheckBox.checked = snapshotMode
+    self.ui.snapshotModeCheckBox.connect("stateChanged(int)", self.onSnapshotModeChecked)
+
+    progressiveDisplay = slicer.util.settingsValue(self.logic.PROGRESSIVE_DISPLAY_SETTING, self.logic.PROGRESSIVE_DISPLAY_DEFAULT, converter=slicer.util.toBool)
+    self.ui.progressiveDisplayCheckBox.checked = progressiveDisplay
+    self.ui.progressiveDisplayCheckBox.connect("stateChanged(int)", self.onProgressiveDisplayChecked)
+
+    frameContours = slicer.util.settingsValue(self.logic.FRAME_CONTOURS_SETTING, self.logic.FRAME_CONTOURS_DEFAULT, converter=slicer.util.toBool)
+    self.ui.frameContoursCheckBox.checked = frameContours
+    self.ui.frameContoursCheckBox.connect("stateChanged(int)", self.onFrameContoursChecked)
+
+    transcodeCache = slicer.util.settingsValue(self.logic.TRANSCODE_CACHE_SETTING, self.logic.TRANSCODE_CACHE_DEFAULT, converter=slicer.util.toBool)
+    self.ui.transcodeCacheCheckBox.checked = transcodeCache
+    self.ui.transcodeCacheCheckBox.connect("stateChanged(int)", self.onTranscodeCacheChecked)
+
+    self.ui.profilingCheckBox.checked = profiler.enabled
+    self.ui.profilingCheckBox.connect("toggled(bool)", self.onProfilingToggled)
+    self.ui.exportProfileButton.connect("clicked()", self.onExportProfileClicked)
+
+    self.ui.aggregateSessionsButton.connect("clicked()", self.onAggregateSessionsClicked)
     self.ui.resetSettingsButton.connect("clicked()", self.onResetSettingsClicked)
 
+    self.memoryUsageTimer = qt.QTimer()
+    self.memoryUsageTimer.setInterval(self.MEMORY_USAGE_UPDATE_INTERVAL_MS)
+    self.memoryUsageTimer.connect("timeout()", self.updateMemoryUsageLabel)
+
     # Make sure parameter node is initialized (needed for module reload)
     self.initializeParameterNode()
 
@@ -372,17 +892,181 @@ class SegmentationComparisonWidget(ScriptedLoadableModuleWidget, VTKObservationM
     layoutSwitchAction.setIcon(qt.QIcon(':Icons/Go.png'))
     layoutSwitchAction.setToolTip('Dual 2D comparison')
 
+    # Layouts of ranking screens, with 3 views in a row or 4 views in a grid
+    viewColors = ["#F34A33", "#6EB14B", "#EDD54C", "#6E80C9"]
+    for viewClass, layouts in [("vtkMRMLViewNode", {3: self.LAYOUT_TRIPLE_3D, 4: self.LAYOUT_QUAD_3D}),
+                               ("vtkMRMLSliceNode", {3: self.LAYOUT_TRIPLE_MULTIPLE_2D, 4: self.LAYOUT_QUAD_MULTIPLE_2D})]:
+      for viewCount, layoutId in layouts.items():
+        views = []
+        for viewIndex in range(viewCount):
+          viewTag = str(viewIndex + 1)
+          properties = f'<property name="viewlabel" action="default">{viewTag}</property>'
+          if viewClass == "vtkMRMLSliceNode":
+            properties += '<property name="orientation" action="default">Axial</property>'
+            properties += f'<property name="viewcolor" action="default">{viewColors[viewIndex]}</property>'
+          views.append(f'<item><view class="{viewClass}" singletontag="{viewTag}">{properties}</view></item>')
+        if viewCount == 3:
+          gridLayout = f'<layout type="horizontal">{"".join(views)}</layout>'
+        else:
+          gridLayout = (f'<layout type="vertical"><item><layout type="horizontal">{"".join(views[:2])}</layout></item>'
+                        f'<item><layout type="horizontal">{"".join(views[2:])}</layout></item></layout>')
+        if not layoutLogic.GetLayoutNode().SetLayoutDescription(layoutId, gridLayout):
+          layoutLogic.GetLayoutNode().AddLayoutDescription(layoutId, gridLayout)
+
+  def updateLayout(self):
+    """
+    Sets the layout for the input type and for the number of models on the current screen, and shows the survey
+    controls for comparing a pair or ranking more models.
+    """
+    nextPair = self.logic.getNextPair()
+    modelCount = len(nextPair) - 1 if nextPair else 2
+    if self._parameterNode.GetParameter(self.logic.INPUT_TYPE) == "3D":
+      layoutId = {2: self.LAYOUT_DUAL_3D, 3: self.LAYOUT_TRIPLE_3D, 4: self.LAYOUT_QUAD_3D}[modelCount]
+      slicer.app.layoutManager().setLayout(layoutId)  # Setting this layout creates all views automatically
+      for viewIndex in range(modelCount):
+        viewNode = slicer.mrmlScene.GetSingletonNode(str(viewIndex + 1), "vtkMRMLViewNode")
+        viewNode.SetOrientationMarkerType(viewNode.OrientationMarkerTypeHuman)
+        viewNode.SetOrientationMarkerSize(viewNode.OrientationMarkerSizeSmall)
+    else:
+      layoutId = {2: self.LAYOUT_DUAL_MULTIPLE_2D, 3: self.LAYOUT_TRIPLE_MULTIPLE_2D, 4: self.LAYOUT_QUAD_MULTIPLE_2D}[modelCount]
+      slicer.app.layoutManager().setLayout(layoutId)
+      self.addSliceNodeObservers()  # Views of ranking screens are observed too
+
+    rankingScreen = modelCount > 2
+    self.ui.leftBetterButton.visible = not rankingScreen
+    self.ui.equalButton.visible = not rankingScreen
+    self.ui.rightBetterButton.visible = not rankingScreen
+    self.ui.rankingWidget.visible = rankingScreen
+    if rankingScreen:
+      self.ui.surveyMessage.text = "Rank the views from best (1) to worst. Equal ranks are ties."
+    else:
+      self.ui.surveyMessage.text = "Which volume looks better?"
+    for viewIndex, rankSpinBox in enumerate(self.getRankSpinBoxes()):
+      rankSpinBox.visible = viewIndex < modelCount
+      rankSpinBox.maximum = modelCount
+      rankSpinBox.value = 1
+
+  def getRankSpinBoxes(self):
+    return [self.ui.rankSpinBox1, self.ui.rankSpinBox2, self.ui.rankSpinBox3, self.ui.rankSpinBox4]
+
   def onResetSettingsClicked(self):
     logging.info("onResetSettingsClicked()")
     self.ui.displayIdCheckBox.checked = self.logic.SHOW_IDS_DEFAULT
     self.ui.fovSpinBox.value = self.logic.CAMERA_FOV_DEFAULT
+    self.ui.snapshotModeCheckBox.checked = self.logic.SNAPSHOT_MODE_DEFAULT
+    self.ui.progressiveDisplayCheckBox.checked = self.logic.PROGRESSIVE_DISPLAY_DEFAULT
+    self.ui.frameContoursCheckBox.checked = self.logic.FRAME_CONTOURS_DEFAULT
+    self.ui.transcodeCacheCheckBox.checked = self.logic.TRANSCODE_CACHE_DEFAULT
+    self.ui.pairSimilarityCheckBox.checked = self.logic.PAIR_SIMILARITY_DEFAULT
 
   def onFovValueChanged(self, value):
     logging.info("onFovValueChanged({})".format(value))
     settings = slicer.app.userSettings()
     settings.setValue(self.logic.CAMERA_FOV_SETTING, str(value))
+    self.logic.invalidateSnapshots()  # Snapshots were rendered from the previous camera distance
     self.logic.prepareDisplay(self.ui.leftThresholdSlider.value, self.ui.rightThresholdSlider.value)
 
+  def onSnapshotModeChecked(self, checked):
+    logging.info("onSnapshotModeChecked({})".format(checked))
+    settings = slicer.app.userSettings()
+    if checked != 0:
+      settings.setValue(self.logic.SNAPSHOT_MODE_SETTING, "true")
+      self.logic.scheduleSnapshots()
+    else:
+      settings.setValue(self.logic.SNAPSHOT_MODE_SETTING, "false")
+      self.logic.invalidateSnapshots()
+
+  def onProgressiveDisplayChecked(self, checked):
+    logging.info("onProgressiveDisplayChecked({})".format(checked))
+    settings = slicer.app.userSettings()
+    settings.setValue(self.logic.PROGRESSIVE_DISPLAY_SETTING, "true" if checked != 0 else "false")
+    if checked == 0:
+      self.logic.releaseVolumePyramids()
+
+  def onFrameContoursChecked(self, checked):
+    logging.info("onFrameContoursChecked({})".format(checked))
+    settings = slicer.app.userSettings()
+    settings.setValue(self.logic.FRAME_CONTOURS_SETTING, "true" if checked != 0 else "false")
+
+  def onTranscodeCacheChecked(self, checked):
+    logging.info("onTranscodeCacheChecked({})".format(checked))
+    settings = slicer.app.userSettings()
+    settings.setValue(self.logic.TRANSCODE_CACHE_SETTING, "true" if checked != 0 else "false")
+
+  def onPairSimilarityChecked(self, checked):
+    logging.info("onPairSimilarityChecked({})".format(checked))
+    settings = slicer.app.userSettings()
+    settings.setValue(self.logic.PAIR_SIMILARITY_SETTING, "true" if checked != 0 else "false")
+
+  def onExportSimilarityClicked(self):
+    logging.info("onExportSimilarityClicked()")
+    if not self.logic.volumeEntries:
+      slicer.util.errorDisplay("Load data before exporting pair similarity.")
+      return
+    try:
+      qt.QApplication.setOverrideCursor(qt.Qt.WaitCursor)
+      similarityPath = self.logic.saveSimilarity(self.ui.outputDirectorySelector.directory)
+      qt.QApplication.restoreOverrideCursor()
+      slicer.util.infoDisplay(f"Pair similarity saved to: {similarityPath}")
+    except Exception as e:
+      qt.QApplication.restoreOverrideCursor()
+      slicer.util.errorDisplay(f"Pair similarity could not be saved: {str(e)}")
+
+  def onProfilingToggled(self, toggled):
+    logging.info("onProfilingToggled({})".format(toggled))
+    self.logic.setProfilingEnabled(toggled)
+
+  def onExportProfileClicked(self):
+    logging.info("onExportProfileClicked()")
+    defaultPath = os.path.join(self.ui.outputDirectorySelector.directory, "profile_" + time.strftime("%Y%m%d-%H%M%S") + ".json")
+    path = qt.QFileDialog.getSaveFileName(slicer.util.mainWindow(), "Export profiling trace", defaultPath, "Chrome trace (*.json)")
+    if not path:
+      return
+    try:
+      profiler.exportChromeTrace(path)
+      logging.info(f"Profiling trace saved to: {path}")
+    except Exception as e:
+      slicer.util.errorDisplay(f"Profiling trace could not be saved: {str(e)}")
+
+  def formatBytes(self, numberOfBytes):
+    for unit in ["B", "KB", "MB"]:
+      if numberOfBytes < 1024:
+        return f"{numberOfBytes:.0f} {unit}"
+      numberOfBytes /= 1024
+    return f"{numberOfBytes:.1f} GB"
+
+  def updateMemoryUsageLabel(self):
+    memoryUsage = self.logic.getMemoryUsage()
+    if memoryUsage["total"] == 0:
+      self.ui.memoryUsageLabel.text = "-"
+      return
+    categoryTexts = [f"{category} {self.formatBytes(numberOfBytes)}"
+                     for category, numberOfBytes in memoryUsage["categories"].items() if numberOfBytes > 0]
+    self.ui.memoryUsageLabel.text = f"{self.formatBytes(memoryUsage['total'])} ({', '.join(categoryTexts)})"
+
+  def onAggregateSessionsClicked(self):
+    logging.info("onAggregateSessionsClicked()")
+    directory = qt.QFileDialog.getExistingDirectory(slicer.util.mainWindow(), "Select folder with saved sessions",
+                                                    self.ui.outputDirectorySelector.directory)
+    if not directory:
+      return
+    try:
+      qt.QApplication.setOverrideCursor(qt.Qt.WaitCursor)
+      ratingsPath = self.logic.saveAggregatedSessions(directory)
+      qt.QApplication.restoreOverrideCursor()
+      slicer.util.infoDisplay(f"Aggregated results saved to: {ratingsPath}")
+    except Exception as e:
+      qt.QApplication.restoreOverrideCursor()
+      slicer.util.errorDisplay(f"Sessions could not be aggregated: {str(e)}")
+
+  def onLiveRenderingShortcut(self):
+    """
+    Replaces pre-rendered snapshots of the current pair with live, interactive volume rendering.
+    """
+    if self._parameterNode.GetParameter(self.logic.INPUT_TYPE) != "3D":
+      return
+    self.logic.showLiveRendering()
+
   def onDisplayIdChecked(self, checked):
     logging.info("onDisplayIdChecked({})".format(checked))
     settings = slicer.app.userSettings()
@@ -403,30 +1087,26 @@ class SegmentationComparisonWidget(ScriptedLoadableModuleWidget, VTKObservationM
       self.ui.inputsCollapsibleButton.collapsed = True
 
   def onInputTypeChanged(self, button):
-    layoutManager = slicer.app.layoutManager()
     if button == self.ui.threeDRadioButton:
       self._parameterNode.SetParameter(self.logic.INPUT_TYPE, "3D")
-
-      layoutManager.setLayout(self.LAYOUT_DUAL_3D)
-      viewNode1 = slicer.mrmlScene.GetSingletonNode("1", "vtkMRMLViewNode")
-      viewNode1.SetOrientationMarkerType(viewNode1.OrientationMarkerTypeHuman)
-      viewNode1.SetOrientationMarkerSize(viewNode1.OrientationMarkerSizeSmall)
-
-      viewNode2 = slicer.mrmlScene.GetSingletonNode("2", "vtkMRMLViewNode")
-      viewNode2.SetOrientationMarkerType(viewNode2.OrientationMarkerTypeHuman)
-      viewNode2.SetOrientationMarkerSize(viewNode2.OrientationMarkerSizeSmall)
+      self.updateLayout()
 
       self.ui.toggleContourButton.enabled = False
       self.ui.toggleOverlayPushButton.enabled = False
+      self.ui.playCineButton.checked = False
+      self.ui.playCineButton.enabled = False
       self.disconnectKeyboardShortcut()
+      self.removeSliceNodeObservers()
     else:
       self._parameterNode.SetParameter(self.logic.INPUT_TYPE, "2D")
-      layoutManager.setLayout(self.LAYOUT_DUAL_MULTIPLE_2D)
+      self.updateLayout()
       
       # Enable overlay toggle
       self.ui.toggleContourButton.enabled = True
       self.ui.toggleOverlayPushButton.enabled = True
+      self.ui.playCineButton.enabled = True
       self.connectKeyboardShortcut()
+      self.addSliceNodeObservers()
 
   # set the output directory to the input directory as a default
   def onInputVolumeDirectorySelected(self, selectedPath):
@@ -452,6 +1132,28 @@ class SegmentationComparisonWidget(ScriptedLoadableModuleWidget, VTKObservationM
 
     self.updateParameterNodeFromGUI()
 
+  def onGenerateScheduleClicked(self):
+    inputType = "2D" if self.ui.twoDRadioButton.checked else "3D"
+    budget = qt.QInputDialog.getInt(slicer.util.mainWindow(), "Generate schedule", "Number of comparisons:",
+                                    self.SCHEDULE_BUDGET_DEFAULT, 1, 1000000)
+    seed = qt.QInputDialog.getInt(slicer.util.mainWindow(), "Generate schedule", "Random seed:", 0, 0, 2147483647)
+    schedulePath = qt.QFileDialog.getSaveFileName(slicer.util.mainWindow(), "Save schedule",
+                                                  os.path.join(self.ui.outputDirectorySelector.directory, f"schedule_{budget}_{seed}.csv"),
+                                                  "CSV files (*.csv)")
+    if not schedulePath:
+      return
+    try:
+      qt.QApplication.setOverrideCursor(qt.Qt.WaitCursor)
+      scheduleDF = self.logic.writeSchedule(self.ui.inputDirectorySelector.directory, schedulePath, inputType, budget, seed)
+    except Exception as e:
+      slicer.util.errorDisplay(f"Schedule could not be generated: {str(e)}")
+      return
+    finally:
+      qt.QApplication.restoreOverrideCursor()
+    if scheduleDF is not None:
+      self.ui.schedulePathSelector.currentPath = schedulePath
+      logging.info(f"Schedule of {len(scheduleDF)} comparisons saved to: {schedulePath}")
+
   def onClearButtonPressed(self):
     logging.info("onClearButtonPressed()")
     if self.ui.csvPathSelector.currentPath is None:
@@ -469,6 +1171,10 @@ class SegmentationComparisonWidget(ScriptedLoadableModuleWidget, VTKObservationM
     Called when the application closes and the module widget is destroyed.
     """
     self.removeObservers()
+    self.memoryUsageTimer.stop()
+    self.logic.cancelBackgroundLoading()
+    self.logic.cancelSimilarityComputation()
+    self.logic.closeSharedStudy()
 
   def enter(self):
     """
@@ -478,19 +1184,14 @@ class SegmentationComparisonWidget(ScriptedLoadableModuleWidget, VTKObservationM
     self.initializeParameterNode()
     slicer.util.setDataProbeVisible(False)  # We don't use data probe, and it takes valuable space from widget.
 
-    if self._parameterNode.GetParameter(self.logic.INPUT_TYPE) == "3D":
-      slicer.app.layoutManager().setLayout(self.LAYOUT_DUAL_3D)  # Setting this layout creates all views automatically
-
-      viewNode1 = slicer.mrmlScene.GetSingletonNode("1", "vtkMRMLViewNode")
-      viewNode1.SetOrientationMarkerType(viewNode1.OrientationMarkerTypeHuman)
-      viewNode1.SetOrientationMarkerSize(viewNode1.OrientationMarkerSizeSmall)
-
-      viewNode2 = slicer.mrmlScene.GetSingletonNode("2", "vtkMRMLViewNode")
-      viewNode2.SetOrientationMarkerType(viewNode2.OrientationMarkerTypeHuman)
-      viewNode2.SetOrientationMarkerSize(viewNode2.OrientationMarkerSizeSmall)
-    else:
-      slicer.app.layoutManager().setLayout(self.LAYOUT_DUAL_MULTIPLE_2D)
+    self.updateLayout()
+    self.connectModuleShortcuts()
+    if self._parameterNode.GetParameter(self.logic.INPUT_TYPE) != "3D":
       self.connectKeyboardShortcut()
+      self.addSliceNodeObservers()
+
+    self.updateMemoryUsageLabel()
+    self.memoryUsageTimer.start()
 
   def exit(self):
     """
@@ -501,6 +1202,10 @@ class SegmentationComparisonWidget(ScriptedLoadableModuleWidget, VTKObservationM
       self._parameterNode, vtk.vtkCommand.ModifiedEvent, self.updateGUIFromParameterNode)
     slicer.util.setDataProbeVisible(True)
     self.disconnectKeyboardShortcut()
+    self.disconnectModuleShortcuts()
+    self.removeSliceNodeObservers()
+    self.ui.playCineButton.checked = False
+    self.memoryUsageTimer.stop()
 
   def onSceneStartClose(self, caller, event):
     """
@@ -596,6 +1301,12 @@ class SegmentationComparisonWidget(ScriptedLoadableModuleWidget, VTKObservationM
     self.ui.rightThresholdSlider.value = rightSliderValue
     self.ui.linkThresholdsButton.checked = self.logic.getParameter(self.logic.LINK_OPACITIES)
     self.ui.matchingToleranceSpinBox.value = self.logic.getParameter(self.logic.MATCHING_TOLERANCE)
+    self.ui.pairSchedulerComboBox.currentIndex = self.ui.pairSchedulerComboBox.findData(self.logic.getParameter(self.logic.PAIR_SCHEDULER))
+    self.ui.ratingPeriodSpinBox.value = self.logic.getParameter(self.logic.RATING_PERIOD)
+    self.ui.modelsPerScreenSpinBox.value = self.logic.getParameter(self.logic.MODELS_PER_SCREEN)
+    self.ui.convergenceThresholdSpinBox.value = self.logic.getParameter(self.logic.CONVERGENCE_THRESHOLD)
+    self.ui.autoEndSessionCheckBox.checked = self.logic.getParameter(self.logic.AUTO_END_SESSION)
+    self.ui.nearDuplicateDiceSpinBox.value = self.logic.getParameter(self.logic.NEAR_DUPLICATE_DICE)
 
     self._updatingGUIFromParameterNode = False
 
@@ -616,6 +1327,12 @@ class SegmentationComparisonWidget(ScriptedLoadableModuleWidget, VTKObservationM
     self._parameterNode.SetParameter(self.logic.RIGHT_OPACITY_THRESHOLD, str(rightSlicerParameterValue))
     self._parameterNode.SetParameter(self.logic.LINK_OPACITIES, str(self.ui.linkThresholdsButton.checked))
     self._parameterNode.SetParameter(self.logic.MATCHING_TOLERANCE, str(self.ui.matchingToleranceSpinBox.value))
+    self._parameterNode.SetParameter(self.logic.PAIR_SCHEDULER, self.ui.pairSchedulerComboBox.currentData)
+    self._parameterNode.SetParameter(self.logic.RATING_PERIOD, str(self.ui.ratingPeriodSpinBox.value))
+    self._parameterNode.SetParameter(self.logic.MODELS_PER_SCREEN, str(self.ui.modelsPerScreenSpinBox.value))
+    self._parameterNode.SetParameter(self.logic.CONVERGENCE_THRESHOLD, str(self.ui.convergenceThresholdSpinBox.value))
+    self._parameterNode.SetParameter(self.logic.AUTO_END_SESSION, str(self.ui.autoEndSessionCheckBox.checked))
+    self._parameterNode.SetParameter(self.logic.NEAR_DUPLICATE_DICE, str(self.ui.nearDuplicateDiceSpinBox.value))
 
     self._parameterNode.EndModify(wasModified)
   
@@ -629,6 +1346,49 @@ class SegmentationComparisonWidget(ScriptedLoadableModuleWidget, VTKObservationM
     if self.shortcutF:
       self.shortcutF.activated.disconnect()
 
+  def connectModuleShortcuts(self):
+    """
+    Connects the shortcuts used with both input types. They are only connected while the module is open.
+    """
+    self.shortcutL.connect("activated()", self.onLiveRenderingShortcut)
+    self.shortcutG.connect("activated()", self.ui.showDifferenceButton.toggle)
+    self.shortcutUndo.connect("activated()", self.onUndoClicked)
+    self.shortcutRedo.connect("activated()", self.onRedoClicked)
+
+  def disconnectModuleShortcuts(self):
+    self.shortcutL.activated.disconnect()
+    self.shortcutG.activated.disconnect()
+    self.shortcutUndo.activated.disconnect()
+    self.shortcutRedo.activated.disconnect()
+
+  def getComparisonSliceNodes(self):
+    """
+    Returns the slice nodes of the 2D views of the current screen, if they exist in the current layout.
+    """
+    layoutManager = slicer.app.layoutManager()
+    nextPair = self.logic.getNextPair()
+    viewTags = [viewTag for viewTag, modelName in self.logic.getViewModels(nextPair)] if nextPair else ["1", "2"]
+    sliceNodes = []
+    for viewTag in viewTags:
+      sliceWidget = layoutManager.sliceWidget(viewTag)
+      if sliceWidget is not None:
+        sliceNodes.append(sliceWidget.mrmlSliceNode())
+    return sliceNodes
+
+  def addSliceNodeObservers(self):
+    for sliceNode in self.getComparisonSliceNodes():
+      if not self.hasObserver(sliceNode, vtk.vtkCommand.ModifiedEvent, self.onSliceNodeModified):
+        self.addObserver(sliceNode, vtk.vtkCommand.ModifiedEvent, self.onSliceNodeModified)
+
+  def removeSliceNodeObservers(self):
+    self.removeObservers(self.onSliceNodeModified)
+
+  def onSliceNodeModified(self, caller=None, event=None):
+    """
+    Updates contours when the displayed frame changes.
+    """
+    self.logic.updateFrameContours()
+
   # Threshold the selected volume(s)
   def onLeftSliderChanged(self, value):
     """
@@ -647,16 +1407,22 @@ class SegmentationComparisonWidget(ScriptedLoadableModuleWidget, VTKObservationM
       logging.info("Not updating volume rendering, because volumes are not displayed yet")
       return
 
+    if self.isThresholdChanged(self.logic.LEFT_OPACITY_THRESHOLD, value):
+      self.logic.invalidateSnapshots()
+
     try:
-      volumeName = self.logic.nameFromPatientSequenceAndModel(nextPair[0], nextPair[1])
-      inputVolume = self._parameterNode.GetNodeReference(volumeName)
-      if inputVolume is not None:
-        if self._parameterNode.GetParameter(self.logic.INPUT_TYPE) == "3D":
-          self.logic.setVolumeOpacityThreshold(inputVolume, thresholdPercentage)
+      # On ranking screens, the left slider sets the opacity of all views
+      viewModels = self.logic.getViewModels(nextPair) if len(nextPair) > 3 else [("1", nextPair[1])]
+      for viewTag, modelName in viewModels:
+        volumeName = self.logic.nameFromPatientSequenceAndModel(nextPair[0], modelName)
+        inputVolume = self._parameterNode.GetNodeReference(volumeName)
+        if inputVolume is not None:
+          if self._parameterNode.GetParameter(self.logic.INPUT_TYPE) == "3D":
+            self.logic.setVolumeOpacityThreshold(inputVolume, thresholdPercentage)
+          else:
+            self.logic.setSlicePredictionOpacity(viewTag, thresholdPercentage)
         else:
-          self.logic.setSlicePredictionOpacity(1, thresholdPercentage)
-      else:
-        logging.warning("Volume not found by reference: {}".format(volumeName))
+          logging.warning("Volume not found by reference: {}".format(volumeName))
     except Exception as e:
       slicer.util.errorDisplay("Failed to threshold the selected volume(s): "+str(e))
       import traceback
@@ -680,6 +1446,12 @@ class SegmentationComparisonWidget(ScriptedLoadableModuleWidget, VTKObservationM
     if nextPair is None:
       logging.info("Not updating volume rendering, because volumes are not displayed yet")
       return
+    if len(nextPair) > 3:
+      self.updateParameterNodeFromGUI()
+      return  # All views of ranking screens follow the left slider
+
+    if self.isThresholdChanged(self.logic.RIGHT_OPACITY_THRESHOLD, value):
+      self.logic.invalidateSnapshots()
 
     try:
       volumeName = self.logic.nameFromPatientSequenceAndModel(nextPair[0], nextPair[2])
@@ -698,6 +1470,17 @@ class SegmentationComparisonWidget(ScriptedLoadableModuleWidget, VTKObservationM
 
     self.updateParameterNodeFromGUI()
 
+  def isThresholdChanged(self, parameterName, value):
+    """
+    Checks if a slider value differs from the threshold stored in the parameter node. Slider callbacks are also called
+    with unchanged values when the scene changes, and those should not invalidate pre-rendered snapshots.
+    :param parameterName: LEFT_OPACITY_THRESHOLD or RIGHT_OPACITY_THRESHOLD
+    :param value: slider value directly from slider widget
+    :returns: True if the threshold was changed by the user
+    """
+    storedValue = self.logic.getParameter(parameterName) * self.THRESHOLD_SLIDER_RESOLUTION
+    return round(storedValue) != round(value)
+
   def getThresholdPercentage(self, value):
     """
     Returns the slider value as a percentage of the total range (0..100).
@@ -726,24 +1509,44 @@ class SegmentationComparisonWidget(ScriptedLoadableModuleWidget, VTKObservationM
     
     nextPair = self.logic.getNextPair()
 
-    # Left side
-    volumeName1 = self.logic.nameFromPatientSequenceAndModel(nextPair[0], nextPair[1])
-    modelNode1 = parameterNode.GetNodeReference(volumeName1 + self.logic.MODEL_SUFFIX)
-    modelDisplayNode1 = modelNode1.GetDisplayNode()
-
-    # Right side
-    volumeName2 = self.logic.nameFromPatientSequenceAndModel(nextPair[0], nextPair[2])
-    modelNode2 = parameterNode.GetNodeReference(volumeName2 + self.logic.MODEL_SUFFIX)
-    modelDisplayNode2 = modelNode2.GetDisplayNode()
+    modelDisplayNodes = []
+    for modelName in nextPair[1:]:
+      volumeName = self.logic.nameFromPatientSequenceAndModel(nextPair[0], modelName)
+      modelNode = parameterNode.GetNodeReference(volumeName + self.logic.MODEL_SUFFIX)
+      modelDisplayNodes.append(modelNode.GetDisplayNode())
 
     # Only check left side to ensure consistency
-    if modelDisplayNode1.GetVisibility2D():
-      modelDisplayNode1.SetVisibility2D(False)
-      modelDisplayNode2.SetVisibility2D(False)
-    else:
-      modelDisplayNode1.SetVisibility2D(True)
-      modelDisplayNode2.SetVisibility2D(True)
+    visible = not modelDisplayNodes[0].GetVisibility2D()
+    for modelDisplayNode in modelDisplayNodes:
+      modelDisplayNode.SetVisibility2D(visible)
   
+  def onPlayCineToggled(self, toggled):
+    logging.info("onPlayCineToggled({})".format(toggled))
+    if toggled:
+      if self.logic.startCine(self.ui.cineFrameRateSpinBox.value, self.onCineStatusChanged):
+        self.ui.playCineButton.text = "Stop"
+      else:
+        self.ui.playCineButton.checked = False
+    else:
+      self.logic.stopCine()
+      self.ui.playCineButton.text = "Play"
+
+  def onCineFrameRateChanged(self, value):
+    if self.ui.playCineButton.checked:
+      self.logic.startCine(value, self.onCineStatusChanged)  # Restart with new frame rate
+
+  def onCineStatusChanged(self, framesShown, droppedFrames):
+    self.ui.cineStatusLabel.text = f"Dropped: {droppedFrames}"
+
+  def onLoadingProgress(self, residentCount, totalCount):
+    self.ui.loadingProgressBar.maximum = max(totalCount, 1)
+    self.ui.loadingProgressBar.value = residentCount
+    self.ui.cancelLoadingButton.enabled = self.logic.isBackgroundLoading()
+
+  def onCancelLoadingClicked(self):
+    logging.info("onCancelLoadingClicked()")
+    self.logic.cancelBackgroundLoading()
+
   def onOverlayToggled(self):
     leftOpacityCurrent = self.ui.leftThresholdSlider.value
     rightOpacityCurrent = self.ui.rightThresholdSlider.value
@@ -764,6 +1567,11 @@ class SegmentationComparisonWidget(ScriptedLoadableModuleWidget, VTKObservationM
       self.ui.leftThresholdSlider.value = 0
       self.ui.rightThresholdSlider.value = 0
 
+  def onShowDifferenceToggled(self, checked):
+    logging.info(f"onShowDifferenceToggled({checked})")
+    self.logic.setDifferenceOverlayVisible(checked)
+
+  @profiler.profiled
   def onLoadButton(self):
     """
     Callback function for load button.
@@ -783,7 +1591,7 @@ class SegmentationComparisonWidget(ScriptedLoadableModuleWidget, VTKObservationM
         waitDialog.windowFlags() & ~qt.Qt.WindowCloseButtonHint & ~qt.Qt.WindowContextHelpButtonHint | qt.Qt.FramelessWindowHint)
       waitDialogLayout = qt.QHBoxLayout()
       waitDialogLayout.setContentsMargins(16, 16, 16, 16)
-      label = qt.QLabel("Loading volumes. Please wait...", waitDialog)
+      label = qt.QLabel("Loading first pair. Please wait...", waitDialog)
       waitDialogLayout.addWidget(label)
       waitDialog.setLayout(waitDialogLayout)
       waitDialog.show()
@@ -791,6 +1599,7 @@ class SegmentationComparisonWidget(ScriptedLoadableModuleWidget, VTKObservationM
 
       try:
         qt.QApplication.setOverrideCursor(qt.Qt.WaitCursor)
+        self.ui.playCineButton.checked = False
         # Reset the scene
         self.logic.resetScene()
         # Set parameter back to 2D since clearing the scene resets it to default
@@ -799,6 +1608,9 @@ class SegmentationComparisonWidget(ScriptedLoadableModuleWidget, VTKObservationM
         # Reset comparison counter
         self.logic.sessionComparisonCount = 0
         self.ui.sessionComparisonLabel.text = str(self.logic.sessionComparisonCount)
+        self.rankingStableNotified = False
+        self.ui.rankingStabilityLabel.text = "-"
+        self.ui.survey.enabled = True
 
         self.logic.surveyStarted = True
 
@@ -812,15 +1624,26 @@ class SegmentationComparisonWidget(ScriptedLoadableModuleWidget, VTKObservationM
           comparisonHistoryPath = os.path.join(csvRoot, "comparison_history_" + timestamp)
           eloHistoryPath = os.path.join(csvRoot, "elo_history_" + timestamp)
 
-        self.logic.loadVolumes(self.ui.inputDirectorySelector.directory)
+        volumeEntries = self.logic.discoverVolumes(self.ui.inputDirectorySelector.directory)
+        if not volumeEntries:
+          return
         self.logic.setSurveyHistory(comparisonHistoryPath)
         self.ui.totalComparisonLabel.text = str(self.logic.getTotalComparisonCount())
         self.logic.setEloHistoryTable(eloHistoryPath)
         self.logic.loadSurveyTable(csvPath)
+        self.logic.openSharedStudy(self.ui.sharedStudyPathSelector.currentPath)
+        self.logic.loadSchedule(self.ui.schedulePathSelector.currentPath)
 
-        self.logic.updateNextPair(self.ui.csvPathSelector.currentPath == "")
+        self.logic.updateNextPair(self.ui.csvPathSelector.currentPath == "")  # Loads the volumes of the first pair
+        self.updateLayout()
+        self.updateUndoButtons()
         self.logic.prepareDisplay(self.ui.leftThresholdSlider.value, self.ui.rightThresholdSlider.value)
 
+        # Load the other volumes while the first pair is compared
+        self.logic.startBackgroundLoading(self.onLoadingProgress)
+        if slicer.util.settingsValue(self.logic.PAIR_SIMILARITY_SETTING, self.logic.PAIR_SIMILARITY_DEFAULT, converter=slicer.util.toBool):
+          self.logic.startSimilarityComputation()
+
         self.ui.inputsCollapsibleButton.collapsed = True
         self.ui.comparisonCollapsibleButton.collapsed = False
 
@@ -843,6 +1666,26 @@ class SegmentationComparisonWidget(ScriptedLoadableModuleWidget, VTKObservationM
 
   def onMatchingToleranceValueChanged(self, value):
     self.logic.setParameter(self.logic.MATCHING_TOLERANCE, value)
+
+  def onRatingPeriodValueChanged(self, value):
+    self.logic.setParameter(self.logic.RATING_PERIOD, value)
+
+  def onModelsPerScreenValueChanged(self, value):
+    self.logic.setParameter(self.logic.MODELS_PER_SCREEN, value)
+
+  def onConvergenceThresholdValueChanged(self, value):
+    self.logic.setParameter(self.logic.CONVERGENCE_THRESHOLD, value)
+
+  def onAutoEndSessionToggled(self, checked):
+    self.logic.setParameter(self.logic.AUTO_END_SESSION, checked)
+
+  def onNearDuplicateDiceValueChanged(self, value):
+    self.logic.setParameter(self.logic.NEAR_DUPLICATE_DICE, value)
+
+  def onPairSchedulerChanged(self, index):
+    if self._updatingGUIFromParameterNode:
+      return
+    self.logic.setParameter(self.logic.PAIR_SCHEDULER, self.ui.pairSchedulerComboBox.itemData(index))
   
   def onFlip2DClicked(self, toggled):
     resliceDriverLogic = slicer.modules.volumereslicedriver.logic()
@@ -871,64 +1714,160 @@ class SegmentationComparisonWidget(ScriptedLoadableModuleWidget, VTKObservationM
     self.ui.leftThresholdSlider.value = self.THRESHOLD_SLIDER_MIDDLE_VALUE
     self.logic.prepareDisplay(self.ui.leftThresholdSlider.value, self.ui.rightThresholdSlider.value)
 
-  def changeScene(self, score=0.5):
+  @profiler.profiled
+  def changeScene(self, score=0.5, decisionTime=None, outcomes=None):
     """
     Change pair of images being evaluated.
+    :param score: score of the left model, if a pair was compared
+    :param decisionTime: time of the click in seconds since epoch
+    :param outcomes: list of (leftModel, rightModel, leftScore) implied by a ranking screen, instead of score
     """
     self.logic.surveyStarted = True
-    self.logic.sessionComparisonCount += 1
+    if outcomes is None:
+      nextPair = self.logic.getNextPair()
+      outcomes = [(nextPair[1], nextPair[2], score)]
+    self.logic.sessionComparisonCount += len(outcomes)
 
-    self.logic.addRecordInTable(score)
+    for leftModel, rightModel, leftScore in outcomes:
+      self.logic.addRecordInTable(leftScore, decisionTime, [leftModel, rightModel])
     totalComparisonCount = self.logic.getTotalComparisonCount()
     self.ui.totalComparisonLabel.text = str(totalComparisonCount)
     self.ui.sessionComparisonLabel.text = str(self.logic.sessionComparisonCount)
 
+    self.ui.playCineButton.checked = False
+    if self.logic.isScheduleComplete():
+      self.endSession("All scheduled comparisons are done")
+      return
+    if self.checkRankingStability():
+      return  # Session ended
     self.logic.hideCurrentVolumes()  # Hide current pair before selecting new pair
 
     self.logic.updateNextPair(self.ui.csvPathSelector.currentPath == "")
+    self.showCurrentScreen()
+
+  def showCurrentScreen(self):
+    """
+    Displays the current screen of the logic, e.g. after it was changed by answering, undo or redo.
+    :returns: None
+    """
+    self.updateLayout()
 
     self.logic.prepareDisplay(self.ui.leftThresholdSlider.value, self.ui.rightThresholdSlider.value)
 
     self.onLeftSliderChanged(self.ui.leftThresholdSlider.value)
     self.onRightSliderChanged(self.ui.rightThresholdSlider.value)
+    self.updateUndoButtons()
+
+  def updateUndoButtons(self):
+    self.ui.undoButton.enabled = self.logic.canUndo()
+    self.ui.redoButton.enabled = self.logic.canRedo()
+
+  def onUndoClicked(self):
+    logging.info("onUndoClicked()")
+    self.changeSceneByHistory(self.logic.undoComparison)
+
+  def onRedoClicked(self):
+    logging.info("onRedoClicked()")
+    self.changeSceneByHistory(self.logic.redoComparison)
+
+  def changeSceneByHistory(self, historyFunction):
+    """
+    Undoes or redoes an answered screen and displays the resulting current screen.
+    :param historyFunction: logic.undoComparison or logic.redoComparison
+    :returns: None
+    """
+    if not self.ui.survey.enabled:
+      return  # Session ended, or not started
+    self.ui.playCineButton.checked = False
+    self.logic.hideCurrentVolumes()
+    if not historyFunction():
+      self.logic.prepareDisplay(self.ui.leftThresholdSlider.value, self.ui.rightThresholdSlider.value)
+      return
+    self.ui.totalComparisonLabel.text = str(self.logic.getTotalComparisonCount())
+    self.ui.sessionComparisonLabel.text = str(self.logic.sessionComparisonCount)
+    self.updateRankingStabilityLabel()
+    self.showCurrentScreen()
+
+  def updateRankingStabilityLabel(self):
+    correlation = self.logic.rankCorrelation
+    if correlation is None:
+      self.ui.rankingStabilityLabel.text = "-"
+    else:
+      self.ui.rankingStabilityLabel.text = f"{correlation:.3f}" + (" (stable)" if self.logic.rankingConverged else "")
+
+  def checkRankingStability(self):
+    """
+    Shows the ranking stability, and tells the rater once per session when the ranking becomes stable.
+    If enabled in settings, saves results and ends the session instead.
+    :returns: True if the session was ended
+    """
+    self.updateRankingStabilityLabel()
+
+    if not self.logic.rankingConverged or self.rankingStableNotified:
+      return False
+    self.rankingStableNotified = True
+
+    if not self.logic.getParameter(self.logic.AUTO_END_SESSION):
+      slicer.util.infoDisplay("The ranking of AI models is stable. You can save results and end the session.")
+      return False
+
+    return self.endSession("The ranking of AI models is stable")
+
+  def endSession(self, reason):
+    """
+    Saves results and disables the survey until data is loaded again.
+    :param reason: shown to the rater and logged
+    :returns: True if results were saved and the session ended
+    """
+    try:
+      resultsSavePath = self.logic.saveResults(self.ui.outputDirectorySelector.directory)
+    except Exception as e:
+      slicer.util.errorDisplay(f"{reason}, but results could not be saved: {str(e)}")
+      return False
+    self.logic.surveyStarted = False
+    self.ui.survey.enabled = False
+    logging.info(f"{reason}, session ended. Results saved to: {resultsSavePath}")
+    slicer.util.infoDisplay(f"{reason}, so the session has ended.\n\nResults saved to: {resultsSavePath}")
+    return True
 
   def onLeftBetterClicked(self):
+    decisionTime = time.time()  # Before any processing, so the decision time does not include it
     logging.info("Left side better clicked")
     self.logic.updateComparisonData(1.0)
-    self.changeScene(1.0)
+    self.changeScene(1.0, decisionTime)
 
   def onEqualClicked(self):
+    decisionTime = time.time()  # Before any processing, so the decision time does not include it
     logging.info("Tie button clicked")
     self.logic.updateComparisonData(0.5)
-    self.changeScene(0.5)
+    self.changeScene(0.5, decisionTime)
 
   def onRightBetterClicked(self):
+    decisionTime = time.time()  # Before any processing, so the decision time does not include it
     logging.info("Right side better clicked")
     self.logic.updateComparisonData(0.0)
-    self.changeScene(0.0)
+    self.changeScene(0.0, decisionTime)
+
+  def onSubmitRankingClicked(self):
+    decisionTime = time.time()  # Before any processing, so the decision time does not include it
+    nextPair = self.logic.getNextPair()
+    ranks = [rankSpinBox.value for rankSpinBox in self.getRankSpinBoxes()[:len(nextPair) - 1]]
+    logging.info(f"Ranking submitted: {ranks}")
+    outcomes = self.logic.updateRankingData(ranks)
+    self.changeScene(decisionTime=decisionTime, outcomes=outcomes)
 
   def onSaveButton(self):
     logging.info("onSaveButton()")
     confirmation = slicer.util.confirmYesNoDisplay("Exit survey and save results?")
     try:
       if confirmation:
-        # Save history as csv
-        surveyTable = self._parameterNode.GetNodeReference(self.logic.SURVEY_RESULTS_TABLE)
-        if (surveyTable.GetCellText(self.logic.getTotalComparisonCount(), self.logic.LEFT_MODEL_COL) == "" and
-            surveyTable.GetCellText(self.logic.getTotalComparisonCount(), self.logic.RIGHT_MODEL_COL) == ""):
-          surveyTable.RemoveRow(self.logic.getTotalComparisonCount())
-        comparisonHistoryFilename = self.ui.outputDirectorySelector.directory + "/comparison_history_" + time.strftime("%Y%m%d-%H%M%S") + ".csv"
-        slicer.util.saveNode(surveyTable, comparisonHistoryFilename)
-        # Elo history
-        eloHistoryTable = self._parameterNode.GetNodeReference(self.logic.ELO_HISTORY_TABLE)
-        eloHistoryFilename = self.ui.outputDirectorySelector.directory + "/elo_history_" + time.strftime("%Y%m%d-%H%M%S") + ".csv"
-        slicer.util.saveNode(eloHistoryTable, eloHistoryFilename)
-
-        # Save pandas to csv
-        resultsSavePath = self.ui.outputDirectorySelector.directory + "/elo_scores_" + time.strftime("%Y%m%d-%H%M%S") + ".csv"
-        self.logic.getSurveyTable().to_csv(resultsSavePath, index=False)
-
-        slicer.util.infoDisplay(f"Results successfully saved to: {resultsSavePath}")
+        resultsSavePath = self.logic.saveResults(self.ui.outputDirectorySelector.directory)
+        self.updateUndoButtons()
+        latencySummary = self.logic.getLatencySummaryText()
+        coverageSummary = self.logic.getCoverageSummaryText()
+        logging.info(latencySummary)
+        logging.info(coverageSummary)
+        slicer.util.infoDisplay(f"Results successfully saved to: {resultsSavePath}\n\n{latencySummary}\n\n{coverageSummary}")
         self.logic.surveyStarted = False
     except Exception as e:
       slicer.util.errorDisplay(f"Results could not be saved: {str(e)}")
@@ -950,13 +1889,28 @@ class SegmentationComparisonLogic(ScriptedLoadableModuleLogic):
 
   LEFT_MODEL_COL = 2
   RIGHT_MODEL_COL = 4
+  # Columns of the comparison history table. Times are seconds since epoch: when the pair started to be displayed,
+  # when it was first fully rendered in both views, and when the rater clicked.
+  SURVEY_TABLE_COLUMNS = [
+    ("Comparison", vtk.vtkIntArray),
+    ("Model_L", vtk.vtkStringArray),
+    ("Score_L", vtk.vtkDoubleArray),
+    ("Model_R", vtk.vtkStringArray),
+    ("Score_R", vtk.vtkDoubleArray),
+    ("DisplayStartTime", vtk.vtkDoubleArray),
+    ("RenderedTime", vtk.vtkDoubleArray),
+    ("DecisionTime", vtk.vtkDoubleArray),
+  ]
   DEFAULT_ELO = 1000
   K = 32
   EXP_SCALING_FACTOR = 0.01
   DF_COLUMN_NAMES = ["ModelName", "Elo", "GamesPlayed", "TimeLastPlayed"]
+  SCHEDULE_COLUMNS = ["Comparison", "ScanName", "LeftModel", "RightModel"]
+  SIMILARITY_COLUMNS = ["ScanName", "ModelA", "ModelB", "Dice", "VolumeDifference", "MeanSurfaceDistance"]
 
   WINDOW = 50
-  IMAGE_INTENSITY_MAX = 310  # Some bug causes images to have values beyond 255. Once that is fixed, this can be set to 255.
+  IMAGE_INTENSITY_MAX = 310  # Default for volumes without measured intensity statistics
+  CROP_MARGIN = 1  # Voxels kept around the non-empty region of cropped volumes, so rendering at the edges is unchanged
   DEFAULT_THRESHOLD = 127
   DEFAULT_SMOOTH = 15
   DEFAULT_DECIMATE = 0.25
@@ -968,6 +1922,47 @@ class SegmentationComparisonLogic(ScriptedLoadableModuleLogic):
   SHOW_SLICE_ANNOTATIONS_DEFAULT = 0
   CAMERA_FOV_SETTING = "SegmentationComparison/CameraFov"
   CAMERA_FOV_DEFAULT = 1800
+  SNAPSHOT_MODE_SETTING = "SegmentationComparison/SnapshotMode"
+  SNAPSHOT_MODE_DEFAULT = False
+  SNAPSHOT_SIZE_DEFAULT = 512  # Used when the size of the 3D view cannot be determined
+  SNAPSHOT_CACHE_SIZE = 16  # Maximum number of cached snapshots, enough for the current and next pairs at a few thresholds
+  PROGRESSIVE_DISPLAY_SETTING = "SegmentationComparison/ProgressiveDisplay"
+  PROGRESSIVE_DISPLAY_DEFAULT = False
+  PYRAMID_SHRINK_FACTORS = [2, 4]  # Downsampled levels built for each 3D volume, in addition to full resolution
+  FRAME_CONTOURS_SETTING = "SegmentationComparison/FrameContours"
+  FRAME_CONTOURS_DEFAULT = False
+  FRAME_CONTOUR_CACHE_SIZE = 2000  # Maximum number of cached (volume, frame) contours
+  CINE_PREFETCH_FRAMES = 8  # Size of the ring buffer of upcoming frames during cine playback
+  MANIFEST_FILENAME = "manifest.json"
+  MANIFEST_VERSION = 1
+  INDEXING_THREADS = 8  # Worker threads reading headers, helps most on network drives
+  FINGERPRINT_BLOCK_SIZE = 65536
+  MAX_DISPLAYED_ERRORS = 20
+  TRANSCODE_CACHE_SETTING = "SegmentationComparison/TranscodeCache"
+  TRANSCODE_CACHE_DEFAULT = False
+  DECOMPRESSION_CHUNK_SIZE = 4 * 1024 * 1024
+  NRRD_NUMPY_TYPES = {
+    "signed char": "i1", "int8": "i1", "int8_t": "i1",
+    "uchar": "u1", "unsigned char": "u1", "uint8": "u1", "uint8_t": "u1",
+    "short": "i2", "short int": "i2", "signed short": "i2", "signed short int": "i2", "int16": "i2", "int16_t": "i2",
+    "ushort": "u2", "unsigned short": "u2", "unsigned short int": "u2", "uint16": "u2", "uint16_t": "u2",
+    "int": "i4", "signed int": "i4", "int32": "i4", "int32_t": "i4",
+    "uint": "u4", "unsigned int": "u4", "uint32": "u4", "uint32_t": "u4",
+    "longlong": "i8", "long long": "i8", "long long int": "i8", "signed long long": "i8",
+    "signed long long int": "i8", "int64": "i8", "int64_t": "i8",
+    "ulonglong": "u8", "unsigned long long": "u8", "unsigned long long int": "u8", "uint64": "u8", "uint64_t": "u8",
+    "float": "f4", "double": "f8",
+  }
+  STUDY_STORE_EXTENSION = ".hdf5"  # Not .h5, which is used for transforms in input folders
+  LOADING_THREADS = 4  # Worker threads reading files while volumes are loaded
+  LOADING_READ_AHEAD = 8  # Number of queued volumes read ahead of node creation
+  LOADING_TIMER_INTERVAL_MS = 10
+  MEMORY_CATEGORIES = ["Scans", "Predictions", "Models", "Pyramids", "Snapshots", "Contours", "Differences", "Tables"]
+  DIFFERENCE_VOLUME = "PairDifference"  # Label volume showing where the predictions of the current pair disagree
+  DIFFERENCE_CACHE_SIZE = 4  # Maximum number of cached (scan, model, model) difference maps
+  DIFFERENCE_LEFT_COLOR = (1.0, 0.5, 0.0)  # Voxels only in the prediction shown on the left
+  DIFFERENCE_RIGHT_COLOR = (0.0, 0.6, 1.0)  # Voxels only in the prediction shown on the right
+  DIFFERENCE_OPACITY = 0.6
 
   # Module parameter names
 
@@ -978,9 +1973,32 @@ class SegmentationComparisonLogic(ScriptedLoadableModuleLogic):
   SURVEY_RESULTS_TABLE = "SurveyResultsTable"
   ELO_HISTORY_TABLE = "EloHistoryTable"
   SCANS_AND_MODELS_DICT = "ScansAndModelsDict"  # dict[modelName][scanName] = N serialized with json. N = number of games played.
+  VOLUME_STATISTICS_DICT = "VolumeStatisticsDict"  # dict[volumeName] = dict of intensity statistics and crop extent, serialized with json
   SURVEY_DATAFRAME = "SurveyDataFrame"
   NEXT_PAIR = "NextPair"  # list[volumeName, AiModelName1, AiModelName2]
+  PREVIEW_VOLUME = "PreviewVolume"  # Followed by view tag. Shows a downsampled volume until the full resolution is rendered.
   MATCHING_TOLERANCE = "MatchingTolerance"
+  PAIR_SCHEDULER = "PairScheduler"
+
+  PAIR_SCHEDULER_ELO_PROXIMITY = "EloProximity"
+  PAIR_SCHEDULER_INFORMATION_GAIN = "InformationGain"
+  PAIR_SCHEDULERS = [(PAIR_SCHEDULER_ELO_PROXIMITY, "Elo proximity"), (PAIR_SCHEDULER_INFORMATION_GAIN, "Information gain")]
+  RATING_PRIOR_SD = 350  # Standard deviation of the rating of a model that has not played yet, in Elo points
+  NEAR_DUPLICATE_DICE = "NearDuplicateDice"  # Pairs with a higher mean Dice score are compared less often
+  RATING_PERIOD = "RatingPeriod"  # Number of comparisons per Glicko-2 rating period. 1 updates ratings after each comparison.
+  MODELS_PER_SCREEN = "ModelsPerScreen"  # 2 compares pairs, 3 or 4 shows ranking screens
+  LEASE_ATTEMPTS = 5  # Times a screen is chosen again when another rater has just leased one of its pairs
+  UNDO_LIMIT = 100  # Number of answered screens that can be undone
+  CONVERGENCE_THRESHOLD = "ConvergenceThreshold"  # Rank correlation at which the ranking is considered stable
+  AUTO_END_SESSION = "AutoEndSession"  # Whether the session ends when the ranking is stable
+  CONVERGENCE_WINDOW = 50  # Number of comparisons between the rankings compared for stability
+  NEAR_DUPLICATE_WEIGHT = 0.1  # Sampling weight of near-identical pairs relative to other pairs
+
+  PAIR_SIMILARITY_SETTING = "SegmentationComparison/PairSimilarity"
+  PAIR_SIMILARITY_DEFAULT = False
+  SIMILARITY_MASK_LEVEL = 0.5  # Predictions are masked at this fraction of their maximum intensity
+  SIMILARITY_VERSION = 1  # Increment when the similarity cache format or computation changes
+  POPCOUNT_TABLE = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
 
 
   def __init__(self):
@@ -992,6 +2010,90 @@ class SegmentationComparisonLogic(ScriptedLoadableModuleLogic):
     self.surveyStarted = False
     self.surveyFinished = False
     self.sessionComparisonCount = 0  # How many comparisons have happened in this Slicer session
+    self.profilerNodeAddedObserverTag = None
+
+    # Volumes are loaded in the background after the first pair
+    self.volumeEntries = {}  # dict[volumeName] = entry with file, scanName and modelName
+    self.residentVolumes = set()  # Names of volumes with nodes in the scene
+    self.loadingQueue = deque()  # Entries waiting to be loaded, in loading order
+    self.loadingFutures = {}  # dict[volumeName] = future of files being read in a worker thread
+    self.ultrasoundReadScans = set()  # Scans whose ultrasound frames are read with one of the queued predictions
+    self.loadingExecutor = None
+    self.loadingProgressCallback = None
+    self.loadingTotal = 0  # Number of volumes resident when background loading is done
+    self.loadingTimer = qt.QTimer()
+    self.loadingTimer.setInterval(self.LOADING_TIMER_INTERVAL_MS)
+    self.loadingTimer.connect("timeout()", self.onLoadingTimeout)
+
+    # Timing of the displayed pair, for latency telemetry in the comparison history
+    self.pairSerial = 0  # Incremented when a new pair is selected
+    self.pairTiming = {"pairSerial": -1, "displayStart": float("nan"), "rendered": float("nan")}
+    self.renderObservations = []  # list[(vtkRenderWindow, observer tag)] waiting for the first render of the pair
+
+    # Ratings are stored in columns of the survey dataframe. Elo is updated after each comparison, Glicko-2 once per
+    # rating period.
+    self.eloEngine = EloRatingEngine(self.K, self.DEFAULT_ELO)
+    self.glickoEngine = Glicko2RatingEngine(self.DEFAULT_ELO)
+    self.ratingEngines = [self.eloEngine, self.glickoEngine]
+    self.pendingRatingPeriod = []  # list[(leftModel, rightModel, leftScore)] not rated by Glicko-2 yet
+
+    # Comparisons planned in advance by a schedule file
+    self.schedule = None  # list[(scanName, leftModel, rightModel)], or None to choose pairs during the survey
+    self.schedulePosition = 0  # Index of the next scheduled comparison
+
+    # Similarity of the predictions of each pair of models, computed in the background after loading
+    self.similarityExecutor = None
+    self.similarityFuture = None
+    self.pairSimilarity = {}  # dict[(modelName1, modelName2, scanName)] = dict of metrics, model names sorted
+    self.pairMeanDice = {}  # dict[(modelName1, modelName2)] = mean Dice over scans, model names sorted
+
+    # How many times each pair of models was compared on each scan, for choosing unseen combinations
+    self.pairCoverage = {}  # dict[(modelName1, modelName2, scanName)] = N, model names sorted
+    self.pairGames = {}  # dict[(modelName1, modelName2)] = N, model names sorted
+
+    # Study shared with raters in other instances, None if this instance rates alone
+    self.coordinator = None  # StudyCoordinator
+    self.leasedPairs = set()  # set[(modelName1, modelName2, scanName)] shown to other raters, model names sorted
+
+    # Ranking stability, checked after each comparison
+    self.rankingSnapshots = deque(maxlen=self.CONVERGENCE_WINDOW + 1)  # Ranks of models after each comparison
+    self.rankCorrelation = None  # Spearman correlation with the ranking CONVERGENCE_WINDOW comparisons ago
+    self.rankingConverged = False
+
+    # Answered screens that can be undone or redone, with the changes they made to the state of the survey
+    self.undoStack = deque(maxlen=self.UNDO_LIMIT)  # Most recently answered screen last
+    self.redoStack = []  # Most recently undone screen last
+
+    # Pre-rendered snapshots for showing 3D pairs without raycasting on every switch
+    self.snapshotCache = OrderedDict()  # OrderedDict[(volumeName, level, fov)] = vtkImageData, least recently used first
+    self.snapshotQueue = []  # list[(volumeName, level)] waiting to be rendered in the background
+    self.snapshotRenderingScheduled = False
+    self.snapshotActors = {}  # dict[viewTag] = vtkActor2D showing the snapshot in that 3D view
+    self.displayedSnapshots = {}  # dict[viewTag] = volumeName
+
+    # Downsampled versions of 3D volumes for progressive display
+    self.volumePyramids = {}  # dict[volumeName] = list[(shrinkFactor, vtkImageData, vtkMatrix4x4 IJK to RAS)], fine to coarse
+    self.pendingRefinements = {}  # dict[viewTag] = volumeName, for views showing a preview volume
+
+    # Contours of 2D predictions, extracted only for frames that are displayed
+    self.frameContoursEnabled = False  # Set when volumes are loaded, because it changes how contour models are created
+    self.frameContourCache = OrderedDict()  # OrderedDict[(volumeName, frameIndex)] = vtkPolyData, least recently used first
+    self.displayedContourFrames = {}  # dict[viewTag] = (volumeName, frameIndex)
+
+    # Voxelwise differences between predictions, computed once per pair of models on a scan
+    self.differenceCache = OrderedDict()  # OrderedDict[(scanName, modelA, modelB)] = (vtkImageData, vtkMatrix4x4), modelA < modelB
+    self.differenceOverlayVisible = False
+
+    # Cine playback of 2D sweeps
+    self.cineTimer = None
+    self.cineRingBuffer = deque(maxlen=self.CINE_PREFETCH_FRAMES)  # Prepared upcoming frames, oldest first
+    self.cineStatusCallback = None
+    self.cineFrameRate = 0
+    self.cineStartTime = 0
+    self.cineFirstFrame = 1
+    self.cineFrameCount = 0
+    self.cineLastFrameNumber = -1
+    self.cineDroppedFrames = 0
 
   def setDefaultParameters(self, parameterNode):
     """
@@ -1012,60 +2114,505 @@ class SegmentationComparisonLogic(ScriptedLoadableModuleLogic):
     if not parameterNode.GetParameter(self.MATCHING_TOLERANCE):
       parameterNode.SetParameter(self.MATCHING_TOLERANCE, "80")
 
-  def setSurveyHistory(self, comparisonHistoryPath):
-    """
-    Makes sure survey results table exists. If a previously saved file is specified, the table contents will be read from that
-    file. Otherwise a new blank table will be created.
-    :param comparisonHistoryPath: full path and file name for previously saved data, or leave blank
-    :returns: None
-    """
-    parameterNode = self.getParameterNode()
+    if not parameterNode.GetParameter(self.PAIR_SCHEDULER):
+      parameterNode.SetParameter(self.PAIR_SCHEDULER, self.PAIR_SCHEDULER_ELO_PROXIMITY)
 
-    if parameterNode.GetNodeReference(self.SURVEY_RESULTS_TABLE) is not None:
-      oldResultsTable = parameterNode.GetNodeReference(self.SURVEY_RESULTS_TABLE)
-      slicer.mrmlScene.RemoveNode(oldResultsTable)
+    if not parameterNode.GetParameter(self.NEAR_DUPLICATE_DICE):
+      parameterNode.SetParameter(self.NEAR_DUPLICATE_DICE, "0.95")
 
-    if comparisonHistoryPath:  # Load corresponding comparison history csv
-      surveyTable = slicer.util.loadTable(comparisonHistoryPath)
-      surveyTable.SetName(self.SURVEY_RESULTS_TABLE)
-      parameterNode.SetNodeReferenceID(self.SURVEY_RESULTS_TABLE, surveyTable.GetID())
+    if not parameterNode.GetParameter(self.RATING_PERIOD):
+      parameterNode.SetParameter(self.RATING_PERIOD, "1")
 
-    else:  # Reset survey table used to store survey results
-      surveyTable = slicer.mrmlScene.AddNewNodeByClass('vtkMRMLTableNode', self.SURVEY_RESULTS_TABLE)
-      parameterNode.SetNodeReferenceID(self.SURVEY_RESULTS_TABLE, surveyTable.GetID())
+    if not parameterNode.GetParameter(self.MODELS_PER_SCREEN):
+      parameterNode.SetParameter(self.MODELS_PER_SCREEN, "2")
 
-      # Prepare data types for table columns
-      indexCol = vtk.vtkIntArray()
-      indexCol.SetName("Comparison")
-      model1Col = vtk.vtkStringArray()
-      model1Col.SetName("Model_L")
-      score1Col = vtk.vtkDoubleArray()
-      score1Col.SetName("Score_L")
-      model2Col = vtk.vtkStringArray()
-      model2Col.SetName("Model_R")
-      score2Col = vtk.vtkDoubleArray()
-      score2Col.SetName("Score_R")
-
-      # Populate table with columns
-      surveyTable.AddColumn(indexCol)
-      surveyTable.AddColumn(model1Col)
-      surveyTable.AddColumn(score1Col)
-      surveyTable.AddColumn(model2Col)
-      surveyTable.AddColumn(score2Col)
+    if not parameterNode.GetParameter(self.CONVERGENCE_THRESHOLD):
+      parameterNode.SetParameter(self.CONVERGENCE_THRESHOLD, "0.95")
 
-  def setEloHistoryTable(self, eloHistoryPath=None):
+    if not parameterNode.GetParameter(self.AUTO_END_SESSION):
+      parameterNode.SetParameter(self.AUTO_END_SESSION, "False")
+
+  def setProfilingEnabled(self, enabled):
     """
-    Removes existing Elo history table, creates a new one, and optionally populates it from file
-    :param eloHistoryPath: full path to a previously saved Elo history table
+    Turns recording of stage timings on or off. Created MRML nodes are counted only while profiling is enabled.
+    :param enabled: bool
     :returns: None
     """
-    parameterNode = self.getParameterNode()
-
-    currentEloHistoryTable = parameterNode.GetNodeReference(self.ELO_HISTORY_TABLE)
-    if currentEloHistoryTable:
-      slicer.mrmlScene.RemoveNode(currentEloHistoryTable)
+    profiler.setEnabled(enabled)
+    if enabled and self.profilerNodeAddedObserverTag is None:
+      self.profilerNodeAddedObserverTag = slicer.mrmlScene.AddObserver(
+        slicer.vtkMRMLScene.NodeAddedEvent, lambda caller, event: profiler.count("nodesCreated"))
+    elif not enabled and self.profilerNodeAddedObserverTag is not None:
+      slicer.mrmlScene.RemoveObserver(self.profilerNodeAddedObserverTag)
+      self.profilerNodeAddedObserverTag = None
+
+  def readNrrd(self, filename, indexOrder="F"):
+    """
+    Reads a nrrd file, recording the time and bytes read when profiling is enabled.
+    :param indexOrder: "F" for arrays indexed [i, j, k], "C" for arrays indexed [k, j, i] like slicer.util.arrayFromVolume
+    :returns: tuple of numpy array and header dict
+    """
+    with profiler.span("nrrd.read", file=os.path.basename(filename)):
+      data, header = nrrd.read(filename, index_order=indexOrder)
+    if profiler.enabled:
+      profiler.count("bytesRead", os.path.getsize(filename))
+    return data, header
 
-    if eloHistoryPath:
+  def readNrrdFrames(self, filename, indices):
+    """
+    Reads selected frames of a [frames, height, width, 1] nrrd file. The data is decompressed in chunks and the
+    selected frames are copied out of each chunk, so the full array is never in memory. Frames are the fastest
+    varying axis in the file, so every chunk contains values of all frames. zlib releases the GIL, so several files
+    can be decompressed in parallel in worker threads.
+    Files with detached data, skipped bytes or other encodings are read with readNrrd.
+    :param filename: path of the nrrd file
+    :param indices: list of frame indices
+    :returns: numpy array of shape [len(indices), height, width]
+    """
+    with open(filename, "rb") as f:
+      header = nrrd.read_header(f)
+      sizes = [int(size) for size in header["sizes"]]
+      encoding = header.get("encoding", "raw")
+      dtype = self.NRRD_NUMPY_TYPES.get(header["type"])
+      if (len(sizes) != 4 or sizes[3] != 1 or dtype is None or encoding not in ["raw", "gzip", "gz"]
+          or "data file" in header or int(header.get("line skip", 0)) != 0 or int(header.get("byte skip", 0)) != 0):
+        data = self.readNrrd(filename)[0]
+        return data[indices, :, :, 0]
+
+      dtype = np.dtype(dtype)
+      if dtype.itemsize > 1:
+        dtype = dtype.newbyteorder("<" if header.get("endian", "little") == "little" else ">")
+      numberOfFrames, height, width = sizes[:3]
+      numberOfPixels = height * width
+      pixelSize = numberOfFrames * dtype.itemsize  # Bytes of one pixel in all frames
+      frames = np.empty((len(indices), numberOfPixels), dtype=dtype)
+      decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16) if encoding != "raw" else None
+
+      with profiler.span("readNrrdFrames", file=os.path.basename(filename)):
+        pending = bytearray()
+        pixelIdx = 0
+        while pixelIdx < numberOfPixels:
+          chunk = f.read(self.DECOMPRESSION_CHUNK_SIZE)
+          if not chunk:
+            break
+          pending += decompressor.decompress(chunk) if decompressor is not None else chunk
+          numberOfChunkPixels = min(len(pending) // pixelSize, numberOfPixels - pixelIdx)
+          if numberOfChunkPixels == 0:
+            continue
+          chunkValues = np.frombuffer(pending, dtype=dtype, count=numberOfChunkPixels * numberOfFrames)
+          frames[:, pixelIdx:pixelIdx + numberOfChunkPixels] = chunkValues.reshape(numberOfChunkPixels, numberOfFrames)[:, indices].T
+          del chunkValues  # Release the buffer before resizing it
+          del pending[:numberOfChunkPixels * pixelSize]
+          pixelIdx += numberOfChunkPixels
+
+      if profiler.enabled:
+        profiler.count("bytesRead", os.path.getsize(filename))
+      if pixelIdx < numberOfPixels:
+        raise ValueError(f"{filename} ended after {pixelIdx} of {numberOfPixels} pixels")
+
+    # Pixels are stored with height varying fastest
+    return frames.reshape(len(indices), width, height).transpose(0, 2, 1)
+
+  def readNrrdTranscoded(self, filename, indexOrder, cacheKey, transcodeDirectory):
+    """
+    Reads a nrrd file from its uncompressed copy in the transcode cache, creating the copy if it does not exist yet.
+    :param cacheKey: identifies the version of the input file, from its fingerprint, size and modification time
+    :param transcodeDirectory: cache folder for uncompressed copies
+    :returns: tuple of numpy array (memory mapped if read from the cache) and header dict
+    """
+    dataPath = os.path.join(transcodeDirectory, f"{cacheKey}_{indexOrder}.npy")
+    headerPath = os.path.join(transcodeDirectory, f"{cacheKey}_{indexOrder}.json")
+    if os.path.exists(dataPath) and os.path.exists(headerPath):
+      with profiler.span("transcodeCache.read", file=os.path.basename(filename)):
+        data = np.load(dataPath, mmap_mode="r")
+        with open(headerPath) as f:
+          header = json.load(f)
+      for field in ["space directions", "space origin"]:
+        if field in header:
+          header[field] = np.array(header[field], dtype=float)
+      return data, header
+
+    data, header = self.readNrrd(filename, indexOrder)
+    try:
+      with profiler.span("transcodeCache.write", file=os.path.basename(filename)):
+        temporaryPath = f"{dataPath}.{threading.get_ident()}.tmp"  # Renamed when complete, so partial files are never read
+        with open(temporaryPath, "wb") as f:
+          np.save(f, data)
+        os.replace(temporaryPath, dataPath)
+        with open(headerPath, "w") as f:
+          json.dump(header, f, default=lambda value: value.tolist() if isinstance(value, np.ndarray) else str(value))
+    except OSError as e:
+      logging.warning(f"Decoded copy of {filename} could not be cached: {str(e)}")
+    return data, header
+
+  def readFrames(self, filename, indices, cacheKey=None, transcodeDirectory=None):
+    """
+    Reads selected frames of a 2D nrrd file, from the transcode cache if enabled.
+    :returns: numpy array of shape [len(indices), height, width]
+    """
+    if transcodeDirectory is not None and cacheKey is not None:
+      data = self.readNrrdTranscoded(filename, "F", cacheKey, transcodeDirectory)[0]
+      return np.asarray(data[indices, :, :, 0])
+    return self.readNrrdFrames(filename, indices)
+
+  @profiler.profiled
+  def saveResults(self, outputDirectory):
+    """
+    Saves the comparison history, the Elo history and the Elo scores as csv files. All three file names end with the
+    same timestamp, which is how a previous session is found when it is resumed from the Elo scores file.
+    :param outputDirectory: folder to save the files in
+    :returns: path of the Elo scores file
+    """
+    parameterNode = self.getParameterNode()
+    timestamp = time.strftime("%Y%m%d-%H%M%S")
+
+    # Close the current rating period, so saved ratings include all comparisons
+    if self.coordinator is not None:
+      with self.coordinator.transaction():
+        self.syncSharedState()
+        surveyDF = self.getSurveyTable()
+        self.updateRatingPeriod(surveyDF)
+        self.setSurveyTable(surveyDF)
+        self.coordinator.writeResults(surveyDF, self.getRatingColumns(), None, [], periodClosed=True)
+    elif self.pendingRatingPeriod:
+      surveyDF = self.getSurveyTable()
+      self.updateRatingPeriod(surveyDF)
+      self.setSurveyTable(surveyDF)
+      # Saved ratings include the answers of the closed period, so these can no longer be undone separately
+      self.undoStack.clear()
+      self.redoStack = []
+
+    # Save history as csv
+    surveyTable = parameterNode.GetNodeReference(self.SURVEY_RESULTS_TABLE)
+    if (surveyTable.GetCellText(self.getTotalComparisonCount(), self.LEFT_MODEL_COL) == "" and
+        surveyTable.GetCellText(self.getTotalComparisonCount(), self.RIGHT_MODEL_COL) == ""):
+      surveyTable.RemoveRow(self.getTotalComparisonCount())
+    comparisonHistoryFilename = outputDirectory + "/comparison_history_" + timestamp + ".csv"
+    with profiler.span("saveComparisonHistory"):
+      slicer.util.saveNode(surveyTable, comparisonHistoryFilename)
+
+    # Elo history
+    eloHistoryTable = parameterNode.GetNodeReference(self.ELO_HISTORY_TABLE)
+    eloHistoryFilename = outputDirectory + "/elo_history_" + timestamp + ".csv"
+    with profiler.span("saveEloHistory"):
+      slicer.util.saveNode(eloHistoryTable, eloHistoryFilename)
+
+    # Save pandas to csv
+    resultsSavePath = outputDirectory + "/elo_scores_" + timestamp + ".csv"
+    with profiler.span("saveEloScores"):
+      self.getSurveyTable().to_csv(resultsSavePath, index=False)
+
+    return resultsSavePath
+
+  def findSessions(self, directory):
+    """
+    Finds saved sessions in a folder and its subfolders. The name of the subfolder of a session is used as rater name.
+    :param directory: folder with comparison_history_*, elo_history_* and elo_scores_* csv files
+    :returns: list of dicts with rater, session (timestamp), and paths of the three files (None if missing)
+    """
+    sessions = []
+    for root, dirNames, fileNames in os.walk(directory):
+      rater = os.path.relpath(root, directory)
+      rater = "" if rater == "." else rater
+      for fileName in sorted(fileNames):
+        if not (fileName.startswith("comparison_history_") and fileName.endswith(".csv")):
+          continue
+        timestamp = fileName[len("comparison_history_"):]
+        eloHistoryPath = os.path.join(root, "elo_history_" + timestamp)
+        eloScoresPath = os.path.join(root, "elo_scores_" + timestamp)
+        sessions.append({
+          "Rater": rater,
+          "Session": os.path.splitext(timestamp)[0],
+          "ComparisonHistoryFile": os.path.join(root, fileName),
+          "EloHistoryFile": eloHistoryPath if os.path.exists(eloHistoryPath) else None,
+          "EloScoresFile": eloScoresPath if os.path.exists(eloScoresPath) else None,
+        })
+    return sessions
+
+  def readSessionHistory(self, path):
+    """
+    Reads a comparison history csv file, adding telemetry columns missing from older files.
+    Does not use the scene, so it can run in a worker thread.
+    :returns: pandas dataframe with the columns of SURVEY_TABLE_COLUMNS
+    """
+    historyDF = pd.read_csv(path)
+    for columnName, arrayClass in self.SURVEY_TABLE_COLUMNS:
+      if columnName not in historyDF.columns:
+        historyDF[columnName] = np.nan
+    return historyDF[[columnName for columnName, arrayClass in self.SURVEY_TABLE_COLUMNS]]
+
+  @profiler.profiled
+  def aggregateSessions(self, directory):
+    """
+    Merges the comparisons of all sessions saved in a folder, and computes Elo scores from all of them.
+    A resumed session saves the comparison history of the sessions it continues, so histories that are the beginning
+    of a longer history of the same rater are not counted again. Each comparison is assigned to the earliest session
+    that saved it, and counted once even if that session was resumed more than once.
+    :param directory: folder searched by findSessions
+    :returns: dict with "comparisons" (one row per comparison, with Rater and Session columns), "sessions"
+      (one row per session, with number of comparisons and the session that continued it), and "ratings" dataframes
+    """
+    sessions = self.findSessions(directory)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=self.INDEXING_THREADS) as executor:
+      histories = list(executor.map(self.readSessionHistory, [session["ComparisonHistoryFile"] for session in sessions]))
+
+    comparisonDFs = []
+    sessionsByRater = {}
+    for session, historyDF in zip(sessions, histories):
+      session["NumberOfComparisons"] = len(historyDF)
+      session["ContinuedBy"] = None
+      session["rows"] = list(zip(historyDF["Model_L"], historyDF["Model_R"], historyDF["Score_L"]))
+      sessionsByRater.setdefault(session["Rater"], []).append((session, historyDF))
+
+    for rater, raterSessions in sessionsByRater.items():
+      raterSessions.sort(key=lambda sessionAndHistory: (len(sessionAndHistory[0]["rows"]), sessionAndHistory[0]["Session"]))
+      for sessionIdx, (session, historyDF) in enumerate(raterSessions):
+        # Find the shortest later history that starts with this one
+        for laterSession, laterHistoryDF in raterSessions[sessionIdx + 1:]:
+          if laterSession["rows"][:len(session["rows"])] == session["rows"]:
+            session["ContinuedBy"] = laterSession["Session"]
+            break
+
+      mergedRows = set()  # (session, row index) already merged from another session that continued the same session
+      for session, historyDF in raterSessions:
+        if session["ContinuedBy"] is not None:
+          continue
+        # Rows of a chain of sessions belong to the earliest session that saved them
+        chain = sorted([otherSession for otherSession, otherHistoryDF in raterSessions
+                        if otherSession["rows"] == session["rows"][:len(otherSession["rows"])]],
+                       key=lambda otherSession: len(otherSession["rows"]))
+        rowSessions = np.empty(len(historyDF), dtype=object)
+        startRow = 0
+        for chainSession in chain:
+          rowSessions[startRow:len(chainSession["rows"])] = chainSession["Session"]
+          startRow = max(startRow, len(chainSession["rows"]))
+        isNew = np.array([(rowSession, rowIdx) not in mergedRows for rowIdx, rowSession in enumerate(rowSessions)], dtype=bool)
+        mergedRows.update((rowSession, rowIdx) for rowIdx, rowSession in enumerate(rowSessions))
+        historyDF = historyDF[isNew].copy()
+        historyDF.insert(0, "Session", rowSessions[isNew])
+        historyDF.insert(0, "Rater", rater)
+        comparisonDFs.append(historyDF)
+
+    if comparisonDFs:
+      comparisonsDF = pd.concat(comparisonDFs, ignore_index=True)
+    else:
+      comparisonsDF = pd.DataFrame(columns=["Rater", "Session"] + [name for name, arrayClass in self.SURVEY_TABLE_COLUMNS])
+    sessionsDF = pd.DataFrame([{key: value for key, value in session.items() if key != "rows"} for session in sessions])
+
+    return {
+      "comparisons": comparisonsDF,
+      "sessions": sessionsDF,
+      "ratings": self.computeEloRatings(comparisonsDF),
+    }
+
+  def computeEloRatings(self, comparisonsDF):
+    """
+    Replays comparisons with the Elo update used during surveys.
+    Comparisons are ordered by decision time, or by session and comparison number where decision time was not recorded.
+    Glicko-2 ratings are computed with one rating period per session.
+    :param comparisonsDF: dataframe with Model_L, Model_R and Score_L columns, and optionally Session, Comparison and
+      DecisionTime
+    :returns: dataframe with the columns of DF_COLUMN_NAMES and the Glicko-2 columns
+    """
+    sortColumns = [column for column in ["DecisionTime", "Session", "Comparison"] if column in comparisonsDF.columns]
+    orderedDF = comparisonsDF.sort_values(sortColumns, kind="stable") if sortColumns else comparisonsDF
+    # Volume names are [patient_id]_[AI_model_name]_[sequence_name]
+    leftModels = orderedDF["Model_L"].astype(str).str.split("_").str[1].to_numpy()
+    rightModels = orderedDF["Model_R"].astype(str).str.split("_").str[1].to_numpy()
+    leftScores = orderedDF["Score_L"].to_numpy(dtype=float)
+
+    modelNames = sorted(set(leftModels) | set(rightModels))
+    modelIndices = {modelName: modelIdx for modelIdx, modelName in enumerate(modelNames)}
+    elo = np.full(len(modelNames), float(self.DEFAULT_ELO))
+    gamesPlayed = np.zeros(len(modelNames), dtype=int)
+    for leftModel, rightModel, leftScore in zip(leftModels, rightModels, leftScores):
+      leftIdx, rightIdx = modelIndices[leftModel], modelIndices[rightModel]
+      leftExpected, rightExpected = self.calculateExpectedScores(elo[leftIdx], elo[rightIdx])
+      elo[leftIdx] = self.calculateNewElo(elo[leftIdx], leftScore, leftExpected)
+      elo[rightIdx] = self.calculateNewElo(elo[rightIdx], 1.0 - leftScore, rightExpected)
+      gamesPlayed[leftIdx] += 1
+      gamesPlayed[rightIdx] += 1
+
+    ratingsDF = pd.DataFrame({
+      "ModelName": modelNames,
+      "Elo": elo,
+      "GamesPlayed": gamesPlayed,
+      "TimeLastPlayed": pd.Series([pd.NaT] * len(modelNames), dtype="datetime64[ns]"),
+    })
+
+    self.glickoEngine.initializeColumns(ratingsDF)
+    leftIndices = np.array([modelIndices[modelName] for modelName in leftModels], dtype=int)
+    rightIndices = np.array([modelIndices[modelName] for modelName in rightModels], dtype=int)
+    sessions = orderedDF["Session"].to_numpy() if "Session" in orderedDF.columns else np.zeros(len(orderedDF))
+    for session in pd.unique(sessions):
+      inSession = sessions == session
+      self.glickoEngine.updateRatingPeriod(ratingsDF, leftIndices[inSession], rightIndices[inSession], leftScores[inSession])
+
+    return ratingsDF
+
+  def saveAggregatedSessions(self, directory):
+    """
+    Aggregates the sessions saved in a folder and saves the results in it as csv files.
+    :returns: path of the aggregated Elo scores file
+    """
+    aggregated = self.aggregateSessions(directory)
+    timestamp = time.strftime("%Y%m%d-%H%M%S")
+    aggregated["comparisons"].to_csv(os.path.join(directory, f"aggregated_comparisons_{timestamp}.csv"), index=False)
+    aggregated["sessions"].to_csv(os.path.join(directory, f"aggregated_sessions_{timestamp}.csv"), index=False)
+    ratingsPath = os.path.join(directory, f"aggregated_elo_scores_{timestamp}.csv")
+    aggregated["ratings"].sort_values("Elo", ascending=False).to_csv(ratingsPath, index=False)
+    return ratingsPath
+
+  @profiler.profiled
+  def setSurveyHistory(self, comparisonHistoryPath):
+    """
+    Makes sure survey results table exists. If a previously saved file is specified, the table contents will be read from that
+    file. Otherwise a new blank table will be created.
+    :param comparisonHistoryPath: full path and file name for previously saved data, or leave blank
+    :returns: None
+    """
+    parameterNode = self.getParameterNode()
+
+    if parameterNode.GetNodeReference(self.SURVEY_RESULTS_TABLE) is not None:
+      oldResultsTable = parameterNode.GetNodeReference(self.SURVEY_RESULTS_TABLE)
+      slicer.mrmlScene.RemoveNode(oldResultsTable)
+
+    if comparisonHistoryPath:  # Load corresponding comparison history csv
+      surveyTable = slicer.util.loadTable(comparisonHistoryPath)
+      surveyTable.SetName(self.SURVEY_RESULTS_TABLE)
+      parameterNode.SetNodeReferenceID(self.SURVEY_RESULTS_TABLE, surveyTable.GetID())
+
+    else:  # Reset survey table used to store survey results
+      surveyTable = slicer.mrmlScene.AddNewNodeByClass('vtkMRMLTableNode', self.SURVEY_RESULTS_TABLE)
+      parameterNode.SetNodeReferenceID(self.SURVEY_RESULTS_TABLE, surveyTable.GetID())
+
+    # Prepare data types for table columns, also for loaded csv files and older files without telemetry columns
+    self.setTypedTableColumns(surveyTable, self.SURVEY_TABLE_COLUMNS)
+    self.updatePairCoverageFromTable(surveyTable)
+
+  def updatePairCoverageFromTable(self, surveyTable):
+    """
+    Counts the comparisons of a comparison history table in the pair coverage, e.g. when a previous session is resumed.
+    :param surveyTable: vtkMRMLTableNode with the columns of SURVEY_TABLE_COLUMNS
+    :returns: None
+    """
+    self.pairCoverage = {}
+    self.pairGames = {}
+    table = surveyTable.GetTable()
+    leftColumn = table.GetColumnByName("Model_L")
+    rightColumn = table.GetColumnByName("Model_R")
+    for rowIdx in range(table.GetNumberOfRows()):
+      leftName = leftColumn.GetValue(rowIdx)
+      rightName = rightColumn.GetValue(rowIdx)
+      if not leftName or not rightName:
+        continue
+      scanName, leftModel = self.patientSequenceAndModelFromName(leftName)
+      rightScanName, rightModel = self.patientSequenceAndModelFromName(rightName)
+      self.addPairCoverage(scanName, leftModel, rightModel)
+
+  def addPairCoverage(self, scanName, modelName1, modelName2, increment=1):
+    modelName1, modelName2 = sorted([modelName1, modelName2])
+    for counts, key in [(self.pairCoverage, (modelName1, modelName2, scanName)),
+                        (self.pairGames, (modelName1, modelName2))]:
+      counts[key] = counts.get(key, 0) + increment
+      if counts[key] == 0:
+        del counts[key]  # Undone, as if the pair was never compared
+
+  def getPairCoverage(self, scanName, modelName1, modelName2):
+    """
+    Returns how many times two models were compared on a scan. Pairs shown to other raters of a shared study count as
+    compared once more, so they are avoided if possible.
+    """
+    modelName1, modelName2 = sorted([modelName1, modelName2])
+    key = (modelName1, modelName2, scanName)
+    return self.pairCoverage.get(key, 0) + (1 if key in self.leasedPairs else 0)
+
+  def getPairGames(self, modelName1, modelName2):
+    """
+    Returns how many times two models were compared, on any scan.
+    """
+    modelName1, modelName2 = sorted([modelName1, modelName2])
+    return self.pairGames.get((modelName1, modelName2), 0)
+
+  def getCoverageSummary(self):
+    """
+    Summarizes how many of the possible combinations of two models and a scan were compared.
+    :returns: dict with numbers of possible and compared combinations, repeated comparisons, and possible and
+      compared model pairs
+    """
+    scansAndModelsDict = self.getScansAndModelsDict() if self.getParameterNode().GetParameter(self.SCANS_AND_MODELS_DICT) else {}
+    modelsPerScan = {}
+    for modelName, scanGames in scansAndModelsDict.items():
+      for scanName in scanGames:
+        modelsPerScan[scanName] = modelsPerScan.get(scanName, 0) + 1
+    numberOfModels = len(scansAndModelsDict)
+    return {
+      "possibleCombinations": sum(n * (n - 1) // 2 for n in modelsPerScan.values()),
+      "comparedCombinations": len(self.pairCoverage),
+      "repeatedComparisons": sum(count - 1 for count in self.pairCoverage.values()),
+      "possiblePairs": numberOfModels * (numberOfModels - 1) // 2,
+      "comparedPairs": len(self.pairGames),
+    }
+
+  def getCoverageSummaryText(self):
+    summary = self.getCoverageSummary()
+    percent = 100 * summary["comparedCombinations"] / summary["possibleCombinations"] if summary["possibleCombinations"] else 0
+    return (f"Coverage: {summary['comparedCombinations']} of {summary['possibleCombinations']} model pair and scan "
+            f"combinations compared ({percent:.1f}%), {summary['repeatedComparisons']} repeated\n"
+            f"Model pairs compared: {summary['comparedPairs']} of {summary['possiblePairs']}")
+
+  def setTypedTableColumns(self, tableNode, columns):
+    """
+    Makes sure a table has the specified columns in the specified order and data types. Existing values are converted,
+    e.g. columns read from csv files as text. Missing columns are added, and filled with NaN if numeric.
+    Columns that are not specified are kept after the specified ones.
+    :param tableNode: vtkMRMLTableNode
+    :param columns: list of (column name, vtk array class)
+    :returns: None
+    """
+    table = tableNode.GetTable()
+    numberOfRows = table.GetNumberOfRows()
+    existingColumns = [table.GetColumn(i) for i in range(table.GetNumberOfColumns())]
+    existingColumnsByName = {column.GetName(): column for column in existingColumns}
+
+    typedColumns = []
+    for columnName, arrayClass in columns:
+      column = existingColumnsByName.pop(columnName, None)
+      if column is not None and column.IsA(arrayClass.__name__):
+        typedColumns.append(column)
+        continue
+      typedColumn = arrayClass()
+      typedColumn.SetName(columnName)
+      typedColumn.SetNumberOfValues(numberOfRows)
+      for rowIdx in range(numberOfRows):
+        text = column.GetVariantValue(rowIdx).ToString() if column is not None else ""
+        if arrayClass is vtk.vtkStringArray:
+          typedColumn.SetValue(rowIdx, text)
+        elif arrayClass is vtk.vtkIntArray:
+          typedColumn.SetValue(rowIdx, int(float(text)) if text else 0)
+        else:
+          typedColumn.SetValue(rowIdx, float(text) if text else float("nan"))
+      typedColumns.append(typedColumn)
+
+    extraColumns = [column for column in existingColumns if column.GetName() in existingColumnsByName]
+    tableNode.RemoveAllColumns()
+    for column in typedColumns + extraColumns:
+      tableNode.AddColumn(column)
+
+  @profiler.profiled
+  def setEloHistoryTable(self, eloHistoryPath=None):
+    """
+    Removes existing Elo history table, creates a new one, and optionally populates it from file
+    :param eloHistoryPath: full path to a previously saved Elo history table
+    :returns: None
+    """
+    parameterNode = self.getParameterNode()
+
+    currentEloHistoryTable = parameterNode.GetNodeReference(self.ELO_HISTORY_TABLE)
+    if currentEloHistoryTable:
+      slicer.mrmlScene.RemoveNode(currentEloHistoryTable)
+
+    if eloHistoryPath:
       eloHistoryTable = slicer.util.loadTable(eloHistoryPath)
       eloHistoryTable.SetName(self.ELO_HISTORY_TABLE)
       parameterNode.SetNodeReferenceID(self.ELO_HISTORY_TABLE, eloHistoryTable.GetID())
@@ -1089,6 +2636,7 @@ class SegmentationComparisonLogic(ScriptedLoadableModuleLogic):
         eloCol.SetName(modelName)
         eloHistoryTable.AddColumn(eloCol)
 
+  @profiler.profiled
   def loadSurveyTable(self, csvPath):
     scansAndModelsDict = self.getScansAndModelsDict()
     if csvPath:
@@ -1125,6 +2673,10 @@ class SegmentationComparisonLogic(ScriptedLoadableModuleLogic):
 
       surveyDF["TimeLastPlayed"] = pd.to_datetime(surveyDF["TimeLastPlayed"])
 
+      # Files saved before Glicko-2 ratings were added only have Elo scores
+      for engine in self.ratingEngines:
+        engine.initializeColumns(surveyDF)
+
     else:
       # Create new dataframe with each row being one model
       data = {
@@ -1135,10 +2687,13 @@ class SegmentationComparisonLogic(ScriptedLoadableModuleLogic):
       }
       surveyDF = pd.DataFrame(data)
       surveyDF["TimeLastPlayed"] = pd.to_datetime(surveyDF["TimeLastPlayed"])
+      for engine in self.ratingEngines:
+        engine.initializeColumns(surveyDF)
 
     # Save dataframe to parameter node
     self.setSurveyTable(surveyDF)
 
+  @profiler.profiled
   def setSurveyTable(self, surveyDF):
     """Save the contents of a dataframe in the parameter node in string format.
     :param surveyDF: pandas dataframe
@@ -1148,6 +2703,7 @@ class SegmentationComparisonLogic(ScriptedLoadableModuleLogic):
     dataStr = surveyDF.to_json(date_format="iso")
     parameterNode.SetParameter(self.SURVEY_DATAFRAME, dataStr)
 
+  @profiler.profiled
   def getSurveyTable(self):
     """Returns the dataframe representation of the survey dataframe.
     :return: pandas dataframe
@@ -1163,6 +2719,31 @@ class SegmentationComparisonLogic(ScriptedLoadableModuleLogic):
     return os.path.join(moduleDir, "Resources", filename)
 
   def resetScene(self):
+    self.closeSharedStudy()
+    self.cancelBackgroundLoading()
+    self.volumeEntries = {}
+    self.residentVolumes = set()
+    self.cancelSimilarityComputation()
+    self.pairSimilarity = {}
+    self.pairMeanDice = {}
+    self.schedule = None
+    self.schedulePosition = 0
+    self.pendingRatingPeriod = []
+    self.pairCoverage = {}
+    self.pairGames = {}
+    self.rankingSnapshots.clear()
+    self.rankCorrelation = None
+    self.rankingConverged = False
+    self.undoStack.clear()
+    self.redoStack = []
+    self.stopCine()
+    self.invalidateSnapshots()
+    self.volumePyramids = {}
+    self.pendingRefinements = {}
+    self.frameContourCache.clear()
+    self.displayedContourFrames = {}
+    self.differenceCache.clear()
+    self.removeRenderObservers()
     slicer.mrmlScene.Clear()
 
   def loadAndApplyTransforms(self, directory):
@@ -1222,127 +2803,1608 @@ class SegmentationComparisonLogic(ScriptedLoadableModuleLogic):
             "the volumes. Use this naming scheme: DefaultTransform.h5 to set the default transform, "
             "and Scene_x_Model_y_Transform.h5 for specific volumes")
 
-  def loadVolumes(self, directory):
-    # Load the volumes that will be compared.
-    # Store a dictionary with patient_sequence names as keys and lists of AI models as elements.
-    # For example, patient_sequence 405_axial was evaluated with the AI models UNet_1 and UNet_2.
+  def getCacheDirectory(self, directory):
+    """
+    Returns the folder for files derived from an input folder, such as the dataset manifest. It is in the Slicer cache,
+    so input folders can be read-only.
+    :param directory: input folder
+    :returns: path of the cache folder, created if it does not exist
+    """
+    directoryHash = hashlib.sha1(os.path.abspath(directory).encode("utf-8")).hexdigest()[:16]
+    cacheDirectory = os.path.join(slicer.app.cachePath, "SegmentationComparison", directoryHash)
+    os.makedirs(cacheDirectory, exist_ok=True)
+    return cacheDirectory
+
+  def getFileFingerprint(self, path, size):
+    """
+    Fingerprint of a file from its size and its first and last bytes, which include the nrrd header.
+    """
+    fingerprint = hashlib.blake2b(str(size).encode("utf-8"), digest_size=16)
+    with open(path, "rb") as f:
+      fingerprint.update(f.read(self.FINGERPRINT_BLOCK_SIZE))
+      if size > 2 * self.FINGERPRINT_BLOCK_SIZE:
+        f.seek(-self.FINGERPRINT_BLOCK_SIZE, os.SEEK_END)
+        fingerprint.update(f.read(self.FINGERPRINT_BLOCK_SIZE))
+    return fingerprint.hexdigest()
+
+  def getTranscodeCacheKey(self, manifestEntry):
+    """
+    Identifies a version of an input file for the transcode cache. Includes the modification time, because the
+    fingerprint does not cover the middle of large files.
+    """
+    keyText = f"{manifestEntry['fingerprint']}:{manifestEntry['size']}:{manifestEntry['mtime']}"
+    return hashlib.sha1(keyText.encode("utf-8")).hexdigest()[:24]
+
+  def readManifestEntry(self, path):
+    """
+    Reads what the manifest records about an input file: nrrd headers only, or the contents of indices files.
+    Does not use the scene, so it can run in a worker thread.
+    :param path: path of a .nrrd or _indices.json file
+    :returns: dict with size, mtime, fingerprint, and shape, type and encoding or indices, or error if the file is invalid
+    """
+    stat = os.stat(path)
+    manifestEntry = {"size": stat.st_size, "mtime": stat.st_mtime}
+    try:
+      manifestEntry["fingerprint"] = self.getFileFingerprint(path, stat.st_size)
+      if path.endswith(".json"):
+        with open(path) as f:
+          indices = json.load(f)["indices"]
+        if not all(isinstance(index, int) for index in indices):
+          raise ValueError("indices must be integers")
+        manifestEntry["indices"] = indices
+      else:
+        header = nrrd.read_header(path)
+        manifestEntry["shape"] = [int(size) for size in header["sizes"]]
+        manifestEntry["type"] = header["type"]
+        manifestEntry["encoding"] = header.get("encoding", "raw")
+    except Exception as e:
+      manifestEntry["error"] = str(e)
+    return manifestEntry
 
+  @profiler.profiled
+  def indexDataset(self, directory):
+    """
+    Lists the input files of a folder with their sizes, shapes, data types and fingerprints, and saves this manifest
+    in the cache folder. Headers are read in worker threads. Files with unchanged size and modification time
+    since the last manifest are not read again.
+    :param directory: input folder
+    :returns: manifest dict, with "files" dict[file name] = manifest entry
+    """
+    manifestPath = os.path.join(self.getCacheDirectory(directory), self.MANIFEST_FILENAME)
+    previousFiles = {}
+    if os.path.exists(manifestPath):
+      try:
+        with open(manifestPath) as f:
+          previousManifest = json.load(f)
+        if previousManifest.get("version") == self.MANIFEST_VERSION:
+          previousFiles = previousManifest["files"]
+      except (OSError, ValueError, KeyError) as e:
+        logging.warning(f"Ignoring invalid dataset manifest {manifestPath}: {str(e)}")
+
+    fileNames = sorted(fileName for fileName in os.listdir(directory)
+                       if fileName.endswith(".nrrd") or fileName.endswith("_indices.json"))
+    files = {}
+    changedFileNames = []
+    for fileName in fileNames:
+      stat = os.stat(os.path.join(directory, fileName))
+      previousEntry = previousFiles.get(fileName)
+      if previousEntry and previousEntry["size"] == stat.st_size and previousEntry["mtime"] == stat.st_mtime:
+        files[fileName] = previousEntry
+      else:
+        changedFileNames.append(fileName)
+
+    if changedFileNames:
+      with concurrent.futures.ThreadPoolExecutor(max_workers=self.INDEXING_THREADS) as executor:
+        paths = [os.path.join(directory, fileName) for fileName in changedFileNames]
+        for fileName, manifestEntry in zip(changedFileNames, executor.map(self.readManifestEntry, paths)):
+          files[fileName] = manifestEntry
+    logging.info(f"Indexed {len(fileNames)} files, {len(changedFileNames)} new or changed")
+
+    manifest = {"version": self.MANIFEST_VERSION, "directory": os.path.abspath(directory), "files": files}
+    try:
+      with open(manifestPath, "w") as f:
+        json.dump(manifest, f)
+    except OSError as e:
+      logging.warning(f"Dataset manifest could not be saved: {str(e)}")
+    return manifest
+
+  def validateManifest(self, manifest, inputType):
+    """
+    Checks naming, index files and shapes of a dataset before any volume is loaded.
+    :param manifest: manifest from indexDataset
+    :param inputType: "2D" or "3D"
+    :returns: list of error messages, empty if the dataset can be loaded
+    """
+    files = manifest["files"]
+    errors = [f"{fileName}: {manifestEntry['error']}" for fileName, manifestEntry in files.items() if "error" in manifestEntry]
+    for fileName, manifestEntry in files.items():
+      nameParts = os.path.splitext(fileName)[0].split("_")
+      if not fileName.endswith(".nrrd") or len(nameParts) < 3 or "error" in manifestEntry:
+        continue
+      if len(nameParts) > 3:
+        errors.append(f"{fileName}: name does not follow [patient_id]_[AI_model_name]_[sequence_name].nrrd")
+        continue
+      patientId, modelName, sequenceName = nameParts
+      scanName = patientId + "_" + sequenceName
+      shape = manifestEntry["shape"]
+
+      if inputType == "3D":
+        if len(shape) != 3:
+          errors.append(f"{fileName}: expected a 3D volume, found shape {shape}")
+        continue
+
+      ultrasoundEntry = files.get(f"{scanName}.nrrd")
+      indicesEntry = files.get(f"{scanName}_indices.json")
+      if ultrasoundEntry is None:
+        errors.append(f"{fileName}: missing ultrasound file {scanName}.nrrd")
+      elif "error" not in ultrasoundEntry and ultrasoundEntry["shape"][:3] != shape[:3]:
+        errors.append(f"{fileName}: shape {shape} does not match ultrasound shape {ultrasoundEntry['shape']}")
+      if indicesEntry is None:
+        errors.append(f"{fileName}: missing indices file {scanName}_indices.json")
+      elif "error" not in indicesEntry and any(index < 0 or index >= shape[0] for index in indicesEntry["indices"]):
+        errors.append(f"{scanName}_indices.json: indices out of range for {shape[0]} frames of {fileName}")
+      if len(shape) != 4:
+        errors.append(f"{fileName}: expected frames with shape [frames, height, width, 1], found shape {shape}")
+    return errors
+
+  def importH5py(self):
+    try:
+      import h5py
+    except ImportError:
+      slicer.util.pip_install("h5py")
+      import h5py
+    return h5py
+
+  def discoverStoreVolumes(self, storePaths, inputType):
+    """
+    Lists the volumes in study store files, and checks their names, shapes and indices.
+    A study store is an HDF5 file with one dataset per volume, chunked by frame:
+      predictions/[patient_id]_[AI_model_name]_[sequence_name]: frames [frames, height, width] for 2D studies,
+        or a volume [k, j, i] with an "ijkToRas" 4x4 matrix attribute for 3D studies
+      scans/[patient_id]_[sequence_name]: ultrasound frames [frames, height, width] with an "indices" attribute (2D only)
+    :param storePaths: list of study store files
+    :param inputType: "2D" or "3D"
+    :returns: tuple of list of volume entries and list of error messages
+    """
+    h5py = self.importH5py()
+    volumeEntries = []
+    errors = []
+    names = set()
+    for storePath in storePaths:
+      storeName = os.path.basename(storePath)
+      with h5py.File(storePath, "r") as store:
+        if "predictions" not in store:
+          errors.append(f"{storeName}: no predictions group")
+          continue
+        for name, dataset in store["predictions"].items():
+          nameParts = name.split("_")
+          if len(nameParts) != 3:
+            errors.append(f"{storeName}/{name}: name does not follow [patient_id]_[AI_model_name]_[sequence_name]")
+            continue
+          if name in names:
+            errors.append(f"{storeName}/{name}: volume is in more than one store")
+            continue
+          names.add(name)
+          patientId, modelName, sequenceName = nameParts
+          scanName = patientId + "_" + sequenceName
+          entry = {"name": name, "file": storePath, "dataset": f"predictions/{name}", "scanName": scanName,
+                   "modelName": modelName}
+          if dataset.ndim != 3:
+            errors.append(f"{storeName}/{name}: expected 3 dimensions, found shape {dataset.shape}")
+            continue
+
+          if inputType == "2D":
+            scanDataset = store.get(f"scans/{scanName}")
+            if scanDataset is None or "indices" not in scanDataset.attrs:
+              errors.append(f"{storeName}/{name}: missing scans/{scanName} dataset with indices")
+              continue
+            if scanDataset.shape != dataset.shape:
+              errors.append(f"{storeName}/{name}: shape {dataset.shape} does not match ultrasound shape {scanDataset.shape}")
+            indices = [int(index) for index in scanDataset.attrs["indices"]]
+            if any(index < 0 or index >= dataset.shape[0] for index in indices):
+              errors.append(f"{storeName}/scans/{scanName}: indices out of range for {dataset.shape[0]} frames")
+            entry["indices"] = indices
+          elif "ijkToRas" not in dataset.attrs:
+            errors.append(f"{storeName}/{name}: missing ijkToRas attribute")
+          volumeEntries.append(entry)
+    return volumeEntries, errors
+
+  def readStoreFrames(self, storePath, datasetName, indices):
+    """
+    Reads selected frames from a study store. Only the chunks of these frames are read and decompressed.
+    :returns: numpy array of shape [len(indices), height, width]
+    """
+    h5py = self.importH5py()
+    uniqueIndices = np.unique(indices)  # HDF5 selections must be increasing
+    with profiler.span("readStoreFrames", dataset=datasetName):
+      with h5py.File(storePath, "r") as store:
+        frames = store[datasetName][uniqueIndices.tolist()]
+    return frames[np.searchsorted(uniqueIndices, indices)]
+
+  def writeStudyStore(self, directory, storePath, inputType):
+    """
+    Converts a folder of nrrd files to a study store (see discoverStoreVolumes), which loads without opening and
+    parsing a file per volume. Frames are compressed one chunk each, so selected frames can be read alone.
+    :param directory: folder with [patient_id]_[AI_model_name]_[sequence_name].nrrd files
+    :param storePath: path of the .hdf5 file to write
+    :param inputType: "2D" or "3D"
+    :returns: None
+    """
+    h5py = self.importH5py()
+    manifest = self.indexDataset(directory)
+    errors = self.validateManifest(manifest, inputType)
+    if errors:
+      raise ValueError("Input folder cannot be converted:\n" + "\n".join(errors[:self.MAX_DISPLAYED_ERRORS]))
+
+    with h5py.File(storePath, "w") as store:
+      store.attrs["inputType"] = inputType
+      for fileName, manifestEntry in manifest["files"].items():
+        name, extension = os.path.splitext(fileName)
+        nameParts = name.split("_")
+        if extension != ".nrrd" or len(nameParts) < 2 or (inputType == "3D" and len(nameParts) != 3):
+          continue
+        if inputType == "2D":
+          data = np.ascontiguousarray(self.readNrrd(os.path.join(directory, fileName))[0][:, :, :, 0])
+          group = "predictions" if len(nameParts) == 3 else "scans"
+          dataset = store.create_dataset(f"{group}/{name}", data=data, chunks=(1,) + data.shape[1:],
+                                         compression="gzip", compression_opts=1)
+          if group == "scans":
+            dataset.attrs["indices"] = manifest["files"][f"{name}_indices.json"]["indices"]
+        else:
+          data, header = self.readNrrd(os.path.join(directory, fileName), indexOrder="C")
+          ijkToRas = self.getIJKToRASFromNrrdHeader(header)
+          if ijkToRas is None:
+            raise ValueError(f"{fileName}: unsupported space {header.get('space')}")
+          dataset = store.create_dataset(f"predictions/{name}", data=data, chunks=(1,) + data.shape[1:],
+                                         compression="gzip", compression_opts=1)
+          dataset.attrs["ijkToRas"] = slicer.util.arrayFromVTKMatrix(ijkToRas)
+
+  def discoverVolumes(self, directory):
+    """
+    Lists the volumes that can be compared in a directory, without loading them. Sets the scans and models dict,
+    so comparisons can be counted for all volumes while they are being loaded.
+    :param directory: folder with [patient_id]_[AI_model_name]_[sequence_name].nrrd files, or with study store files
+    :returns: list of dicts with name, file, scanName, modelName and indices (2D only) of each volume, ordered by scan.
+      Empty if the folder has no volumes or errors.
+    """
     logging.info("Load button pressed, resetting the scene")
+    inputType = self.getParameterNode().GetParameter(self.INPUT_TYPE)
+    self.frameContoursEnabled = slicer.util.settingsValue(self.FRAME_CONTOURS_SETTING, self.FRAME_CONTOURS_DEFAULT, converter=slicer.util.toBool)
+
+    volumeEntries = self.findVolumeEntries(directory, inputType)
+    if not volumeEntries:
+      return []
+    print("Found volumes: " + str([entry["name"] for entry in volumeEntries]))
+
+    volumeEntries.sort(key=lambda entry: entry["scanName"])  # All models of a scan together, so pairs become resident early
+    self.volumeEntries = {entry["name"]: entry for entry in volumeEntries}
+    self.residentVolumes = set()
+    self.setScansAndModelsDict(self.getScansAndModelsFromEntries(volumeEntries))
+    self.setVolumeStatisticsDict({})
+    return volumeEntries
+
+  def findVolumeEntries(self, directory, inputType):
+    """
+    Lists the volumes of an input folder, and shows an error if it cannot be loaded. Does not change the module state.
+    :param directory: folder with [patient_id]_[AI_model_name]_[sequence_name].nrrd files, or with study store files
+    :param inputType: "2D" or "3D"
+    :returns: list of volume entries, empty if the folder has no volumes or errors
+    """
+    print("Checking directory: " + directory)
+    storePaths = sorted(os.path.join(directory, fileName) for fileName in os.listdir(directory)
+                        if fileName.endswith(self.STUDY_STORE_EXTENSION))
+    if storePaths:
+      # Study stores replace nrrd files
+      print("Found study stores: " + str(storePaths))
+      volumeEntries, errors = self.discoverStoreVolumes(storePaths, inputType)
+    else:
+      # Index nrrd volumes in indicated directory
+      manifest = self.indexDataset(directory)
+      errors = self.validateManifest(manifest, inputType)
+      volumeEntries = []
+      if not errors:
+        transcodeDirectory = None
+        if slicer.util.settingsValue(self.TRANSCODE_CACHE_SETTING, self.TRANSCODE_CACHE_DEFAULT, converter=slicer.util.toBool):
+          transcodeDirectory = os.path.join(self.getCacheDirectory(directory), "transcoded")
+          os.makedirs(transcodeDirectory, exist_ok=True)
+        for fileName, manifestEntry in manifest["files"].items():
+          name = os.path.splitext(fileName)[0]  # remove file extension
+          if not fileName.endswith(".nrrd") or len(name.split("_")) != 3:
+            continue
+          patiendId, modelName, sequenceName = name.split('_')
+          scanName = patiendId + "_" + sequenceName
+          entry = {"name": name, "file": os.path.join(directory, fileName), "scanName": scanName, "modelName": modelName,
+                   "cacheKey": self.getTranscodeCacheKey(manifestEntry), "transcodeDirectory": transcodeDirectory}
+          if inputType == "2D":
+            entry["indices"] = manifest["files"][f"{scanName}_indices.json"]["indices"]
+            entry["ultrasoundCacheKey"] = self.getTranscodeCacheKey(manifest["files"][f"{scanName}.nrrd"])
+          volumeEntries.append(entry)
+
+    if errors:
+      slicer.util.errorDisplay("Input folder cannot be loaded:\n" + "\n".join(errors[:self.MAX_DISPLAYED_ERRORS]) +
+                               ("\n..." if len(errors) > self.MAX_DISPLAYED_ERRORS else ""))
+      return []
+    if not volumeEntries:
+      slicer.util.errorDisplay("Ensure volumes follow the naming convention: "
+                               "[patient_id]_[AI_model_name]_[sequence_name].nrrd")
+      return []
+    return volumeEntries
+
+  def getScansAndModelsFromEntries(self, volumeEntries):
+    # Store a dictionary with AI model names as keys and dicts of patient_sequence names as elements.
+    # For example, the AI models UNet_1 and UNet_2 were evaluated on patient_sequence 405_axial.
+    scansAndModelsDict = {}
+    for entry in volumeEntries:
+      if entry["modelName"] in scansAndModelsDict:
+        scansAndModelsDict[entry["modelName"]][entry["scanName"]] = 0
+      else:
+        scansAndModelsDict[entry["modelName"]] = {entry["scanName"]: 0}
+    return scansAndModelsDict
+
+  def generateSchedule(self, scansAndModelsDict, budget, seed=0):
+    """
+    Generates a balanced schedule of comparisons for a fixed budget. Each comparison takes the pair of models compared
+    least often so far, breaking ties by how often the two models appeared, so every pair appears equally often (within
+    one) and models about equally often. The scan is the one this pair was compared on least, so each pair is spread
+    evenly (within one) over the scans it can be compared on, then the one used least overall. The model shown on the
+    left is the one that was shown on the left less often, which keeps sides close to balanced but not exactly.
+    :param scansAndModelsDict: dict[modelName][scanName], e.g. from getScansAndModelsFromEntries
+    :param budget: number of comparisons
+    :param seed: random seed. The same seed and inputs give the same schedule.
+    :returns: dataframe with the columns of SCHEDULE_COLUMNS
+    """
+    generator = np.random.default_rng(seed)
+    modelNames = sorted(scansAndModelsDict.keys())
+    scanNames = sorted({scanName for scanGames in scansAndModelsDict.values() for scanName in scanGames})
+    scanIndexes = {scanName: i for i, scanName in enumerate(scanNames)}
+    available = np.zeros((len(modelNames), len(scanNames)), dtype=bool)
+    for modelIdx, modelName in enumerate(modelNames):
+      for scanName in scansAndModelsDict[modelName]:
+        available[modelIdx, scanIndexes[scanName]] = True
+
+    # Only pairs of models that share a scan can be compared
+    pairs = np.array([(a, b) for a, b in itertools.combinations(range(len(modelNames)), 2)
+                      if np.any(available[a] & available[b])], dtype=int).reshape(-1, 2)
+    if len(pairs) == 0:
+      raise ValueError("No two models share a scan.")
+    pairCounts = np.zeros(len(pairs))
+    modelCounts = np.zeros(len(modelNames))
+    leftCounts = np.zeros(len(modelNames))
+    scanCounts = np.zeros(len(scanNames))
+    pairScanCounts = {}  # dict[pair index] = number of comparisons on each scan
+
+    rows = []
+    for comparison in range(budget):
+      # Least compared pair, then least compared models, then random
+      pairCost = (pairCounts * (2 * budget + 1) + modelCounts[pairs[:, 0]] + modelCounts[pairs[:, 1]] +
+                  generator.random(len(pairs)))
+      pairIdx = int(np.argmin(pairCost))
+      a, b = pairs[pairIdx]
+      sharedScans = np.flatnonzero(available[a] & available[b])
+      pairScans = pairScanCounts.setdefault(pairIdx, np.zeros(len(scanNames)))
+      scanCost = pairScans[sharedScans] * (budget + 1) + scanCounts[sharedScans] + generator.random(len(sharedScans))
+      scanIdx = sharedScans[np.argmin(scanCost)]
+
+      # Counterbalance sides
+      leftSurplusA = leftCounts[a] - modelCounts[a] / 2
+      leftSurplusB = leftCounts[b] - modelCounts[b] / 2
+      if leftSurplusA > leftSurplusB or (leftSurplusA == leftSurplusB and generator.random() < 0.5):
+        a, b = b, a
+      rows.append((comparison + 1, scanNames[scanIdx], modelNames[a], modelNames[b]))
+
+      pairCounts[pairIdx] += 1
+      modelCounts[[a, b]] += 1
+      leftCounts[a] += 1
+      scanCounts[scanIdx] += 1
+      pairScans[scanIdx] += 1
+
+    return pd.DataFrame(rows, columns=self.SCHEDULE_COLUMNS)
+
+  def writeSchedule(self, directory, schedulePath, inputType, budget, seed=0):
+    """
+    Generates a balanced schedule for the volumes of an input folder (see generateSchedule) and saves it as csv.
+    :returns: schedule dataframe, or None if the folder cannot be loaded
+    """
+    volumeEntries = self.findVolumeEntries(directory, inputType)
+    if not volumeEntries:
+      return None
+    scheduleDF = self.generateSchedule(self.getScansAndModelsFromEntries(volumeEntries), budget, seed)
+    scheduleDF.to_csv(schedulePath, index=False)
+    return scheduleDF
+
+  def openSharedStudy(self, path):
+    """
+    Shares the study with raters in other instances through a database file, which is created if it does not exist.
+    Models of the loaded survey table that are not in the database are added with their current ratings.
+    :param path: database file, or empty to rate alone
+    :returns: None
+    """
+    self.closeSharedStudy()
+    if not path:
+      return
+    raterId = f"{platform.node()}-{os.getpid()}"
+    self.coordinator = StudyCoordinator(path, raterId)
+    self.coordinator.initializeModels(self.getSurveyTable(), self.getRatingColumns(), self.getHistoryOutcomes())
+    with self.coordinator.transaction():
+      self.syncSharedState()
+    logging.info(f"Sharing study through {path} as rater {raterId}")
+
+  def getHistoryOutcomes(self):
+    """
+    Reads the comparisons of the comparison history table.
+    :returns: list of (scanName, leftModel, rightModel, leftScore)
+    """
+    table = self.getParameterNode().GetNodeReference(self.SURVEY_RESULTS_TABLE).GetTable()
+    leftColumn = table.GetColumnByName("Model_L")
+    rightColumn = table.GetColumnByName("Model_R")
+    scoreColumn = table.GetColumnByName("Score_L")
+    outcomes = []
+    for rowIdx in range(table.GetNumberOfRows()):
+      leftName = leftColumn.GetValue(rowIdx)
+      rightName = rightColumn.GetValue(rowIdx)
+      if not leftName or not rightName:
+        continue
+      scanName, leftModel = self.patientSequenceAndModelFromName(leftName)
+      rightScanName, rightModel = self.patientSequenceAndModelFromName(rightName)
+      outcomes.append((scanName, leftModel, rightModel, scoreColumn.GetValue(rowIdx)))
+    return outcomes
+
+  def closeSharedStudy(self):
+    if self.coordinator is None:
+      return
+    try:
+      self.coordinator.close()
+    except sqlite3.Error as e:
+      logging.warning(f"Shared study could not be closed: {str(e)}")
+    self.coordinator = None
+    self.leasedPairs = set()
+
+  def getRatingColumns(self):
+    return [columnName for engine in self.ratingEngines for columnName in engine.COLUMNS]
+
+  def syncSharedState(self):
+    """
+    Replaces the ratings, games played, scan counts, pair coverage and pending rating period of this instance with the
+    shared state of all raters. Should be called in a transaction if the state is updated and written back.
+    :returns: None
+    """
+    state = self.coordinator.readState()
+    surveyDF = self.getSurveyTable()
+    for modelIdx, modelName in surveyDF["ModelName"].items():
+      modelState = state["models"].get(modelName)
+      if modelState is None:
+        continue
+      for columnName, value in modelState["Ratings"].items():
+        surveyDF.at[modelIdx, columnName] = value
+      surveyDF.at[modelIdx, "GamesPlayed"] = modelState["GamesPlayed"]
+      surveyDF.at[modelIdx, "TimeLastPlayed"] = pd.Timestamp(modelState["TimeLastPlayed"]) if modelState["TimeLastPlayed"] else pd.NaT
+
+    scansAndModelsDict = self.getScansAndModelsDict()
+    for scanGames in scansAndModelsDict.values():
+      for scanName in scanGames:
+        scanGames[scanName] = 0
+    self.pairCoverage = {}
+    self.pairGames = {}
+    for scanName, leftModel, rightModel, count in state["pairCounts"]:
+      for modelName in [leftModel, rightModel]:
+        if scanName in scansAndModelsDict.get(modelName, {}):
+          scansAndModelsDict[modelName][scanName] += count
+      modelName1, modelName2 = sorted([leftModel, rightModel])
+      self.pairCoverage[(modelName1, modelName2, scanName)] = self.pairCoverage.get((modelName1, modelName2, scanName), 0) + count
+      self.pairGames[(modelName1, modelName2)] = self.pairGames.get((modelName1, modelName2), 0) + count
+
+    self.pendingRatingPeriod = [tuple(comparison) for comparison in state["pending"]]
+    self.leasedPairs = {tuple(sorted([modelA, modelB])) + (scanName,) for scanName, modelA, modelB in state["leases"]}
+    self.setScansAndModelsDict(scansAndModelsDict)
+    self.setSurveyTable(surveyDF)
+
+  def loadSchedule(self, schedulePath):
+    """
+    Makes the next pairs follow a schedule file, starting after the comparisons already in the comparison history.
+    Must be called after discoverVolumes and setSurveyHistory.
+    :param schedulePath: csv file with the columns of SCHEDULE_COLUMNS, or empty to not use a schedule
+    :returns: None
+    """
+    self.schedule = None
+    self.schedulePosition = 0
+    if not schedulePath:
+      return
+    if self.coordinator is not None:
+      logging.warning("Schedules are not used in shared studies, because the schedule position is not shared")
+      return
+
+    scheduleDF = pd.read_csv(schedulePath, dtype=str)
+    missingCols = [col for col in self.SCHEDULE_COLUMNS if col not in scheduleDF.columns]
+    if missingCols:
+      raise Exception(f"Schedule file is missing columns: {missingCols}.")
+    missingVolumes = set()
+    for scanName, leftModel, rightModel in zip(scheduleDF["ScanName"], scheduleDF["LeftModel"], scheduleDF["RightModel"]):
+      for modelName in [leftModel, rightModel]:
+        volumeName = self.nameFromPatientSequenceAndModel(scanName, modelName)
+        if volumeName not in self.volumeEntries:
+          missingVolumes.add(volumeName)
+    if missingVolumes:
+      raise Exception(f"Volumes in schedule are not in the input folder: {sorted(missingVolumes)[:self.MAX_DISPLAYED_ERRORS]}")
+
+    self.schedule = list(zip(scheduleDF["ScanName"], scheduleDF["LeftModel"], scheduleDF["RightModel"]))
+    self.schedulePosition = min(self.getTotalComparisonCount(), len(self.schedule))
+    logging.info(f"Following schedule {schedulePath} from comparison {self.schedulePosition + 1} of {len(self.schedule)}")
+
+  def isScheduleComplete(self):
+    return self.schedule is not None and self.schedulePosition >= len(self.schedule)
+
+  def getScheduledVolumeNames(self):
+    """
+    Returns the names of the volumes of the remaining scheduled comparisons, in the order they are needed.
+    """
+    volumeNames = {}
+    for scanName, leftModel, rightModel in self.schedule[self.schedulePosition:]:
+      for modelName in [leftModel, rightModel]:
+        volumeNames.setdefault(self.nameFromPatientSequenceAndModel(scanName, modelName), None)
+    return list(volumeNames)
+
+  def readVolumeEntry(self, entry, inputType):
+    """
+    Reads the files of a volume. Does not use the scene, so it can run in a worker thread.
+    :param entry: volume entry from discoverVolumes
+    :param inputType: "2D" or "3D"
+    :returns: dict with the arrays and headers read
+    """
+    transcodeDirectory = entry.get("transcodeDirectory")
+    if "dataset" in entry:  # Volume in a study store
+      if inputType == "2D":
+        return {"indices": entry["indices"], "frames": self.readStoreFrames(entry["file"], entry["dataset"], entry["indices"])}
+      h5py = self.importH5py()
+      with profiler.span("readStoreVolume", dataset=entry["dataset"]):
+        with h5py.File(entry["file"], "r") as store:
+          dataset = store[entry["dataset"]]
+          return {"prediction": dataset[()], "ijkToRas": np.array(dataset.attrs["ijkToRas"])}
+    elif inputType == "2D":
+      frames = self.readFrames(entry["file"], entry["indices"], entry.get("cacheKey"), transcodeDirectory)
+      return {"indices": entry["indices"], "frames": frames}
+    elif transcodeDirectory is not None and entry.get("cacheKey") is not None:
+      data, header = self.readNrrdTranscoded(entry["file"], "C", entry["cacheKey"], transcodeDirectory)
+      return {"prediction": data, "header": header}
+    else:
+      data, header = self.readNrrd(entry["file"], indexOrder="C")
+      return {"prediction": data, "header": header}
+
+  def readUltrasoundFrames(self, entry, indices):
+    """
+    Reads the ultrasound frames of the scan of a 2D volume entry. Does not use the scene, so it can run in a worker thread.
+    :param entry: volume entry from discoverVolumes
+    :param indices: frame indices to read
+    :returns: numpy array of frames
+    """
+    scanName = entry["scanName"]
+    if "dataset" in entry:
+      return self.readStoreFrames(entry["file"], f"scans/{scanName}", indices)
+    ultrasoundFilename = os.path.join(os.path.dirname(entry["file"]), f"{scanName}.nrrd")
+    return self.readFrames(ultrasoundFilename, indices, entry.get("ultrasoundCacheKey"), entry.get("transcodeDirectory"))
+
+  @staticmethod
+  def padFrames(frames):
+    """
+    Converts frames to float and adds a blank first frame, because the first frame is not shown in surface models.
+    """
+    frames = frames.astype(float)
+    return np.insert(frames, 0, np.zeros(frames.shape[1:]), axis=0)
+
+  def getPrepareOptions(self, entry, inputType):
+    """
+    Decides in the main thread what prepareVolumeEntry does besides reading a volume. The ultrasound frames of a scan
+    are read with the first prediction of the scan, and pyramids are computed only if progressive display is on.
+    :param entry: volume entry from discoverVolumes
+    :param inputType: "2D" or "3D"
+    :returns: dict of keyword arguments for prepareVolumeEntry
+    """
+    scanName = entry["scanName"]
+    readUltrasound = (inputType == "2D" and scanName not in self.ultrasoundReadScans and
+                      not self.getParameterNode().GetNodeReference(scanName))
+    if readUltrasound:
+      self.ultrasoundReadScans.add(scanName)
+    buildPyramid = inputType == "3D" and slicer.util.settingsValue(
+      self.PROGRESSIVE_DISPLAY_SETTING, self.PROGRESSIVE_DISPLAY_DEFAULT, converter=slicer.util.toBool)
+    return {"readUltrasound": readUltrasound, "buildPyramid": buildPyramid}
+
+  def prepareVolumeEntry(self, entry, inputType, readUltrasound=False, buildPyramid=False):
+    """
+    Reads the files of a volume and prepares its arrays, so only node creation is left for the main thread.
+    2D frames are padded with a blank first frame, 3D predictions are cropped to their content, and intensity
+    statistics are measured. Does not use the scene, so it can run in a worker thread.
+    :param entry: volume entry from discoverVolumes
+    :param inputType: "2D" or "3D"
+    :param readUltrasound: whether the ultrasound frames of the scan are read too (2D only)
+    :param buildPyramid: whether downsampled levels are computed for progressive display (3D only)
+    :returns: dict from readVolumeEntry with prepared arrays, "statistics", and "ultrasound" or "pyramid" if requested
+    """
+    with profiler.span("prepareVolumeEntry", volume=entry["name"]):
+      readResult = self.readVolumeEntry(entry, inputType)
+      if inputType == "2D":
+        readResult["frames"] = self.padFrames(readResult["frames"])
+        readResult["statistics"] = self.computeIntensityStatistics(readResult["frames"])
+        if readUltrasound:
+          readResult["ultrasound"] = self.padFrames(self.readUltrasoundFrames(entry, readResult["indices"]))
+      else:
+        readResult["prediction"], readResult["statistics"] = self.cropArrayToContent(readResult["prediction"])
+        if buildPyramid:
+          readResult["pyramid"] = self.computePyramidLevels(readResult["prediction"])
+    return readResult
+
+  def getIJKToRASFromNrrdHeader(self, header):
+    """
+    Computes the IJK to RAS matrix of a nrrd file, or returns None if the header has no supported space information.
+    """
+    space = header.get("space")
+    if space not in ["left-posterior-superior", "right-anterior-superior"] or "space directions" not in header:
+      return None
+    ijkToRas = np.eye(4)
+    ijkToRas[:3, :3] = np.array(header["space directions"], dtype=float).T
+    ijkToRas[:3, 3] = header.get("space origin", np.zeros(3))
+    if space == "left-posterior-superior":
+      ijkToRas[:2, :] *= -1
+    return slicer.util.vtkMatrixFromArray(ijkToRas)
+
+  @profiler.profiled
+  def loadVolumeEntry(self, entry, readResult=None):
+    """
+    Creates the nodes of a volume, reading its files if they were not read in advance.
+    :param entry: volume entry from discoverVolumes
+    :param readResult: output of prepareVolumeEntry, or None to read now
+    :returns: None
+    """
     parameterNode = self.getParameterNode()
     inputType = parameterNode.GetParameter(self.INPUT_TYPE)
+    if readResult is None:
+      readResult = self.prepareVolumeEntry(entry, inputType, **self.getPrepareOptions(entry, inputType))
+    name = entry["name"]
+    scanName = entry["scanName"]
+    volumeStatisticsDict = self.getVolumeStatisticsDict()
 
-    # List nrrd volumes in indicated directory
-    print("Checking directory: " + directory)
-    volumesInDirectory = glob.glob(os.path.join(directory, "*_*_*.nrrd"))
+    # Load ultrasound sequence and predictions based on index file
+    if inputType == "2D":
+      indices = readResult["indices"]
+
+      # Load ultrasound frames if needed
+      ultrasoundVolume = parameterNode.GetNodeReference(scanName)
+      if not ultrasoundVolume:
+        ultrasoundArrayFromIndices = readResult.get("ultrasound")
+        if ultrasoundArrayFromIndices is None:  # The prediction that read the frames failed or is not loaded yet
+          ultrasoundArrayFromIndices = self.padFrames(self.readUltrasoundFrames(entry, indices))
+
+        # Convert to slicer volume
+        ultrasoundVolume = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLScalarVolumeNode", scanName)
+        slicer.util.updateVolumeFromArray(ultrasoundVolume, ultrasoundArrayFromIndices)
+        parameterNode.SetNodeReferenceID(scanName, ultrasoundVolume.GetID())
+
+      # Load segmentations
+      predictionArrayFromIndices = readResult["frames"]
+      volumeStatisticsDict[name] = readResult["statistics"]
+      predictionVolume = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLScalarVolumeNode", name)
+      slicer.util.updateVolumeFromArray(predictionVolume, predictionArrayFromIndices)
+      predictionVolume.CreateDefaultDisplayNodes()
+      predictionDisplayNode = predictionVolume.GetDisplayNode()
+      predictionDisplayNode.SetAndObserveColorNodeID("vtkMRMLColorTableNodeGreen")
+      parameterNode.SetNodeReferenceID(name, predictionVolume.GetID())
+
+      # Create model for contour visibility
+      predictionModelName = name + self.MODEL_SUFFIX
+      model = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLModelNode", predictionModelName)
+      model.CreateDefaultDisplayNodes()
+      modelDisplayNode = model.GetDisplayNode()
+      modelDisplayNode.SetColor(0, 1, 0)
+      modelDisplayNode.SetVisibility3D(False)
+      modelDisplayNode.SetVisibility2D(False)
+      modelDisplayNode.SetSliceIntersectionThickness(2)
+      parameterNode.SetNodeReferenceID(predictionModelName, model.GetID())
+
+      if not self.frameContoursEnabled:  # Otherwise contours are extracted for displayed frames only
+        # Create surface model from volume. The CLI runs in the background and fills the model when it completes.
+        parameters = {
+            "InputVolume": predictionVolume.GetID(),
+            "OutputGeometry": model.GetID(),
+            "Threshold": self.DEFAULT_THRESHOLD,
+            "Smooth": self.DEFAULT_SMOOTH,
+            "Decimate": self.DEFAULT_DECIMATE,
+            "SplitNormals": True,
+            "PointNormals": True
+        }
+        cliNode = slicer.cli.run(slicer.modules.grayscalemodelmaker, None, parameters)
+        cliNode.AddObserver(slicer.vtkMRMLCommandLineModuleNode.StatusModifiedEvent, self.onModelMakerStatusModified)
 
-    if volumesInDirectory:
-      print("Found volumes: " + str(volumesInDirectory))
+    else:
+      if "ijkToRas" in readResult:
+        ijkToRas = slicer.util.vtkMatrixFromArray(readResult["ijkToRas"])
+      else:
+        ijkToRas = self.getIJKToRASFromNrrdHeader(readResult["header"])
+      if ijkToRas is not None:
+        # Prediction was cropped in prepareVolumeEntry
+        loadedVolume = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLScalarVolumeNode", name)
+        slicer.util.updateVolumeFromArray(loadedVolume, readResult["prediction"])
+        self.setCroppedGeometry(loadedVolume, ijkToRas, readResult["statistics"])
+        volumeStatisticsDict[name] = readResult["statistics"]
+        pyramidLevels = readResult.get("pyramid")
+      else:
+        with profiler.span("slicer.util.loadVolume", file=os.path.basename(entry["file"])):
+          loadedVolume = slicer.util.loadVolume(entry["file"])
+        loadedVolume.SetName(name)
+        volumeStatisticsDict[name] = self.cropVolumeToContent(loadedVolume)
+        pyramidLevels = None
+      if slicer.util.settingsValue(self.PROGRESSIVE_DISPLAY_SETTING, self.PROGRESSIVE_DISPLAY_DEFAULT, converter=slicer.util.toBool):
+        self.volumePyramids[name] = self.buildVolumePyramid(loadedVolume, pyramidLevels)
+      parameterNode.SetNodeReferenceID(name, loadedVolume.GetID())
+
+    self.setVolumeStatisticsDict(volumeStatisticsDict)
+    self.residentVolumes.add(name)
+
+  def onModelMakerStatusModified(self, cliNode, event):
+    """
+    Removes the grayscale model maker CLI node of a 2D prediction when it completes, logging errors.
+    """
+    if cliNode.IsBusy():
+      return
+    if cliNode.GetStatus() & cliNode.ErrorsMask:
+      logging.error(f"Model maker failed for {cliNode.GetParameterAsString('InputVolume')}: {cliNode.GetErrorText()}")
+    slicer.mrmlScene.RemoveNode(cliNode)
+
+  @profiler.profiled
+  def loadVolumes(self, directory):
+    """
+    Loads all volumes that will be compared, reading files in worker threads.
+    :param directory: folder with [patient_id]_[AI_model_name]_[sequence_name].nrrd files
+    :returns: None
+    """
+    volumeEntries = self.discoverVolumes(directory)
+    inputType = self.getParameterNode().GetParameter(self.INPUT_TYPE)
+    prepareOptions = [self.getPrepareOptions(entry, inputType) for entry in volumeEntries]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=self.LOADING_THREADS) as executor:
+      readResults = executor.map(lambda entry, options: self.prepareVolumeEntry(entry, inputType, **options),
+                                 volumeEntries, prepareOptions)
+      for entry, readResult in zip(volumeEntries, readResults):
+        self.loadVolumeEntry(entry, readResult)
+
+  @staticmethod
+  def countBits(packedMasks):
+    """
+    Counts set bits along the last axis of bit-packed masks.
+    :param packedMasks: uint8 array from numpy.packbits
+    :returns: int64 array of counts
+    """
+    if hasattr(np, "bitwise_count"):  # numpy 2.0
+      return np.bitwise_count(packedMasks).sum(axis=-1, dtype=np.int64)
+    return SegmentationComparisonLogic.POPCOUNT_TABLE[packedMasks].sum(axis=-1, dtype=np.int64)
 
-      # Load found volumes and create dictionary with their data
-      scansAndModelsDict = {}
-      for volumeFile in volumesInDirectory:
-        name = os.path.splitext(os.path.basename(volumeFile))[0]  # remove file extension
-        patiendId, modelName, sequenceName = name.split('_')
-        scanName = patiendId + "_" + sequenceName
+  def getSimilarityCacheKey(self, scanEntries):
+    """
+    Identifies the input files of a scan and the similarity settings, for the similarity cache.
+    """
+    fileKeys = []
+    for entry in sorted(scanEntries, key=lambda entry: entry["modelName"]):
+      fileKey = entry.get("cacheKey")
+      if fileKey is None:  # Study store or file not in the manifest
+        fileKey = self.getFileFingerprint(entry["file"], os.path.getsize(entry["file"])) + ":" + entry.get("dataset", "")
+      fileKeys.append([entry["modelName"], fileKey])
+    keyText = json.dumps([self.SIMILARITY_VERSION, self.SIMILARITY_MASK_LEVEL, fileKeys])
+    return hashlib.sha1(keyText.encode("utf-8")).hexdigest()[:24]
+
+  def computeScanSimilarity(self, scanName, scanEntries, inputType):
+    """
+    Computes Dice score, volume difference and mean surface distance between the predictions of all pairs of models
+    on a scan. Predictions are thresholded and bit-packed, so overlaps of all pairs are counted with a few vectorized
+    operations. Surface distances are in voxels, and only computed if scipy is available.
+    Results are cached on disk. Does not use the scene, so it can run in a worker thread.
+    :param scanName: patient_sequence name
+    :param scanEntries: volume entries of the scan, one per model
+    :param inputType: "2D" or "3D"
+    :returns: list of dicts with the columns of SIMILARITY_COLUMNS
+    """
+    cacheDirectory = os.path.join(self.getCacheDirectory(os.path.dirname(scanEntries[0]["file"])), "similarity")
+    cachePath = os.path.join(cacheDirectory, self.getSimilarityCacheKey(scanEntries) + ".json")
+    if os.path.exists(cachePath):
+      try:
+        with open(cachePath) as f:
+          return json.load(f)
+      except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable similarity cache of {scanName}: {str(e)}")
+
+    modelNames = []
+    masks = []
+    with profiler.span("similarity.mask", scan=scanName):
+      for entry in sorted(scanEntries, key=lambda entry: entry["modelName"]):
+        readResult = self.readVolumeEntry(entry, inputType)
+        prediction = readResult["frames"] if inputType == "2D" else readResult["prediction"]
+        maximum = prediction.max() if prediction.size else 0
+        modelNames.append(entry["modelName"])
+        masks.append(prediction > self.SIMILARITY_MASK_LEVEL * maximum if maximum > 0 else np.zeros(prediction.shape, dtype=bool))
 
-        if modelName in scansAndModelsDict:
-          scansAndModelsDict[modelName][scanName] = 0
-        else:
-          scansAndModelsDict[modelName] = {scanName: 0}
-        
-        # Load ultrasound sequence and predictions based on index file
-        if inputType == "2D":
-          parentDir = os.path.abspath(os.path.join(volumeFile, os.pardir))
-          with open(os.path.join(parentDir, f"{scanName}_indices.json")) as f:
-            indices = json.load(f)["indices"]
-
-          # Load ultrasound frames if needed
-          ultrasoundVolume = parameterNode.GetNodeReference(scanName)
-          if not ultrasoundVolume:
-            ultrasoundFilename = os.path.join(parentDir, f"{scanName}.nrrd")
-            ultrasoundArray = nrrd.read(ultrasoundFilename)[0]
-            ultrasoundArrayFromIndices = np.zeros((len(indices), ultrasoundArray.shape[1], ultrasoundArray.shape[2]))
-            for i in range(len(indices)):
-              ultrasoundArrayFromIndices[i] = ultrasoundArray[indices[i], :, :, 0]
-            
-            # For some reason, the first frame is not shown in surface models, so we add a blank frame
-            ultrasoundArrayFromIndices = np.insert(
-              ultrasoundArrayFromIndices, 0, np.zeros((ultrasoundArray.shape[1], ultrasoundArray.shape[2])), axis=0
-            )
-            
-            # Convert to slicer volume
-            ultrasoundVolume = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLScalarVolumeNode", scanName)
-            slicer.util.updateVolumeFromArray(ultrasoundVolume, ultrasoundArrayFromIndices)
-            parameterNode.SetNodeReferenceID(scanName, ultrasoundVolume.GetID())
-          
-          # Load segmentations
-          predictionArray = nrrd.read(volumeFile)[0]
-          predictionArrayFromIndices = np.zeros((len(indices), predictionArray.shape[1], predictionArray.shape[2]))
-          for i in range(len(indices)):
-            predictionArrayFromIndices[i] = predictionArray[indices[i], :, :, 0]
-          predictionArrayFromIndices = np.insert(
-            predictionArrayFromIndices, 0, np.zeros((predictionArray.shape[1], predictionArray.shape[2])), axis=0
-          )
-          predictionVolume = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLScalarVolumeNode", name)
-          slicer.util.updateVolumeFromArray(predictionVolume, predictionArrayFromIndices)
-          predictionVolume.CreateDefaultDisplayNodes()
-          predictionDisplayNode = predictionVolume.GetDisplayNode()
-          predictionDisplayNode.SetAndObserveColorNodeID("vtkMRMLColorTableNodeGreen")
-          parameterNode.SetNodeReferenceID(name, predictionVolume.GetID())
-
-          # Create model for contour visibility
-          predictionModelName = name + self.MODEL_SUFFIX
-          model = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLModelNode", predictionModelName)
-          model.CreateDefaultDisplayNodes()
-          modelDisplayNode = model.GetDisplayNode()
-          modelDisplayNode.SetColor(0, 1, 0)
-          modelDisplayNode.SetVisibility3D(False)
-          modelDisplayNode.SetVisibility2D(False)
-          modelDisplayNode.SetSliceIntersectionThickness(2)
-          parameterNode.SetNodeReferenceID(predictionModelName, model.GetID())
-
-          # Create surface model from volume
-          parameters = {
-              "InputVolume": predictionVolume.GetID(),
-              "OutputGeometry": model.GetID(),
-              "Threshold": self.DEFAULT_THRESHOLD,
-              "Smooth": self.DEFAULT_SMOOTH,
-              "Decimate": self.DEFAULT_DECIMATE,
-              "SplitNormals": True,
-              "PointNormals": True
-          }
-          modelMaker = slicer.modules.grayscalemodelmaker
-
-          # Run the CLI
-          cliNode = slicer.cli.runSync(modelMaker, None, parameters)
-
-          # Process results
-          if cliNode.GetStatus() & cliNode.ErrorsMask:
-              # error
-              errorText = cliNode.GetErrorText()
-              slicer.mrmlScene.RemoveNode(cliNode)
-              raise ValueError("CLI execution failed: " + errorText)
-          # success
-          slicer.mrmlScene.RemoveNode(cliNode)
-
-          # Extract largest portion
-          connectivityFilter = vtk.vtkPolyDataConnectivityFilter()
-          connectivityFilter.SetInputData(model.GetPolyData())
-          connectivityFilter.SetExtractionModeToLargestRegion()
-
-          # Clean up model
-          cleanFilter = vtk.vtkCleanPolyData()
-          cleanFilter.SetInputConnection(connectivityFilter.GetOutputPort())
+    try:
+      import scipy.ndimage
+    except ImportError:
+      scipy = None
+
+    rows = []
+    with profiler.span("similarity.pairs", scan=scanName, models=len(modelNames)):
+      # Models with the same mask shape are compared together
+      for shape in set(mask.shape for mask in masks):
+        indices = [i for i, mask in enumerate(masks) if mask.shape == shape]
+        packedMasks = np.stack([np.packbits(masks[i].ravel()) for i in indices])
+        voxelCounts = self.countBits(packedMasks)
+        surfaceDistanceSums = np.full((len(indices), len(indices)), np.nan)  # [a, b]: from surface of a to mask of b
+        if scipy is not None:
+          surfaces = [self.getSurface(masks[i], scipy.ndimage, inputType) for i in indices]
+          surfaceCounts = [int(surface.sum()) for surface in surfaces]
+          # One distance map at a time, sampled on the surfaces of all other models
+          for b, maskIndex in enumerate(indices):
+            if not masks[maskIndex].any():
+              continue
+            distanceMap = self.getDistanceMap(masks[maskIndex], scipy.ndimage, inputType)
+            for a in range(len(indices)):
+              if a != b:
+                surfaceDistanceSums[a, b] = distanceMap[surfaces[a]].sum()
+        for a in range(len(indices) - 1):
+          overlaps = self.countBits(packedMasks[a] & packedMasks[a + 1:])
+          for offset, overlap in enumerate(overlaps):
+            b = a + 1 + offset
+            countSum = voxelCounts[a] + voxelCounts[b]
+            meanSurfaceDistance = float("nan")
+            if scipy is not None and surfaceCounts[a] and surfaceCounts[b]:
+              meanSurfaceDistance = float((surfaceDistanceSums[a, b] + surfaceDistanceSums[b, a]) /
+                                          (surfaceCounts[a] + surfaceCounts[b]))
+            rows.append({
+              "ScanName": scanName,
+              "ModelA": modelNames[indices[a]],
+              "ModelB": modelNames[indices[b]],
+              "Dice": float(2 * overlap / countSum) if countSum else 1.0,
+              "VolumeDifference": float(abs(int(voxelCounts[a]) - int(voxelCounts[b])) / max(voxelCounts[a], voxelCounts[b])) if countSum else 0.0,
+              "MeanSurfaceDistance": meanSurfaceDistance,
+            })
 
-        else:
-          loadedVolume = slicer.util.loadVolume(volumeFile)
-          loadedVolume.SetName(name)
-          parameterNode.SetNodeReferenceID(name, loadedVolume.GetID())
+    try:
+      os.makedirs(cacheDirectory, exist_ok=True)
+      temporaryPath = f"{cachePath}.{os.getpid()}.{threading.get_ident()}.tmp"  # Renamed when complete, so partial files are never read
+      with open(temporaryPath, "w") as f:
+        json.dump(rows, f)
+      os.replace(temporaryPath, cachePath)
+    except OSError as e:
+      logging.warning(f"Similarity of {scanName} could not be cached: {str(e)}")
+    return rows
+
+  @staticmethod
+  def getSurface(mask, ndimage, inputType):
+    """
+    Foreground voxels with a background neighbor, within each frame for 2D predictions.
+    """
+    structure = ndimage.generate_binary_structure(2, 1)[np.newaxis] if inputType == "2D" else None
+    return mask & ~ndimage.binary_erosion(mask, structure=structure)
 
-      self.setScansAndModelsDict(scansAndModelsDict)
+  @staticmethod
+  def getDistanceMap(mask, ndimage, inputType):
+    """
+    Distance of each voxel to the closest foreground voxel, per frame for 2D predictions.
+    """
+    if inputType == "2D":
+      return np.stack([ndimage.distance_transform_edt(~frame) if frame.any() else np.full(frame.shape, np.inf)
+                       for frame in mask])
+    return ndimage.distance_transform_edt(~mask) if mask.any() else np.full(mask.shape, np.inf)
+
+  @profiler.profiled
+  def computeSimilarity(self, volumeEntries, inputType):
+    """
+    Computes the similarity of the predictions of all pairs of models on all scans, in parallel across scans.
+    Does not use the scene, so it can run in a worker thread.
+    :param volumeEntries: list of volume entries, e.g. from discoverVolumes
+    :param inputType: "2D" or "3D"
+    :returns: dataframe with the columns of SIMILARITY_COLUMNS
+    """
+    entriesByScan = {}
+    for entry in volumeEntries:
+      entriesByScan.setdefault(entry["scanName"], []).append(entry)
+    scanNames = sorted(scanName for scanName, scanEntries in entriesByScan.items() if len(scanEntries) > 1)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=self.LOADING_THREADS) as executor:
+      results = executor.map(lambda scanName: self.computeScanSimilarity(scanName, entriesByScan[scanName], inputType), scanNames)
+      rows = [row for scanRows in results for row in scanRows]
+    return pd.DataFrame(rows, columns=self.SIMILARITY_COLUMNS)
+
+  def startSimilarityComputation(self):
+    """
+    Computes the similarity of all pairs of the loaded study in a worker thread. Pair schedulers use it when it is done.
+    """
+    self.cancelSimilarityComputation()
+    inputType = self.getParameterNode().GetParameter(self.INPUT_TYPE)
+    self.similarityExecutor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    self.similarityFuture = self.similarityExecutor.submit(self.computeSimilarity, list(self.volumeEntries.values()), inputType)
+
+  def cancelSimilarityComputation(self):
+    if self.similarityFuture is not None:
+      self.similarityFuture.cancel()
+      self.similarityFuture = None
+    if self.similarityExecutor is not None:
+      self.similarityExecutor.shutdown(wait=False)
+      self.similarityExecutor = None
+
+  def setPairSimilarity(self, similarityDF):
+    self.pairSimilarity = {}
+    diceSums = {}
+    for row in similarityDF.itertuples(index=False):
+      modelName1, modelName2 = sorted([row.ModelA, row.ModelB])
+      self.pairSimilarity[(modelName1, modelName2, row.ScanName)] = {
+        "Dice": row.Dice, "VolumeDifference": row.VolumeDifference, "MeanSurfaceDistance": row.MeanSurfaceDistance}
+      diceSum, count = diceSums.get((modelName1, modelName2), (0.0, 0))
+      diceSums[(modelName1, modelName2)] = (diceSum + row.Dice, count + 1)
+    self.pairMeanDice = {pair: diceSum / count for pair, (diceSum, count) in diceSums.items()}
+
+  def updatePairSimilarity(self):
+    """
+    Takes the results of the background similarity computation if it finished.
+    """
+    if self.similarityFuture is None or not self.similarityFuture.done():
+      return
+    future = self.similarityFuture
+    self.similarityFuture = None
+    self.similarityExecutor.shutdown(wait=False)
+    self.similarityExecutor = None
+    try:
+      self.setPairSimilarity(future.result())
+      logging.info(f"Pair similarity computed for {len(self.pairSimilarity)} model pair and scan combinations")
+    except Exception as e:
+      logging.error(f"Pair similarity could not be computed: {str(e)}")
+
+  def isNearDuplicatePair(self, modelName1, modelName2, scanName=None):
+    """
+    Whether two models have near-identical predictions, on a scan or on average over scans.
+    False if similarity was not computed.
+    """
+    modelName1, modelName2 = sorted([modelName1, modelName2])
+    if scanName is None:
+      dice = self.pairMeanDice.get((modelName1, modelName2))
     else:
-      slicer.util.errorDisplay("Ensure volumes follow the naming convention: "
-                               "[patient_id]_[AI_model_name]_[sequence_name].nrrd")
+      dice = self.pairSimilarity.get((modelName1, modelName2, scanName), {}).get("Dice")
+    return dice is not None and dice >= self.getParameter(self.NEAR_DUPLICATE_DICE)
+
+  def saveSimilarity(self, outputDirectory):
+    """
+    Saves the similarity of all pairs of models on all scans as csv. Computes it first if needed.
+    :returns: path of the saved file
+    """
+    self.updatePairSimilarity()
+    if self.similarityFuture is not None:
+      self.similarityFuture.result()  # Wait for the background computation
+      self.updatePairSimilarity()
+    if not self.pairSimilarity:
+      inputType = self.getParameterNode().GetParameter(self.INPUT_TYPE)
+      self.setPairSimilarity(self.computeSimilarity(list(self.volumeEntries.values()), inputType))
+    rows = [{"ScanName": scanName, "ModelA": modelName1, "ModelB": modelName2, **metrics}
+            for (modelName1, modelName2, scanName), metrics in sorted(self.pairSimilarity.items())]
+    similarityPath = os.path.join(outputDirectory, "similarity_" + time.strftime("%Y%m%d-%H%M%S") + ".csv")
+    pd.DataFrame(rows, columns=self.SIMILARITY_COLUMNS).to_csv(similarityPath, index=False)
+    return similarityPath
+
+  def isPairResident(self, scanName, leftModel, rightModel):
+    return (self.nameFromPatientSequenceAndModel(scanName, leftModel) in self.residentVolumes and
+            self.nameFromPatientSequenceAndModel(scanName, rightModel) in self.residentVolumes)
+
+  def loadPair(self, scanName, models):
+    """
+    Loads the volumes of a pair right away, if they are not resident yet.
+    :param scanName: patient_sequence name
+    :param models: list of AI model names
+    :returns: None
+    """
+    for modelName in models:
+      name = self.nameFromPatientSequenceAndModel(scanName, modelName)
+      if name in self.residentVolumes or name not in self.volumeEntries:
+        continue
+      future = self.loadingFutures.pop(name, None)
+      readResult = future.result() if future is not None else None
+      self.loadingQueue = deque(entry for entry in self.loadingQueue if entry["name"] != name)
+      with profiler.span("loadPair", volume=name):
+        self.loadVolumeEntry(self.volumeEntries[name], readResult)
+
+  def startBackgroundLoading(self, progressCallback=None):
+    """
+    Loads the volumes that are not resident yet, one per Qt event loop iteration, in the order of discoverVolumes.
+    If a schedule is loaded, only the volumes it needs are loaded, in the order they are needed.
+    Files are read ahead in worker threads, nodes are created in the main thread.
+    :param progressCallback: called with the number of resident volumes and the total number of volumes to load
+    :returns: None
+    """
+    self.cancelBackgroundLoading()
+    volumeNames = self.getScheduledVolumeNames() if self.schedule is not None else list(self.volumeEntries)
+    self.loadingQueue = deque(self.volumeEntries[name] for name in volumeNames if name not in self.residentVolumes)
+    self.loadingTotal = len(self.residentVolumes) + len(self.loadingQueue)
+    self.loadingProgressCallback = progressCallback
+    self.loadingExecutor = concurrent.futures.ThreadPoolExecutor(max_workers=self.LOADING_THREADS)
+    self.reportLoadingProgress()
+    if self.loadingQueue:
+      self.loadingTimer.start()
+
+  def cancelBackgroundLoading(self):
+    """
+    Stops background loading. Volumes loaded so far stay resident.
+    """
+    self.loadingTimer.stop()
+    self.loadingQueue = deque()
+    for future in self.loadingFutures.values():
+      future.cancel()
+    self.loadingFutures = {}
+    self.ultrasoundReadScans = set()
+    if self.loadingExecutor is not None:
+      self.loadingExecutor.shutdown(wait=False)
+      self.loadingExecutor = None
+    self.reportLoadingProgress()
+
+  def isBackgroundLoading(self):
+    return self.loadingTimer.isActive()
+
+  def reportLoadingProgress(self):
+    if self.loadingProgressCallback is not None:
+      self.loadingProgressCallback(len(self.residentVolumes), self.loadingTotal)
+
+  def onLoadingTimeout(self):
+    """
+    Creates the nodes of the next volume in the loading queue when its files have been read.
+    """
+    if not self.loadingQueue:
+      self.cancelBackgroundLoading()  # The last queued volumes were loaded by loadPair
+      return
+
+    inputType = self.getParameterNode().GetParameter(self.INPUT_TYPE)
+    for entry in list(self.loadingQueue)[:self.LOADING_READ_AHEAD]:
+      if entry["name"] not in self.loadingFutures:
+        self.loadingFutures[entry["name"]] = self.loadingExecutor.submit(
+          self.prepareVolumeEntry, entry, inputType, **self.getPrepareOptions(entry, inputType))
+
+    entry = self.loadingQueue[0]
+    future = self.loadingFutures[entry["name"]]
+    if not future.done():
+      return  # Check again on next timeout
+    self.loadingQueue.popleft()
+    del self.loadingFutures[entry["name"]]
+    try:
+      self.loadVolumeEntry(entry, future.result())
+    except Exception as e:
+      logging.error(f"Failed to load {entry['file']}: {str(e)}")
+
+    if not self.loadingQueue:
+      self.cancelBackgroundLoading()  # Releases the worker threads
+    else:
+      self.reportLoadingProgress()
+
+  def computeIntensityStatistics(self, array):
+    """
+    Measures intensity statistics of a volume array.
+    :param array: numpy array of voxel values
+    :returns: dict with min, max, mean and number of non-zero voxels
+    """
+    return {
+      "min": float(array.min()),
+      "max": float(array.max()),
+      "mean": float(array.mean()),
+      "nonZeroVoxels": int(np.count_nonzero(array)),
+    }
+
+  @profiler.profiled
+  def cropVolumeToContent(self, volumeNode):
+    """
+    Crops a volume to the bounding box of its non-zero voxels, keeping CROP_MARGIN voxels around it. The origin is
+    shifted so the remaining voxels stay at the same physical position, and the camera and slice views are unchanged.
+    :param volumeNode: vtkMRMLScalarVolumeNode
+    :returns: dict of intensity statistics, with the full dimensions and crop extent [i0, i1, j0, j1, k0, k1] (inclusive)
+    """
+    array = slicer.util.arrayFromVolume(volumeNode)
+    croppedArray, statistics = self.cropArrayToContent(array)
+    if croppedArray.size < array.size:
+      ijkToRas = vtk.vtkMatrix4x4()
+      volumeNode.GetIJKToRASMatrix(ijkToRas)
+      slicer.util.updateVolumeFromArray(volumeNode, croppedArray)
+      self.setCroppedGeometry(volumeNode, ijkToRas, statistics)
+    return statistics
+
+  def setCroppedGeometry(self, volumeNode, ijkToRas, statistics):
+    """
+    Sets the geometry of a volume cropped by cropArrayToContent, so its voxels stay where they were before cropping.
+    :param volumeNode: vtkMRMLScalarVolumeNode with the cropped voxels
+    :param ijkToRas: IJK to RAS matrix of the uncropped volume
+    :param statistics: dict from cropArrayToContent
+    """
+    i0, i1, j0, j1, k0, k1 = statistics["cropExtent"]
+    volumeNode.SetIJKToRASMatrix(ijkToRas)
+    volumeNode.SetOrigin(ijkToRas.MultiplyPoint([i0, j0, k0, 1])[:3])
+    croppedDimensions = [i1 - i0 + 1, j1 - j0 + 1, k1 - k0 + 1]
+    if croppedDimensions != statistics["dimensions"]:
+      logging.debug(f"Cropped {volumeNode.GetName()} from {statistics['dimensions']} to {croppedDimensions} voxels")
+
+  @staticmethod
+  def copyArray(array):
+    # Memory mapped arrays are copied too, so their file is read by the calling thread
+    return np.array(array) if isinstance(array, np.memmap) else np.ascontiguousarray(array)
+
+  def cropArrayToContent(self, array):
+    """
+    Crops a volume array to the bounding box of its non-zero voxels, keeping CROP_MARGIN voxels around it.
+    Does not use the scene, so it can run in a worker thread.
+    :param array: numpy array indexed as [k, j, i]
+    :returns: tuple of the cropped contiguous array and the dict of intensity statistics of cropVolumeToContent
+    """
+    dimensions = [array.shape[2], array.shape[1], array.shape[0]]
+
+    # Two passes over the voxels: one projection along K gives the I and J ranges, one reduction per slice gives K
+    nonEmptyJI = np.any(array, axis=0)
+    nonEmptyK = np.any(array.reshape(array.shape[0], -1), axis=1)
+    nonEmptyI = np.flatnonzero(np.any(nonEmptyJI, axis=0))
+    nonEmptyJ = np.flatnonzero(np.any(nonEmptyJI, axis=1))
+    nonEmptyK = np.flatnonzero(nonEmptyK)
+
+    if nonEmptyK.size == 0:
+      statistics = self.computeIntensityStatistics(array)
+      statistics["dimensions"] = dimensions
+      statistics["cropExtent"] = [0, dimensions[0] - 1, 0, dimensions[1] - 1, 0, dimensions[2] - 1]
+      return self.copyArray(array), statistics
+
+    cropExtent = []
+    for nonEmpty, size in [(nonEmptyI, dimensions[0]), (nonEmptyJ, dimensions[1]), (nonEmptyK, dimensions[2])]:
+      cropExtent.append(max(0, int(nonEmpty[0]) - self.CROP_MARGIN))
+      cropExtent.append(min(size - 1, int(nonEmpty[-1]) + self.CROP_MARGIN))
+    i0, i1, j0, j1, k0, k1 = cropExtent
+
+    croppedArray = array[k0:k1 + 1, j0:j1 + 1, i0:i1 + 1]
+    statistics = self.computeIntensityStatistics(croppedArray)
+    if croppedArray.size < array.size:
+      statistics["min"] = min(statistics["min"], 0.0)  # Cropped voxels were all zero
+    statistics["mean"] = statistics["mean"] * croppedArray.size / array.size
+    statistics["dimensions"] = dimensions
+    statistics["cropExtent"] = cropExtent
+    return self.copyArray(croppedArray), statistics
+
+  def computePyramidLevels(self, array):
+    """
+    Creates downsampled copies of a volume array by averaging blocks of voxels, for each of PYRAMID_SHRINK_FACTORS.
+    Levels that would have less than two voxels along an axis are skipped. Does not use the scene, so it can run in a
+    worker thread.
+    :param array: numpy array indexed as [k, j, i]
+    :returns: list of (shrink factor, downsampled array), fine to coarse
+    """
+    levels = []
+    for factor in self.PYRAMID_SHRINK_FACTORS:
+      if min(array.shape) < 2 * factor:
+        break
+      shape = [size // factor for size in array.shape]
+      blocks = array[:shape[0] * factor, :shape[1] * factor, :shape[2] * factor].reshape(
+        shape[0], factor, shape[1], factor, shape[2], factor)
+      levels.append((factor, blocks.mean(axis=(1, 3, 5), dtype=np.float32).astype(array.dtype)))
+    return levels
+
+  @profiler.profiled
+  def buildVolumePyramid(self, volumeNode, levels=None):
+    """
+    Creates the downsampled images of a volume for progressive display.
+    :param volumeNode: vtkMRMLScalarVolumeNode
+    :param levels: output of computePyramidLevels for the voxels of the volume, or None to compute them now
+    :returns: list of (shrink factor, vtkImageData, IJK to RAS matrix of the downsampled image), fine to coarse
+    """
+    from vtk.util.numpy_support import get_vtk_array_type, numpy_to_vtk
+
+    if levels is None:
+      levels = self.computePyramidLevels(slicer.util.arrayFromVolume(volumeNode))
+    ijkToRas = vtk.vtkMatrix4x4()
+    volumeNode.GetIJKToRASMatrix(ijkToRas)
+
+    pyramid = []
+    for factor, levelArray in levels:
+      # Geometry is stored in the volume node, like in all Slicer volumes
+      levelImageData = vtk.vtkImageData()
+      levelImageData.SetDimensions(levelArray.shape[2], levelArray.shape[1], levelArray.shape[0])
+      levelImageData.GetPointData().SetScalars(
+        numpy_to_vtk(levelArray.ravel(), deep=True, array_type=get_vtk_array_type(levelArray.dtype)))
+
+      # Averaged voxel i covers full resolution voxels i*factor .. i*factor+factor-1
+      shrinkMatrix = vtk.vtkMatrix4x4()
+      for axis in range(3):
+        shrinkMatrix.SetElement(axis, axis, factor)
+        shrinkMatrix.SetElement(axis, 3, (factor - 1) / 2.0)
+      levelIjkToRas = vtk.vtkMatrix4x4()
+      vtk.vtkMatrix4x4.Multiply4x4(ijkToRas, shrinkMatrix, levelIjkToRas)
+
+      pyramid.append((factor, levelImageData, levelIjkToRas))
+    return pyramid
+
+  def getPreviewVolume(self, viewTag):
+    """
+    Returns the volume node used to show downsampled volumes in a view, creating it if needed.
+    :param viewTag: singleton tag of the view node
+    :returns: vtkMRMLScalarVolumeNode
+    """
+    parameterNode = self.getParameterNode()
+    referenceName = self.PREVIEW_VOLUME + viewTag
+    previewVolume = parameterNode.GetNodeReference(referenceName)
+    if previewVolume is None:
+      previewVolume = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLScalarVolumeNode", referenceName)
+      previewVolume.SetHideFromEditors(True)
+      previewVolume.SetSaveWithScene(False)
+      parameterNode.SetNodeReferenceID(referenceName, previewVolume.GetID())
+    return previewVolume
+
+  def showPreviewVolume(self, viewTag, volumeNode, volumeDisplayNode):
+    """
+    Shows the coarsest pyramid level of a volume in a view with the same volume property as the full resolution volume.
+    :param viewTag: singleton tag of the view node
+    :param volumeNode: full resolution volume
+    :param volumeDisplayNode: volume rendering display node of the full resolution volume
+    :returns: True if a preview is shown, False if the volume has no downsampled levels
+    """
+    if volumeNode.GetName() not in self.volumePyramids:
+      # Loaded while progressive display was off
+      self.volumePyramids[volumeNode.GetName()] = self.buildVolumePyramid(volumeNode)
+    pyramid = self.volumePyramids[volumeNode.GetName()]
+    if not pyramid:
+      return False
+
+    factor, levelImageData, levelIjkToRas = pyramid[-1]
+    previewVolume = self.getPreviewVolume(viewTag)
+    previewVolume.SetAndObserveImageData(levelImageData)
+    previewVolume.SetIJKToRASMatrix(levelIjkToRas)
+
+    vrLogic = slicer.modules.volumerendering.logic()
+    previewDisplayNode = vrLogic.GetFirstVolumeRenderingDisplayNode(previewVolume)
+    if previewDisplayNode is None:
+      vrLogic.CreateDefaultVolumeRenderingNodes(previewVolume)
+      previewDisplayNode = vrLogic.GetFirstVolumeRenderingDisplayNode(previewVolume)
+    previewDisplayNode.SetAndObserveVolumePropertyNodeID(volumeDisplayNode.GetVolumePropertyNodeID())
+    previewDisplayNode.SetViewNodeIDs(volumeDisplayNode.GetViewNodeIDs())
+    previewDisplayNode.SetVisibility(True)
+    self.pendingRefinements[viewTag] = volumeNode.GetName()
+    return True
+
+  def releaseVolumePyramids(self):
+    """
+    Replaces preview volumes with full resolution volumes and deletes all downsampled levels, e.g. when progressive
+    display is turned off.
+    """
+    self.refineDisplay()  # Hides preview volumes
+    parameterNode = self.getParameterNode()
+    for viewTag in ["1", "2"]:
+      previewVolume = parameterNode.GetNodeReference(self.PREVIEW_VOLUME + viewTag)
+      if previewVolume is not None:
+        previewVolume.SetAndObserveImageData(None)
+    self.volumePyramids = {}
+
+  def hidePreviewVolumes(self):
+    """
+    Hides downsampled volumes in all views.
+    """
+    parameterNode = self.getParameterNode()
+    vrLogic = slicer.modules.volumerendering.logic()
+    for viewTag in ["1", "2"]:
+      previewVolume = parameterNode.GetNodeReference(self.PREVIEW_VOLUME + viewTag)
+      if previewVolume is None:
+        continue
+      previewDisplayNode = vrLogic.GetFirstVolumeRenderingDisplayNode(previewVolume)
+      if previewDisplayNode is not None:
+        previewDisplayNode.SetVisibility(False)
+    self.pendingRefinements = {}
+
+  def refineDisplay(self):
+    """
+    Replaces downsampled preview volumes with the full resolution volumes they stand for.
+    """
+    if not self.pendingRefinements:
+      return
+    parameterNode = self.getParameterNode()
+    vrLogic = slicer.modules.volumerendering.logic()
+    volumeNames = list(self.pendingRefinements.values())
+    self.hidePreviewVolumes()
+    for volumeName in volumeNames:
+      volumeNode = parameterNode.GetNodeReference(volumeName)
+      if volumeNode is None:
+        continue
+      displayNode = vrLogic.GetFirstVolumeRenderingDisplayNode(volumeNode)
+      if displayNode is not None:
+        displayNode.SetVisibility(True)
+    self.observeFirstRender()
+
+  @profiler.profiled
+  def getFrameContour(self, volumeNode, frameIndex):
+    """
+    Extracts the contour of a 2D prediction in one frame with marching squares, or returns it from the cache.
+    The contour is extruded by one frame spacing, so the slice views show it as a slice intersection.
+    :param volumeNode: prediction volume, frames along the K axis
+    :param frameIndex: K index of the frame
+    :returns: vtkPolyData in RAS coordinates
+    """
+    key = (volumeNode.GetName(), frameIndex)
+    if key in self.frameContourCache:
+      self.frameContourCache.move_to_end(key)
+      return self.frameContourCache[key]
+
+    dimensions = volumeNode.GetImageData().GetDimensions()
+    frameExtractor = vtk.vtkExtractVOI()
+    frameExtractor.SetInputData(volumeNode.GetImageData())
+    frameExtractor.SetVOI(0, dimensions[0] - 1, 0, dimensions[1] - 1, frameIndex, frameIndex)
+
+    contourFilter = vtk.vtkMarchingSquares()
+    contourFilter.SetInputConnection(frameExtractor.GetOutputPort())
+    contourFilter.SetValue(0, self.DEFAULT_THRESHOLD)
+
+    extrusionFilter = vtk.vtkLinearExtrusionFilter()
+    extrusionFilter.SetInputConnection(contourFilter.GetOutputPort())
+    extrusionFilter.SetExtrusionTypeToVectorExtrusion()
+    extrusionFilter.SetVector(0, 0, 1)
+    extrusionFilter.SetScaleFactor(1.0)
+
+    # Contour points are in IJK coordinates. Center the extruded band on the frame and transform to RAS.
+    ijkToRas = vtk.vtkMatrix4x4()
+    volumeNode.GetIJKToRASMatrix(ijkToRas)
+    ijkToRasTransform = vtk.vtkTransform()
+    ijkToRasTransform.SetMatrix(ijkToRas)
+    ijkToRasTransform.Translate(0, 0, -0.5)
+    transformFilter = vtk.vtkTransformPolyDataFilter()
+    transformFilter.SetInputConnection(extrusionFilter.GetOutputPort())
+    transformFilter.SetTransform(ijkToRasTransform)
+    transformFilter.Update()
+
+    contour = vtk.vtkPolyData()
+    contour.ShallowCopy(transformFilter.GetOutput())
+    self.frameContourCache[key] = contour
+    while len(self.frameContourCache) > self.FRAME_CONTOUR_CACHE_SIZE:
+      self.frameContourCache.popitem(last=False)
+    return contour
+
+  def getSliceFrameIndex(self, sliceNode, volumeNode):
+    """
+    Finds which frame of a volume is shown in a slice view.
+    :returns: K index of the frame, or None if the slice is outside the volume
+    """
+    sliceToRas = sliceNode.GetSliceToRAS()
+    sliceCenter_Ras = [sliceToRas.GetElement(0, 3), sliceToRas.GetElement(1, 3), sliceToRas.GetElement(2, 3), 1]
+    rasToIjk = vtk.vtkMatrix4x4()
+    volumeNode.GetRASToIJKMatrix(rasToIjk)
+    frameIndex = int(round(rasToIjk.MultiplyPoint(sliceCenter_Ras)[2]))
+    if frameIndex < 0 or frameIndex >= volumeNode.GetImageData().GetDimensions()[2]:
+      return None
+    return frameIndex
+
+  def updateFrameContours(self):
+    """
+    Shows the contours of the displayed frames of the current pair, if per-frame contours are used.
+    Cheap to call on every slice node modification, because nothing is done when the frames have not changed.
+    :returns: None
+    """
+    parameterNode = self.getParameterNode()
+    nextPair = self.getNextPair()
+    if not self.frameContoursEnabled or parameterNode.GetParameter(self.INPUT_TYPE) != "2D" or nextPair is None:
+      return
+
+    layoutManager = slicer.app.layoutManager()
+    for viewTag, modelName in self.getViewModels(nextPair):
+      sliceWidget = layoutManager.sliceWidget(viewTag)
+      volumeName = self.nameFromPatientSequenceAndModel(nextPair[0], modelName)
+      volumeNode = parameterNode.GetNodeReference(volumeName)
+      modelNode = parameterNode.GetNodeReference(volumeName + self.MODEL_SUFFIX)
+      if sliceWidget is None or volumeNode is None or modelNode is None:
+        continue
+
+      frameIndex = self.getSliceFrameIndex(sliceWidget.mrmlSliceNode(), volumeNode)
+      if self.displayedContourFrames.get(viewTag) == (volumeName, frameIndex):
+        continue
+      self.displayedContourFrames[viewTag] = (volumeName, frameIndex)
+
+      if frameIndex is None:
+        modelNode.SetAndObservePolyData(vtk.vtkPolyData())
+      else:
+        modelNode.SetAndObservePolyData(self.getFrameContour(volumeNode, frameIndex))
+
+  def startCine(self, frameRate, statusCallback=None):
+    """
+    Starts playing the frames of the current 2D pair in both slice views, from the currently displayed frame.
+    Frames are shown according to wall clock time. Frames that could not be shown in time are skipped and counted.
+    :param frameRate: frames per second
+    :param statusCallback: optional function called with (framesShown, droppedFrames) after each shown frame
+    :returns: True if playback started
+    """
+    self.stopCine()
+    parameterNode = self.getParameterNode()
+    nextPair = self.getNextPair()
+    if parameterNode.GetParameter(self.INPUT_TYPE) != "2D" or nextPair is None:
+      return False
+    scanNode = parameterNode.GetNodeReference(nextPair[0])
+    if scanNode is None or scanNode.GetImageData() is None:
+      return False
+
+    # First frame is blank, and only used to make surface models work
+    self.cineFrameCount = scanNode.GetImageData().GetDimensions()[2] - 1
+    if self.cineFrameCount < 2:
+      return False
+    sliceNode = slicer.app.layoutManager().sliceWidget("1").mrmlSliceNode()
+    currentFrame = self.getSliceFrameIndex(sliceNode, scanNode)
+    self.cineFirstFrame = currentFrame if currentFrame else 1
+
+    self.cineFrameRate = frameRate
+    self.cineStatusCallback = statusCallback
+    self.cineLastFrameNumber = -1
+    self.cineDroppedFrames = 0
+    self.cineRingBuffer.clear()
+    self.prefetchCineFrames(0)
+
+    self.cineTimer = qt.QTimer()
+    self.cineTimer.setTimerType(qt.Qt.PreciseTimer)
+    self.cineTimer.setInterval(int(1000 / frameRate))
+    self.cineTimer.connect("timeout()", self.onCineTimeout)
+    self.cineStartTime = time.perf_counter()
+    self.cineTimer.start()
+    return True
+
+  def stopCine(self):
+    """
+    Stops cine playback and logs how many frames were dropped.
+    """
+    if self.cineTimer is None:
+      return
+    self.cineTimer.stop()
+    self.cineTimer = None
+    self.cineRingBuffer.clear()
+    logging.info(f"Cine playback stopped: {self.cineLastFrameNumber + 1} frames played, {self.cineDroppedFrames} dropped")
+
+  def getCineFrameIndex(self, frameNumber):
+    """
+    Converts the number of a played frame to a frame index, looping over non-blank frames from the first played frame.
+    """
+    return 1 + (self.cineFirstFrame - 1 + frameNumber) % self.cineFrameCount
+
+  def prepareCineFrame(self, frameIndex):
+    """
+    Prepares everything needed to show a frame: the slice offset and contours of both sides.
+    :returns: dict with frameIndex, and sliceOffsets and contours keyed by view tag
+    """
+    parameterNode = self.getParameterNode()
+    nextPair = self.getNextPair()
+    layoutManager = slicer.app.layoutManager()
+    frame = {"frameIndex": frameIndex, "sliceOffsets": {}, "contours": {}}
+    for viewTag, modelName in self.getViewModels(nextPair):
+      volumeName = self.nameFromPatientSequenceAndModel(nextPair[0], modelName)
+      volumeNode = parameterNode.GetNodeReference(volumeName)
+      if volumeNode is None:
+        continue
+      ijkToRas = vtk.vtkMatrix4x4()
+      volumeNode.GetIJKToRASMatrix(ijkToRas)
+      framePoint_Ras = ijkToRas.MultiplyPoint([0, 0, frameIndex, 1])[:3]
+      sliceToRas = layoutManager.sliceWidget(viewTag).mrmlSliceNode().GetSliceToRAS()
+      sliceNormal_Ras = [sliceToRas.GetElement(row, 2) for row in range(3)]
+      frame["sliceOffsets"][viewTag] = float(np.dot(sliceNormal_Ras, framePoint_Ras))
+      if self.frameContoursEnabled:
+        frame["contours"][viewTag] = (volumeName, self.getFrameContour(volumeNode, frameIndex))
+    return frame
+
+  def prefetchCineFrames(self, frameNumber):
+    """
+    Fills the ring buffer with the frames starting at a played frame number.
+    """
+    for upcomingFrameNumber in range(frameNumber, frameNumber + self.CINE_PREFETCH_FRAMES):
+      frameIndex = self.getCineFrameIndex(upcomingFrameNumber)
+      if not any(frame["frameIndex"] == frameIndex for frame in self.cineRingBuffer):
+        self.cineRingBuffer.append(self.prepareCineFrame(frameIndex))
+
+  def onCineTimeout(self):
+    """
+    Shows the frame that is due at the current time, then prepares the upcoming frames.
+    """
+    frameNumber = int((time.perf_counter() - self.cineStartTime) * self.cineFrameRate)
+    if frameNumber <= self.cineLastFrameNumber:
+      return  # Timer fired before the next frame is due
+    if frameNumber > self.cineLastFrameNumber + 1:
+      self.cineDroppedFrames += frameNumber - self.cineLastFrameNumber - 1
+    self.cineLastFrameNumber = frameNumber
+
+    frameIndex = self.getCineFrameIndex(frameNumber)
+    frame = next((frame for frame in self.cineRingBuffer if frame["frameIndex"] == frameIndex), None)
+    if frame is None:
+      frame = self.prepareCineFrame(frameIndex)  # Prefetching fell behind
+
+    parameterNode = self.getParameterNode()
+    layoutManager = slicer.app.layoutManager()
+    for viewTag, (volumeName, contour) in frame["contours"].items():
+      modelNode = parameterNode.GetNodeReference(volumeName + self.MODEL_SUFFIX)
+      if modelNode is not None:
+        self.displayedContourFrames[viewTag] = (volumeName, frameIndex)
+        modelNode.SetAndObservePolyData(contour)
+    for viewTag, sliceOffset in frame["sliceOffsets"].items():
+      layoutManager.sliceWidget(viewTag).sliceLogic().SetSliceOffset(sliceOffset)
+
+    self.prefetchCineFrames(frameNumber + 1)
+
+    if self.cineStatusCallback is not None:
+      self.cineStatusCallback(frameNumber + 1, self.cineDroppedFrames)
+
+  def setVolumeStatisticsDict(self, volumeStatisticsDict):
+    """
+    Save the measured statistics of loaded volumes in the parameter node in string format.
+    :param volumeStatisticsDict: dict[volumeName] = dict of statistics
+    :returns: None
+    """
+    parameterNode = self.getParameterNode()
+    parameterNode.SetParameter(self.VOLUME_STATISTICS_DICT, json.dumps(volumeStatisticsDict))
+
+  def getVolumeStatisticsDict(self):
+    """
+    Returns the statistics measured when the volumes were loaded.
+    :returns dict: dict[volumeName] = dict of statistics, empty if no volumes are loaded
+    """
+    statisticsStr = self.getParameterNode().GetParameter(self.VOLUME_STATISTICS_DICT)
+    if not statisticsStr:
+      return {}
+    return json.loads(statisticsStr)
+
+  def getIntensityMax(self, volumeName):
+    """
+    Returns the measured maximum intensity of a volume, or IMAGE_INTENSITY_MAX if it was not measured.
+    """
+    statistics = self.getVolumeStatisticsDict().get(volumeName)
+    if not statistics or statistics["max"] <= 0:
+      return self.IMAGE_INTENSITY_MAX
+    return statistics["max"]
+
+  def getDataObjectBytes(self, dataObject):
+    if dataObject is None:
+      return 0
+    return dataObject.GetActualMemorySize() * 1024  # Reported in kibibytes
+
+  def getMemoryUsage(self):
+    """
+    Estimates the memory used by loaded data and by caches of this module. Preview volumes are not counted separately,
+    because they show images of the pyramids.
+    :returns: dict with "total" bytes, "categories" dict[category] = bytes, and bytes per scan and per AI model in
+      "scans" dict[scanName] and "models" dict[modelName]
+    """
+    parameterNode = self.getParameterNode()
+    categories = {category: 0 for category in self.MEMORY_CATEGORIES}
+    scanBytes = {}
+    modelBytes = {}
+
+    def addBytes(category, numberOfBytes, scanName=None, modelName=None):
+      categories[category] += numberOfBytes
+      if scanName is not None:
+        scanBytes[scanName] = scanBytes.get(scanName, 0) + numberOfBytes
+      if modelName is not None:
+        modelBytes[modelName] = modelBytes.get(modelName, 0) + numberOfBytes
+
+    scansAndModelsDict = self.getScansAndModelsDict() if parameterNode.GetParameter(self.SCANS_AND_MODELS_DICT) else {}
+    scanAndModelFromVolumeName = {}
+    for modelName, scans in scansAndModelsDict.items():
+      for scanName in scans:
+        volumeName = self.nameFromPatientSequenceAndModel(scanName, modelName)
+        scanAndModelFromVolumeName[volumeName] = (scanName, modelName)
+        volumeNode = parameterNode.GetNodeReference(volumeName)
+        if volumeNode is not None:
+          addBytes("Predictions", self.getDataObjectBytes(volumeNode.GetImageData()), scanName, modelName)
+        modelNode = parameterNode.GetNodeReference(volumeName + self.MODEL_SUFFIX)
+        if modelNode is not None:
+          addBytes("Models", self.getDataObjectBytes(modelNode.GetPolyData()), scanName, modelName)
+        for factor, imageData, ijkToRas in self.volumePyramids.get(volumeName, []):
+          addBytes("Pyramids", self.getDataObjectBytes(imageData), scanName, modelName)
+
+    for scanName in {scanName for scanName, modelName in scanAndModelFromVolumeName.values()}:
+      scanNode = parameterNode.GetNodeReference(scanName)  # Ultrasound frames of 2D scans
+      if scanNode is not None:
+        addBytes("Scans", self.getDataObjectBytes(scanNode.GetImageData()), scanName)
+
+    for (volumeName, level, fov), snapshot in self.snapshotCache.items():
+      addBytes("Snapshots", self.getDataObjectBytes(snapshot), *scanAndModelFromVolumeName.get(volumeName, (None, None)))
+    for (volumeName, frameIndex), contour in self.frameContourCache.items():
+      addBytes("Contours", self.getDataObjectBytes(contour), *scanAndModelFromVolumeName.get(volumeName, (None, None)))
+    for (scanName, modelA, modelB), (imageData, ijkToRas) in self.differenceCache.items():
+      addBytes("Differences", self.getDataObjectBytes(imageData), scanName)
+
+    for tableName in [self.SURVEY_RESULTS_TABLE, self.ELO_HISTORY_TABLE]:
+      tableNode = parameterNode.GetNodeReference(tableName)
+      if tableNode is not None:
+        addBytes("Tables", self.getDataObjectBytes(tableNode.GetTable()))
+    addBytes("Tables", len(parameterNode.GetParameter(self.SURVEY_DATAFRAME)))
+
+    return {
+      "total": sum(categories.values()),
+      "categories": categories,
+      "scans": scanBytes,
+      "models": modelBytes,
+    }
 
   def setScansAndModelsDict(self, scansAndModelsDict):
     """
@@ -1392,45 +4454,87 @@ class SegmentationComparisonLogic(ScriptedLoadableModuleLogic):
   def calculateNewElo(self, current, actual, expected):
     return current + self.K * (actual - expected)
 
+  @profiler.profiled
   def updateComparisonData(self, leftScore=0.5):
     if leftScore < 0.0 or leftScore > 1.0:
       logging.error("Score cannot be outside 0.0 and 1.0!")
 
-    # Update elo scores
     nextPair = self.getNextPair()
+    self.updateComparisonOutcomes(nextPair[0], [(nextPair[1], nextPair[2], leftScore)])
+
+  def updateRankingData(self, ranks):
+    """
+    Records the ranking of the models of a ranking screen as the pairwise outcomes it implies.
+    :param ranks: rank of each model in the order of the views, 1 is best, equal ranks are ties
+    :returns: list of (leftModel, rightModel, leftScore), one for each pair of models on the screen
+    """
+    nextPair = self.getNextPair()
+    outcomes = self.getRankingOutcomes(nextPair[1:], ranks)
+    self.updateComparisonOutcomes(nextPair[0], outcomes)
+    return outcomes
+
+  def updateComparisonOutcomes(self, scan, outcomes):
+    """
+    Updates ratings, games played and coverage from the outcomes of one screen. In a shared study, the outcomes are
+    applied to the latest shared state and written back in the same transaction, so no result of another rater is lost.
+    :param scan: patient_sequence name of the screen
+    :param outcomes: list of (leftModel, rightModel, leftScore)
+    :returns: None
+    """
+    if self.coordinator is None:
+      undoEntry = self.beginUndoEntry(scan, outcomes)
+      self.applyComparisonOutcomes(scan, outcomes)
+      self.endUndoEntry(undoEntry)
+      return
+    with self.coordinator.transaction():
+      self.syncSharedState()
+      self.applyComparisonOutcomes(scan, outcomes)
+      self.coordinator.writeResults(self.getSurveyTable(), self.getRatingColumns(), scan, outcomes,
+                                    periodClosed=not self.pendingRatingPeriod)
+
+  def applyComparisonOutcomes(self, scan, outcomes):
+    """
+    Applies the outcomes of one screen to the state of this instance. All outcomes of the screen are rated in one
+    batched update, from the ratings before the screen.
+    :param scan: patient_sequence name of the screen
+    :param outcomes: list of (leftModel, rightModel, leftScore)
+    :returns: None
+    """
+    # Update elo scores
     surveyDF = self.getSurveyTable()
-    leftModel = nextPair[1]
-    rightModel = nextPair[2]
-    leftElo = surveyDF.query(f"ModelName == '{leftModel}'").iloc[0]["Elo"]
-    rightElo = surveyDF.query(f"ModelName == '{rightModel}'").iloc[0]["Elo"]
-    leftExpected, rightExpected = self.calculateExpectedScores(leftElo, rightElo)
-    leftActual = leftScore
-    rightActual = 1.0 - leftScore
-    leftNewElo = self.calculateNewElo(leftElo, leftActual, leftExpected)
-    rightNewElo = self.calculateNewElo(rightElo, rightActual, rightExpected)
-    leftModelIdx = surveyDF.index[surveyDF["ModelName"] == leftModel][0]
-    rightModelIdx = surveyDF.index[surveyDF["ModelName"] == rightModel][0]
-    surveyDF.at[leftModelIdx, "Elo"] = leftNewElo
-    surveyDF.at[rightModelIdx, "Elo"] = rightNewElo
-
-    logMessage = "Updates:    "
-    logMessage += f"{leftModel} ({leftElo:.2f}) vs {rightModel} ({rightElo:.2f}) -> "
-    logMessage += f"{leftModel} ({leftNewElo:.2f}) vs {rightModel} ({rightNewElo:.2f})"
-    logging.debug(logMessage)
+    modelPositions = {modelName: modelIdx for modelIdx, modelName in enumerate(surveyDF["ModelName"])}
+    leftIndices = np.array([modelPositions[leftModel] for leftModel, rightModel, leftScore in outcomes])
+    rightIndices = np.array([modelPositions[rightModel] for leftModel, rightModel, leftScore in outcomes])
+    leftScores = np.array([leftScore for leftModel, rightModel, leftScore in outcomes], dtype=float)
+    elo = surveyDF["Elo"].to_numpy(dtype=float)
+    self.eloEngine.updateRatingPeriod(surveyDF, leftIndices, rightIndices, leftScores, updateInactive=False)
+    newElo = surveyDF["Elo"].to_numpy(dtype=float)
+
+    # Update Glicko-2 ratings when the rating period is complete
+    self.pendingRatingPeriod.extend(outcomes)
+    if len(self.pendingRatingPeriod) >= self.getParameter(self.RATING_PERIOD):
+      self.updateRatingPeriod(surveyDF)
+
+    for (leftModel, rightModel, leftScore), leftModelIdx, rightModelIdx in zip(outcomes, leftIndices, rightIndices):
+      logMessage = "Updates:    "
+      logMessage += f"{leftModel} ({elo[leftModelIdx]:.2f}) vs {rightModel} ({elo[rightModelIdx]:.2f}) -> "
+      logMessage += f"{leftModel} ({newElo[leftModelIdx]:.2f}) vs {rightModel} ({newElo[rightModelIdx]:.2f})"
+      logging.debug(logMessage)
 
     # Increment games played for each model/scan and update last time played
     scansAndModelsDict = self.getScansAndModelsDict()
 
-    scan = nextPair[0]
-    for i in range(1, len(nextPair)):
-      model = nextPair[i]
-      modelIdx = surveyDF.index[surveyDF["ModelName"] == model][0]
-      surveyDF.at[modelIdx, "GamesPlayed"] += 1
-      surveyDF.at[modelIdx, "TimeLastPlayed"] = datetime.datetime.now()
-      scansAndModelsDict[model][scan] += 1
+    for leftModel, rightModel, leftScore in outcomes:
+      for model in [leftModel, rightModel]:
+        modelIdx = surveyDF.index[surveyDF["ModelName"] == model][0]
+        surveyDF.at[modelIdx, "GamesPlayed"] += 1
+        surveyDF.at[modelIdx, "TimeLastPlayed"] = datetime.datetime.now()
+        scansAndModelsDict[model][scan] += 1
+      self.addPairCoverage(scan, leftModel, rightModel)
 
     self.setScansAndModelsDict(scansAndModelsDict)
     self.setSurveyTable(surveyDF)
+    self.updateRankingConvergence(surveyDF)
 
     # Add a row to the elo history table
 
@@ -1448,14 +4552,253 @@ class SegmentationComparisonLogic(ScriptedLoadableModuleLogic):
       modelIdx = surveyDF.index[surveyDF["ModelName"] == modelName][0]
       eloHistoryTable.SetCellText(rowIdx, i, str(surveyDF.at[modelIdx, "Elo"]))
 
+  def updateRankingConvergence(self, surveyDF):
+    """
+    Compares the current ranking of models by Elo score with the ranking CONVERGENCE_WINDOW comparisons ago, using the
+    Spearman rank correlation. Only the current ranking is computed, earlier ones are kept in a sliding window.
+    :param surveyDF: survey dataframe after the last comparison
+    :returns: None
+    """
+    self.rankingSnapshots.append(surveyDF["Elo"].rank(method="average").to_numpy())
+    if len(self.rankingSnapshots) < self.rankingSnapshots.maxlen:
+      return
+
+    oldRanks = self.rankingSnapshots[0]
+    ranks = self.rankingSnapshots[-1]
+    if oldRanks.std() == 0 or ranks.std() == 0:
+      self.rankCorrelation = None  # All models tied
+    else:
+      # Pearson correlation of ranks, which handles ties
+      self.rankCorrelation = float(np.corrcoef(oldRanks, ranks)[0, 1])
+
+    wasConverged = self.rankingConverged
+    threshold = self.getParameter(self.CONVERGENCE_THRESHOLD)
+    self.rankingConverged = self.rankCorrelation is not None and self.rankCorrelation >= threshold
+    if self.rankingConverged and not wasConverged:
+      logging.info(f"Ranking is stable: rank correlation {self.rankCorrelation:.3f} with the ranking "
+                   f"{self.CONVERGENCE_WINDOW} comparisons ago (threshold {threshold})")
+    elif wasConverged and not self.rankingConverged:
+      logging.info(f"Ranking is no longer stable: rank correlation {self.rankCorrelation}")
+
+  def updateRatingPeriod(self, surveyDF):
+    """
+    Updates Glicko-2 ratings with the comparisons of the current rating period. With a rating period of one comparison,
+    only the two compared models are updated, otherwise the rating deviation of models that did not play grows.
+    :param surveyDF: survey dataframe, modified in place
+    :returns: None
+    """
+    if not self.pendingRatingPeriod:
+      return
+    modelPositions = {modelName: modelIdx for modelIdx, modelName in enumerate(surveyDF["ModelName"])}
+    leftModels, rightModels, leftScores = zip(*self.pendingRatingPeriod)
+    self.glickoEngine.updateRatingPeriod(
+      surveyDF,
+      np.array([modelPositions[modelName] for modelName in leftModels]),
+      np.array([modelPositions[modelName] for modelName in rightModels]),
+      np.array(leftScores, dtype=float),
+      updateInactive=self.getParameter(self.RATING_PERIOD) > 1)
+    self.pendingRatingPeriod = []
+
+  @profiler.profiled
   def updateNextPair(self, isNewCsv):
+    """
+    Chooses the next screen and loads its volumes. In a shared study, the screen is chosen from the shared state of all
+    raters and its pairs are leased, so other raters are not given them. If another rater leased one of them since
+    the state was read, the screen is chosen again.
+    """
+    self.updatePairSimilarity()
+    for attempt in range(self.LEASE_ATTEMPTS):
+      if self.coordinator is not None:
+        self.syncSharedState()
+      nextPair = self.chooseNextScreen(isNewCsv)
+      if self.coordinator is None or self.coordinator.leaseScreen(nextPair):
+        break
+      logging.info(f"A pair of {nextPair} was just given to another rater, choosing again")
+    else:
+      logging.warning(f"Showing {nextPair}, although another rater was given a pair of it")
+    if self.undoStack and self.undoStack[-1]["nextScreen"] is None:
+      # Redoing the last answered screen goes to the screen chosen after it
+      self.undoStack[-1]["nextScreen"] = nextPair
+      self.undoStack[-1]["schedulePositionAfter"] = self.schedulePosition
+    self.showScreen(nextPair)
+
+  def showScreen(self, nextPair):
+    """
+    Loads the volumes of a screen and makes it the current screen.
+    :param nextPair: list[scanName, modelName1, modelName2, ...]
+    :returns: None
+    """
+    self.loadPair(nextPair[0], nextPair[1:])  # Only if the volumes are not resident yet
+    self.setNextPair(nextPair)
+    self.pairSerial += 1
+
+  def beginUndoEntry(self, scan, outcomes):
+    """
+    Records the state that answering the current screen is about to change, so the answer can be undone.
+    :param scan: patient_sequence name of the screen
+    :param outcomes: list of (leftModel, rightModel, leftScore) of the screen
+    :returns: undo entry, to be completed by endUndoEntry after the outcomes are applied
+    """
+    rankingFull = len(self.rankingSnapshots) == self.rankingSnapshots.maxlen
+    return {
+      "screen": list(self.getNextPair()),
+      "scan": scan,
+      "outcomes": list(outcomes),
+      "surveyBefore": self.getSurveyTable(),
+      "pendingBefore": list(self.pendingRatingPeriod),
+      "evictedSnapshot": self.rankingSnapshots[0] if rankingFull else None,
+      "rankingBefore": (self.rankCorrelation, self.rankingConverged),
+    }
+
+  def endUndoEntry(self, undoEntry):
+    """
+    Completes an undo entry with the changes made by the outcomes, and adds it to the undo stack. Only the cells of the
+    survey table that changed are kept, so undo and redo do not depend on the number of comparisons made so far.
+    :param undoEntry: entry returned by beginUndoEntry
+    :returns: None
+    """
+    surveyBefore = undoEntry.pop("surveyBefore")
+    surveyAfter = self.getSurveyTable()
+    changed = ~((surveyBefore == surveyAfter) | (surveyBefore.isna() & surveyAfter.isna())).to_numpy()
+    undoEntry["surveyCells"] = [(rowIdx, columnIdx, surveyBefore.iat[rowIdx, columnIdx], surveyAfter.iat[rowIdx, columnIdx])
+                                for rowIdx, columnIdx in zip(*np.nonzero(changed))]
+    undoEntry["pendingAfter"] = list(self.pendingRatingPeriod)
+    undoEntry["addedSnapshot"] = self.rankingSnapshots[-1]
+    undoEntry["rankingAfter"] = (self.rankCorrelation, self.rankingConverged)
+    undoEntry["schedulePositionBefore"] = self.schedulePosition
+    undoEntry["nextScreen"] = None  # Set when the next screen is chosen
+    undoEntry["schedulePositionAfter"] = None
+    self.undoStack.append(undoEntry)
+    self.redoStack = []  # A new answer replaces the undone ones
+
+  def applySurveyCells(self, surveyCells, useNewValues):
+    surveyDF = self.getSurveyTable()
+    for rowIdx, columnIdx, oldValue, newValue in surveyCells:
+      surveyDF.iat[rowIdx, columnIdx] = newValue if useNewValues else oldValue
+    self.setSurveyTable(surveyDF)
+
+  def applyOutcomeCounts(self, scan, outcomes, increment):
+    """
+    Adds increment to the games played on the scan and the pair coverage of each outcome.
+    """
+    scansAndModelsDict = self.getScansAndModelsDict()
+    for leftModel, rightModel, leftScore in outcomes:
+      for model in [leftModel, rightModel]:
+        scansAndModelsDict[model][scan] += increment
+      self.addPairCoverage(scan, leftModel, rightModel, increment)
+    self.setScansAndModelsDict(scansAndModelsDict)
+
+  def popTableRows(self, tableName, count):
+    """
+    Removes the last rows of a table.
+    :returns: list of removed rows as vtkVariantArray, in table order
+    """
+    tableNode = self.getParameterNode().GetNodeReference(tableName)
+    table = tableNode.GetTable()
+    rows = []
+    for i in range(count):
+      rowIdx = table.GetNumberOfRows() - 1
+      row = vtk.vtkVariantArray()
+      table.GetRow(rowIdx, row)
+      rows.insert(0, row)
+      table.RemoveRow(rowIdx)
+    table.Modified()
+    tableNode.Modified()
+    return rows
+
+  def pushTableRows(self, tableName, rows):
+    tableNode = self.getParameterNode().GetNodeReference(tableName)
+    table = tableNode.GetTable()
+    for row in rows:
+      table.InsertNextRow(row)
+    table.Modified()
+    tableNode.Modified()
+
+  def canUndo(self):
+    return len(self.undoStack) > 0
+
+  def canRedo(self):
+    return len(self.redoStack) > 0
+
+  def undoComparison(self):
+    """
+    Reverts the ratings, games played, coverage, comparison history and Elo history to before the last answered screen,
+    and makes that screen the current screen again. Only the recorded changes of the screen are reverted, without
+    replaying the comparison history. Answers are not recorded for undo in shared studies, because other raters may
+    already have used them.
+    :returns: True if a screen was undone
+    """
+    if not self.undoStack:
+      return False
+    undoEntry = self.undoStack.pop()
+    outcomes = undoEntry["outcomes"]
+
+    self.applySurveyCells(undoEntry["surveyCells"], useNewValues=False)
+    self.pendingRatingPeriod = list(undoEntry["pendingBefore"])
+    self.applyOutcomeCounts(undoEntry["scan"], outcomes, -1)
+    undoEntry["surveyRows"] = self.popTableRows(self.SURVEY_RESULTS_TABLE, len(outcomes))
+    undoEntry["eloHistoryRows"] = self.popTableRows(self.ELO_HISTORY_TABLE, 1)
+
+    self.rankingSnapshots.pop()
+    if undoEntry["evictedSnapshot"] is not None:
+      self.rankingSnapshots.appendleft(undoEntry["evictedSnapshot"])
+    self.rankCorrelation, self.rankingConverged = undoEntry["rankingBefore"]
+
+    self.sessionComparisonCount -= len(outcomes)
+    self.schedulePosition = undoEntry["schedulePositionBefore"]
+    self.showScreen(undoEntry["screen"])
+    self.redoStack.append(undoEntry)
+    logging.info(f"Undid {len(outcomes)} comparison(s) of {undoEntry['screen']}")
+    return True
+
+  def redoComparison(self):
+    """
+    Applies the answer of the last undone screen again, and goes to the screen that followed it.
+    :returns: True if a screen was redone
+    """
+    if not self.redoStack:
+      return False
+    undoEntry = self.redoStack.pop()
+    outcomes = undoEntry["outcomes"]
+
+    self.applySurveyCells(undoEntry["surveyCells"], useNewValues=True)
+    self.pendingRatingPeriod = list(undoEntry["pendingAfter"])
+    self.applyOutcomeCounts(undoEntry["scan"], outcomes, 1)
+    self.pushTableRows(self.SURVEY_RESULTS_TABLE, undoEntry.pop("surveyRows"))
+    self.pushTableRows(self.ELO_HISTORY_TABLE, undoEntry.pop("eloHistoryRows"))
+
+    self.rankingSnapshots.append(undoEntry["addedSnapshot"])  # Evicts the oldest snapshot again if the window is full
+    self.rankCorrelation, self.rankingConverged = undoEntry["rankingAfter"]
+
+    self.sessionComparisonCount += len(outcomes)
+    if undoEntry["nextScreen"] is not None:
+      self.schedulePosition = undoEntry["schedulePositionAfter"]
+      self.showScreen(undoEntry["nextScreen"])
+    self.undoStack.append(undoEntry)
+    logging.info(f"Redid {len(outcomes)} comparison(s) of {undoEntry['screen']}")
+    return True
+
+  def chooseNextScreen(self, isNewCsv):
+    """
+    Chooses the scan and models of the next screen with the pair scheduler, or takes them from the schedule.
+    :returns: list[scanName, modelName1, modelName2, ...]
+    """
     surveyDF = self.getSurveyTable()
 
+    if self.schedule is not None and not self.isScheduleComplete():
+      nextPair = list(self.schedule[self.schedulePosition])
+      self.schedulePosition += 1
+      return nextPair
+
     # Randomly choose first matchup
     if self.sessionComparisonCount == 0 and isNewCsv:
       models = surveyDF["ModelName"].tolist()
       nextModelPair = random.sample(models, 2)
 
+    elif self.getParameter(self.PAIR_SCHEDULER) == self.PAIR_SCHEDULER_INFORMATION_GAIN:
+      nextPair = self.getInformationGainPair(surveyDF, self.getScansAndModelsDict())
+      return self.completeScreen(surveyDF, nextPair)
+
     else:
       nextModelPair = []
       # Get list of models with minimum games played
@@ -1478,14 +4821,18 @@ class SegmentationComparisonLogic(ScriptedLoadableModuleLogic):
       leastModelElo = surveyDF.query(f"ModelName == '{leastModel}'").iloc[0]["Elo"]
       eloDiffList_noLeast = (surveyDF_noLeast["Elo"] - leastModelElo).abs().tolist()
 
+      # Prefer opponents leastModel was compared with less often
+      pairGamesList_noLeast = [self.getPairGames(leastModel, modelName) for modelName in surveyDF_noLeast["ModelName"]]
+
       if all(eloDiff == 0 for eloDiff in eloDiffList_noLeast):
-        validModel = False
-        while not validModel:
-          chosenModelIdx = rng.integers(0, len(eloDiffList_noLeast))
-          if surveyDF_noLeast.iloc[chosenModelIdx]["ModelName"] != leastModel:
-            validModel = True
+        minPairGames = min(pairGamesList_noLeast)
+        chosenModelIdx = random.choice([idx for idx, pairGames in enumerate(pairGamesList_noLeast) if pairGames == minPairGames])
       else:
-        samplingWeights = self.getModelSamplingProbability(eloDiffList_noLeast)
+        samplingWeights = [probability / (1 + pairGames) for probability, pairGames
+                           in zip(self.getModelSamplingProbability(eloDiffList_noLeast), pairGamesList_noLeast)]
+        # Near-identical predictions are rarely worth a rater's time
+        samplingWeights = [weight * self.NEAR_DUPLICATE_WEIGHT if self.isNearDuplicatePair(leastModel, modelName) else weight
+                           for weight, modelName in zip(samplingWeights, surveyDF_noLeast["ModelName"])]
         chosenModelIdx = random.choices(list(enumerate(eloDiffList_noLeast)), weights=samplingWeights)[0][0]
       closestEloModel = surveyDF_noLeast.iloc[chosenModelIdx]["ModelName"]
       nextModelPair.append(closestEloModel)
@@ -1498,18 +4845,197 @@ class SegmentationComparisonLogic(ScriptedLoadableModuleLogic):
 
       logging.debug(logMessage)
 
-    # Choose scan with least number of games
+    # Choose scan this pair was compared on least, then scan with least number of games, among scans with both
+    # volumes loaded
     scansAndModelsDict = self.getScansAndModelsDict()
-    scanNames = [scanName for scanName in scansAndModelsDict[nextModelPair[0]]]
+    scanNames = [scanName for scanName in scansAndModelsDict[nextModelPair[0]] if scanName in scansAndModelsDict[nextModelPair[1]]]
+    residentScanNames = [scanName for scanName in scanNames if self.isPairResident(scanName, nextModelPair[0], nextModelPair[1])]
+    if residentScanNames:
+      scanNames = residentScanNames
     scanCounts = {key: None for key in scanNames}
-    # Sum number of games for each scan across all models
+    # Whether the pair is near-identical on each scan, times this pair was compared on it, and number of games for each
+    # scan summed across all models
     for scanName in scanNames:
-      scanCounts[scanName] = sum(model[scanName] for model in scansAndModelsDict.values())
+      scanCounts[scanName] = (self.isNearDuplicatePair(nextModelPair[0], nextModelPair[1], scanName),
+                              self.getPairCoverage(scanName, nextModelPair[0], nextModelPair[1]),
+                              sum(model.get(scanName, 0) for model in scansAndModelsDict.values()))
     minGames = min(scanCounts.values())
     minKeys = [key for key, value in scanCounts.items() if value == minGames]
     minScan = random.choice(minKeys)  # Randomize order in the case of ties
     nextModelPair.insert(0, minScan)
-    self.setNextPair(nextModelPair)
+    return self.completeScreen(surveyDF, nextModelPair)
+
+  def completeScreen(self, surveyDF, nextPair):
+    """
+    Adds more models of the same scan to a pair, if ranking screens are used.
+    :param surveyDF: survey dataframe
+    :param nextPair: list[scanName, modelName1, modelName2]
+    :returns: list[scanName, modelName1, modelName2, ...]
+    """
+    modelsPerScreen = self.getParameter(self.MODELS_PER_SCREEN)
+    if modelsPerScreen > 2:
+      return self.addRankingModels(surveyDF, nextPair, modelsPerScreen)
+    return nextPair
+
+  def addRankingModels(self, surveyDF, nextPair, modelCount):
+    """
+    Adds models with a prediction on the scan of a pair, one by one, until the screen has modelCount models.
+    Preferred models have a resident volume, are not near-identical to models already on the screen, were compared
+    least often with those models, and have the fewest games. Models are shown in random order.
+    :param surveyDF: survey dataframe
+    :param nextPair: list[scanName, modelName1, modelName2]
+    :param modelCount: number of models on the screen
+    :returns: list[scanName, modelName1, ..., modelNameN], with fewer models if the scan has no more predictions
+    """
+    scanName = nextPair[0]
+    models = list(nextPair[1:])
+    scansAndModelsDict = self.getScansAndModelsDict()
+    gamesPlayed = dict(zip(surveyDF["ModelName"], surveyDF["GamesPlayed"]))
+    candidates = [modelName for modelName in scansAndModelsDict
+                  if scanName in scansAndModelsDict[modelName] and modelName not in models]
+
+    def candidateKey(modelName):
+      return (self.nameFromPatientSequenceAndModel(scanName, modelName) not in self.residentVolumes,
+              any(self.isNearDuplicatePair(modelName, other, scanName) for other in models),
+              sum(self.getPairGames(modelName, other) for other in models),
+              gamesPlayed.get(modelName, 0),
+              random.random())
+
+    while len(models) < modelCount and candidates:
+      modelName = min(candidates, key=candidateKey)
+      models.append(modelName)
+      candidates.remove(modelName)
+
+    random.shuffle(models)  # The pair found by the scheduler should not always be in the first views
+    return [scanName] + models
+
+  @staticmethod
+  def getRankingOutcomes(models, ranks):
+    """
+    Decomposes the ranking of a screen into the pairwise outcomes it implies, one for each pair of models.
+    :param models: model names in the order of the views
+    :param ranks: rank of each model, 1 is best, equal ranks are ties
+    :returns: list of (leftModel, rightModel, leftScore), where left is the model shown in the earlier view
+    """
+    outcomes = []
+    for a, b in itertools.combinations(range(len(models)), 2):
+      leftScore = 1.0 if ranks[a] < ranks[b] else 0.0 if ranks[a] > ranks[b] else 0.5
+      outcomes.append((models[a], models[b], leftScore))
+    return outcomes
+
+  @staticmethod
+  def getViewModels(nextPair):
+    """
+    :param nextPair: list[scanName, modelName1, modelName2, ...]
+    :returns: list of (view tag, model name) of the current screen
+    """
+    return [(str(viewIndex + 1), modelName) for viewIndex, modelName in enumerate(nextPair[1:])]
+
+  def getRatingUncertainty(self, surveyDF):
+    """
+    Returns the standard deviation of the rating of each model. This is the Glicko-2 rating deviation if available.
+    Otherwise it is derived from the number of games played, assuming each game carries the Fisher information of an
+    even matchup.
+    :param surveyDF: survey dataframe
+    :returns: numpy array of standard deviations in Elo points, in the row order of surveyDF
+    """
+    if "GlickoRD" in surveyDF.columns:
+      return surveyDF["GlickoRD"].to_numpy(dtype=float)
+    q = math.log(10) / 400
+    gamesPlayed = surveyDF["GamesPlayed"].to_numpy(dtype=float)
+    return 1 / np.sqrt(1 / self.RATING_PRIOR_SD ** 2 + 0.25 * q ** 2 * gamesPlayed)
+
+  @staticmethod
+  def getOrderEntropy(ratingDiff, differenceVariance):
+    """
+    Binary entropy (in bits) of the relative order of two models with Gaussian ratings.
+    The normal CDF is approximated with a logistic function, which keeps this vectorized without scipy.
+    :param ratingDiff: array of rating differences
+    :param differenceVariance: array of variances of the rating differences
+    :returns: array of entropies
+    """
+    orderProbability = 1 / (1 + np.exp(-1.702 * np.abs(ratingDiff) / np.sqrt(differenceVariance)))
+    orderProbability = np.clip(orderProbability, 1e-12, 1 - 1e-12)
+    return -(orderProbability * np.log2(orderProbability) + (1 - orderProbability) * np.log2(1 - orderProbability))
+
+  @profiler.profiled
+  def getInformationGainPair(self, surveyDF, scansAndModelsDict):
+    """
+    Picks the (scan, model, model) triple that is expected to reduce the uncertainty of the ranking the most.
+    The gain of a pair is the expected drop in the entropy of the order of the two models after one more game between
+    them, averaged over both outcomes. Ratings are updated like in Glicko, so the shift is larger for uncertain models.
+    All pairs are scored at once with numpy, then the scan is the one this pair played least on.
+    Pairs with both volumes of a scan resident are preferred, like in the Elo proximity scheduler.
+    :param surveyDF: survey dataframe
+    :param scansAndModelsDict: dict[modelName][scanName] = number of games
+    :returns: list[scanName, modelName1, modelName2]
+    """
+    modelNames = surveyDF["ModelName"].tolist()
+    scanNames = sorted({scanName for modelName in modelNames for scanName in scansAndModelsDict.get(modelName, {})})
+    scanIndexes = {scanName: i for i, scanName in enumerate(scanNames)}
+
+    # Games played and availability of every (model, scan) volume
+    scanGames = np.zeros((len(modelNames), len(scanNames)))
+    available = np.zeros((len(modelNames), len(scanNames)), dtype=bool)
+    resident = np.zeros((len(modelNames), len(scanNames)), dtype=bool)
+    for modelIndex, modelName in enumerate(modelNames):
+      for scanName, games in scansAndModelsDict.get(modelName, {}).items():
+        scanIndex = scanIndexes[scanName]
+        scanGames[modelIndex, scanIndex] = games
+        available[modelIndex, scanIndex] = True
+        resident[modelIndex, scanIndex] = self.nameFromPatientSequenceAndModel(scanName, modelName) in self.residentVolumes
+
+    # Expected entropy reduction of the order of each pair, after one game won by either side
+    q = math.log(10) / 400
+    ratings = surveyDF["Glicko" if "Glicko" in surveyDF.columns else "Elo"].to_numpy(dtype=float)
+    ratingVariance = self.getRatingUncertainty(surveyDF) ** 2
+    ratingDiff = ratings[:, None] - ratings[None, :]
+    differenceVariance = ratingVariance[:, None] + ratingVariance[None, :]
+    winProbability = 1 / (1 + np.power(10, -ratingDiff / 400))
+    posteriorVariance = 1 / (1 / differenceVariance + q ** 2 * winProbability * (1 - winProbability))
+    expectedEntropy = (winProbability * self.getOrderEntropy(ratingDiff + q * posteriorVariance * (1 - winProbability), posteriorVariance) +
+                       (1 - winProbability) * self.getOrderEntropy(ratingDiff - q * posteriorVariance * winProbability, posteriorVariance))
+    pairGain = self.getOrderEntropy(ratingDiff, differenceVariance) - expectedEntropy
+    pairGain += rng.random(pairGain.shape) * 1e-12  # Randomize order in the case of ties
+
+    # Only pairs that share a scan can be compared
+    sharedScans = available.astype(float) @ available.T.astype(float)
+    sharedResidentScans = resident.astype(float) @ resident.T.astype(float)
+    np.fill_diagonal(sharedScans, 0)
+    np.fill_diagonal(sharedResidentScans, 0)
+    candidates = sharedResidentScans > 0 if np.any(sharedResidentScans > 0) else sharedScans > 0
+    if not np.any(candidates):
+      raise ValueError("No two models share a scan.")
+    # Near-identical predictions are rarely worth a rater's time
+    modelPositions = {modelName: modelIdx for modelIdx, modelName in enumerate(modelNames)}
+    nearDuplicateDice = self.getParameter(self.NEAR_DUPLICATE_DICE)
+    for (modelName1, modelName2), meanDice in self.pairMeanDice.items():
+      if meanDice >= nearDuplicateDice and modelName1 in modelPositions and modelName2 in modelPositions:
+        pairGain[modelPositions[modelName1], modelPositions[modelName2]] *= self.NEAR_DUPLICATE_WEIGHT
+        pairGain[modelPositions[modelName2], modelPositions[modelName1]] *= self.NEAR_DUPLICATE_WEIGHT
+    pairGain[~candidates] = -np.inf
+    leftIndex, rightIndex = np.unravel_index(np.argmax(pairGain), pairGain.shape)
+
+    # Choose a scan where the predictions of this pair are not near-identical and this pair was not compared on, then
+    # the scan these models played least on, then the least played scan overall
+    scanMask = available[leftIndex] & available[rightIndex]
+    if np.any(resident[leftIndex] & resident[rightIndex]):
+      scanMask &= resident[leftIndex] & resident[rightIndex]
+    nearDuplicate = np.array([self.isNearDuplicatePair(modelNames[leftIndex], modelNames[rightIndex], scanName) for scanName in scanNames])
+    if np.any(scanMask & ~nearDuplicate):
+      scanMask &= ~nearDuplicate
+    coverage = np.array([self.getPairCoverage(scanName, modelNames[leftIndex], modelNames[rightIndex]) for scanName in scanNames])
+    pairGames = scanGames[leftIndex] + scanGames[rightIndex]
+    totalGames = scanGames.sum(axis=0)
+    scanCandidates = np.flatnonzero(scanMask & (coverage == coverage[scanMask].min()))
+    scanCandidates = scanCandidates[pairGames[scanCandidates] == pairGames[scanCandidates].min()]
+    scanCandidates = scanCandidates[totalGames[scanCandidates] == totalGames[scanCandidates].min()]
+    scanName = scanNames[rng.choice(scanCandidates)]
+
+    nextModelPair = [modelNames[leftIndex], modelNames[rightIndex]]
+    random.shuffle(nextModelPair)
+    logging.debug(f"Next matchup: {nextModelPair} on {scanName}, expected information gain: {pairGain[leftIndex, rightIndex]:.4f} bits")
+    return [scanName] + nextModelPair
 
   def setNextPair(self, nextPair):
     """Save the contents of a list in the parameter node in string format.
@@ -1556,18 +5082,23 @@ class SegmentationComparisonLogic(ScriptedLoadableModuleLogic):
     """
     parameterNode = self.getParameterNode()
 
-    if parameterName == self.RIGHT_OPACITY_THRESHOLD or parameterName == self.LEFT_OPACITY_THRESHOLD:
+    if (parameterName == self.RIGHT_OPACITY_THRESHOLD or parameterName == self.LEFT_OPACITY_THRESHOLD or
+        parameterName == self.CONVERGENCE_THRESHOLD or parameterName == self.NEAR_DUPLICATE_DICE):
       valueStr = parameterNode.GetParameter(parameterName)
       return float(valueStr)
 
-    elif parameterName == self.LINK_OPACITIES:
+    elif parameterName == self.LINK_OPACITIES or parameterName == self.AUTO_END_SESSION:
       valueStr = parameterNode.GetParameter(parameterName)
       return True if valueStr.lower() == "true" else False
 
-    elif parameterName == self.MATCHING_TOLERANCE:
+    elif (parameterName == self.MATCHING_TOLERANCE or parameterName == self.RATING_PERIOD or
+          parameterName == self.MODELS_PER_SCREEN):
       valueStr = parameterNode.GetParameter(parameterName)
       return int(valueStr)
 
+    elif parameterName == self.PAIR_SCHEDULER:
+      return parameterNode.GetParameter(parameterName)
+
     else:
       logging.warning("Cannot find parameter name: {}".format(parameterName))
       return
@@ -1591,32 +5122,48 @@ class SegmentationComparisonLogic(ScriptedLoadableModuleLogic):
     else:
       return 0
 
-  def centerAndRotateCamera(self, volume, viewNode):
+  def getCameraPose(self, volume):
     """
-    Center camera of viewNode on volume specified.
+    Computes the default camera pose for a volume: posterior view of the volume center from the distance set as FOV.
+    The center is the one of the volume before it was cropped to its content, so the cameras of the volumes of a scan
+    point at the same position.
+    :param volume: vtkMRMLScalarVolumeNode
+    :returns: tuple of focal point, position and view up vector
     """
-    imageData = volume.GetImageData()
-    volumeCenter_Ijk = imageData.GetCenter()
+    statistics = self.getVolumeStatisticsDict().get(volume.GetName(), {})
+    if "cropExtent" in statistics:
+      # Center of the uncropped volume, in the IJK coordinates of the cropped volume
+      i0, i1, j0, j1, k0, k1 = statistics["cropExtent"]
+      volumeCenter_Ijk = (np.array(statistics["dimensions"], dtype=float) - 1) / 2 - np.array([i0, j0, k0])
+    else:
+      volumeCenter_Ijk = volume.GetImageData().GetCenter()
 
     IjkToRasMatrix = vtk.vtkMatrix4x4()
     volume.GetIJKToRASMatrix(IjkToRasMatrix)
     volumeCenter_Ras = np.array(IjkToRasMatrix.MultiplyFloatPoint(np.append(volumeCenter_Ijk, [1])))
     volumeCenter_Ras = volumeCenter_Ras[:3]
 
+    fov = slicer.util.settingsValue(self.CAMERA_FOV_SETTING, self.CAMERA_FOV_DEFAULT, converter=int)
+
+    return volumeCenter_Ras, volumeCenter_Ras + np.array([0, -fov, 0]), [0, 0, 1]
+
+  def centerAndRotateCamera(self, volume, viewNode):
+    """
+    Center camera of viewNode on volume specified.
+    """
     camerasLogic = slicer.modules.cameras.logic()
     cameraNode = camerasLogic.GetViewActiveCameraNode(viewNode)
     camera = cameraNode.GetCamera()
 
-    fov = slicer.util.settingsValue(self.CAMERA_FOV_SETTING, self.CAMERA_FOV_DEFAULT, converter=int)
-
-    camera.SetFocalPoint(volumeCenter_Ras)
-    camera.SetViewUp([0, 0, 1])
-    camera.SetPosition(volumeCenter_Ras + np.array([0, -fov, 0]))
+    focalPoint, position, viewUp = self.getCameraPose(volume)
+    camera.SetFocalPoint(focalPoint)
+    camera.SetViewUp(viewUp)
+    camera.SetPosition(position)
     cameraNode.ResetClippingRange()
 
   def setVolumeRenderingProperty(self, volumeNode, window, level):
     """
-    Manually define volume property for volume rendering. Volume intensity range is assumed to be [0..255].
+    Manually define volume property for volume rendering. Volume intensity range is [0..measured maximum].
     @param volumeNode: vtkMRMLScalarVolumeNode
     @param window: range of intensity to be displayed (max-min)
     @param level: center value of intensity range to be displayed
@@ -1634,9 +5181,23 @@ class SegmentationComparisonLogic(ScriptedLoadableModuleLogic):
       vrLogic.CreateDefaultVolumeRenderingNodes(volumeNode)
       displayNode = vrLogic.GetFirstVolumeRenderingDisplayNode(volumeNode)
 
-    # Assuming that the displayable range is [0..255], and the range to display is [L-(W/2)..L+(W/2)]
+    intensityMax = self.getIntensityMax(volumeNode.GetName())
+    self.updateVolumeProperty(displayNode.GetVolumePropertyNode().GetVolumeProperty(), window, level, intensityMax)
+
+    return displayNode
+
+  def updateVolumeProperty(self, volumeProperty, window, level, intensityMax):
+    """
+    Sets transfer functions and shading of a volume property for the given intensity window.
+    @param volumeProperty: vtkVolumeProperty
+    @param window: range of intensity to be displayed (max-min)
+    @param level: center value of intensity range to be displayed
+    @param intensityMax: maximum intensity of the volume
+    @returns: None
+    """
+    # Assuming that the displayable range is [0..intensityMax], and the range to display is [L-(W/2)..L+(W/2)]
 
-    upper = min(self.IMAGE_INTENSITY_MAX + window, level + window/2)
+    upper = min(intensityMax + window, level + window/2)
     lower = max(-window, level - window/2)
 
     if upper <= lower:
@@ -1660,13 +5221,228 @@ class SegmentationComparisonLogic(ScriptedLoadableModuleLogic):
     colorTransferFunction.AddRGBPoint(p3, 1.00, 1.00, 0.90)
 
     # The property describes how the data will look
-    volumeProperty = displayNode.GetVolumePropertyNode().GetVolumeProperty()
     volumeProperty.SetColor(colorTransferFunction)
     volumeProperty.SetScalarOpacity(opacityTransferFunction)
     volumeProperty.ShadeOn()
     volumeProperty.SetInterpolationTypeToLinear()
 
-    return displayNode
+  def getThresholdLevel(self, imageThresholdPercent, volumeName):
+    """
+    Converts an opacity threshold percentage to the intensity level used for volume rendering.
+    @param imageThresholdPercent: opacity treshold in percentage [0..100] float
+    @param volumeName: name of the volume, to scale by its measured maximum intensity
+    @return: intensity level
+    """
+    # [0..100] >> [0..MAX], where MAX is the maximum intensity of the volume + 25, if intensity window is 50.
+
+    maxThreshold = self.getIntensityMax(volumeName) + self.WINDOW / 2.0
+    return imageThresholdPercent * maxThreshold / 100.0
+
+  def getThreeDViewWidget(self, singletonTag):
+    """
+    Finds the 3D view widget of a view node by its singleton tag.
+    :param singletonTag: "1" for left side, "2" for right side
+    :returns: qMRMLThreeDWidget, or None if the view is not in the current layout
+    """
+    layoutManager = slicer.app.layoutManager()
+    for viewNumber in range(layoutManager.threeDViewCount):
+      threeDWidget = layoutManager.threeDWidget(viewNumber)
+      if threeDWidget.mrmlViewNode().GetSingletonTag() == singletonTag:
+        return threeDWidget
+    return None
+
+  @profiler.profiled
+  def renderVolumeSnapshot(self, volumeNode, level, size):
+    """
+    Renders an image of a volume from the default camera pose using offscreen CPU raycasting.
+    :param volumeNode: vtkMRMLScalarVolumeNode
+    :param level: intensity level of the opacity threshold
+    :param size: [width, height] of the image in pixels
+    :returns: vtkImageData with RGB pixels
+    """
+    ijkToRas = vtk.vtkMatrix4x4()
+    volumeNode.GetIJKToRASMatrix(ijkToRas)
+
+    mapper = vtk.vtkFixedPointVolumeRayCastMapper()
+    mapper.SetInputData(volumeNode.GetImageData())
+    volumeProperty = vtk.vtkVolumeProperty()
+    self.updateVolumeProperty(volumeProperty, self.WINDOW, level, self.getIntensityMax(volumeNode.GetName()))
+    volumeActor = vtk.vtkVolume()
+    volumeActor.SetMapper(mapper)
+    volumeActor.SetProperty(volumeProperty)
+    volumeActor.SetUserMatrix(ijkToRas)
+
+    renderer = vtk.vtkRenderer()
+    renderer.AddVolume(volumeActor)
+    viewNode = slicer.mrmlScene.GetSingletonNode("1", "vtkMRMLViewNode")
+    if viewNode is not None:
+      renderer.SetBackground(viewNode.GetBackgroundColor())
+      renderer.SetBackground2(viewNode.GetBackgroundColor2())
+      renderer.GradientBackgroundOn()
+      liveCamera = slicer.modules.cameras.logic().GetViewActiveCameraNode(viewNode).GetCamera()
+      renderer.GetActiveCamera().SetViewAngle(liveCamera.GetViewAngle())
+
+    focalPoint, position, viewUp = self.getCameraPose(volumeNode)
+    camera = renderer.GetActiveCamera()
+    camera.SetFocalPoint(focalPoint)
+    camera.SetViewUp(viewUp)
+    camera.SetPosition(position)
+    renderer.ResetCameraClippingRange()
+
+    renderWindow = vtk.vtkRenderWindow()
+    renderWindow.SetOffScreenRendering(1)
+    renderWindow.SetSize(size[0], size[1])
+    renderWindow.AddRenderer(renderer)
+    renderWindow.Render()
+
+    windowToImage = vtk.vtkWindowToImageFilter()
+    windowToImage.SetInput(renderWindow)
+    windowToImage.SetInputBufferTypeToRGB()
+    windowToImage.ReadFrontBufferOff()
+    windowToImage.Update()
+    snapshot = vtk.vtkImageData()
+    snapshot.DeepCopy(windowToImage.GetOutput())
+    renderWindow.Finalize()
+    return snapshot
+
+  def getSnapshotSize(self):
+    """
+    Returns the size of the left 3D view in pixels, so snapshots can be shown without scaling.
+    """
+    viewWidget = self.getThreeDViewWidget("1")
+    if viewWidget is None:
+      return [self.SNAPSHOT_SIZE_DEFAULT, self.SNAPSHOT_SIZE_DEFAULT]
+    return list(viewWidget.threeDView().renderWindow().GetSize())
+
+  def getSnapshot(self, volumeName, level):
+    """
+    Returns the cached snapshot of a volume, if it has been rendered with the current threshold and FOV settings.
+    :returns: vtkImageData or None
+    """
+    fov = slicer.util.settingsValue(self.CAMERA_FOV_SETTING, self.CAMERA_FOV_DEFAULT, converter=int)
+    key = (volumeName, round(level, 3), fov)
+    if key not in self.snapshotCache:
+      return None
+    self.snapshotCache.move_to_end(key)
+    return self.snapshotCache[key]
+
+  def scheduleSnapshots(self):
+    """
+    Queues the volumes of the currently displayed pair for snapshot rendering, and those of the next scheduled pair.
+    Snapshots are rendered one per Qt event loop iteration. Each render runs in the main thread, so the user interface
+    pauses for the duration of one render, but not for the whole queue.
+    :returns: None
+    """
+    snapshotMode = slicer.util.settingsValue(self.SNAPSHOT_MODE_SETTING, self.SNAPSHOT_MODE_DEFAULT, converter=slicer.util.toBool)
+    parameterNode = self.getParameterNode()
+    nextPair = self.getNextPair()
+    if not snapshotMode or parameterNode.GetParameter(self.INPUT_TYPE) != "3D" or nextPair is None:
+      return
+
+    leftPercent = self.getParameter(self.LEFT_OPACITY_THRESHOLD) * 100
+    rightPercent = self.getParameter(self.RIGHT_OPACITY_THRESHOLD) * 100
+
+    pairs = [nextPair[:3]]
+    if self.schedule is not None and not self.isScheduleComplete():
+      pairs.append(self.schedule[self.schedulePosition])
+    queue = []
+    for scanName, leftModel, rightModel in pairs:
+      leftVolumeName = self.nameFromPatientSequenceAndModel(scanName, leftModel)
+      rightVolumeName = self.nameFromPatientSequenceAndModel(scanName, rightModel)
+      queue.append((leftVolumeName, self.getThresholdLevel(leftPercent, leftVolumeName)))
+      queue.append((rightVolumeName, self.getThresholdLevel(rightPercent, rightVolumeName)))
+
+    self.snapshotQueue = [(volumeName, level) for volumeName, level in queue if self.getSnapshot(volumeName, level) is None]
+    if self.snapshotQueue and not self.snapshotRenderingScheduled:
+      self.snapshotRenderingScheduled = True
+      qt.QTimer.singleShot(0, self.renderNextSnapshot)
+
+  def renderNextSnapshot(self):
+    """
+    Renders one snapshot from the queue, then schedules itself again until the queue is empty.
+    """
+    self.snapshotRenderingScheduled = False
+    parameterNode = self.getParameterNode()
+    fov = slicer.util.settingsValue(self.CAMERA_FOV_SETTING, self.CAMERA_FOV_DEFAULT, converter=int)
+    while self.snapshotQueue:
+      volumeName, level = self.snapshotQueue.pop(0)
+      volumeNode = parameterNode.GetNodeReference(volumeName)
+      if volumeNode is None or self.getSnapshot(volumeName, level) is not None:
+        continue
+      self.snapshotCache[(volumeName, round(level, 3), fov)] = self.renderVolumeSnapshot(volumeNode, level, self.getSnapshotSize())
+      while len(self.snapshotCache) > self.SNAPSHOT_CACHE_SIZE:
+        self.snapshotCache.popitem(last=False)
+      break
+
+    if self.snapshotQueue:
+      self.snapshotRenderingScheduled = True
+      qt.QTimer.singleShot(0, self.renderNextSnapshot)
+
+  def showSnapshot(self, viewTag, volumeName, snapshot):
+    """
+    Shows a pre-rendered image on top of a 3D view.
+    :param viewTag: singleton tag of the view node
+    :param volumeName: name of the volume in the snapshot
+    :param snapshot: vtkImageData
+    :returns: True if the snapshot is shown
+    """
+    viewWidget = self.getThreeDViewWidget(viewTag)
+    if viewWidget is None:
+      return False
+
+    actor = self.snapshotActors.get(viewTag)
+    if actor is None:
+      mapper = vtk.vtkImageMapper()
+      mapper.SetColorWindow(255)
+      mapper.SetColorLevel(127.5)
+      actor = vtk.vtkActor2D()
+      actor.SetMapper(mapper)
+      renderer = viewWidget.threeDView().renderWindow().GetRenderers().GetFirstRenderer()
+      renderer.AddActor2D(actor)
+      self.snapshotActors[viewTag] = actor
+
+    actor.GetMapper().SetInputData(snapshot)
+    actor.SetVisibility(True)
+    self.displayedSnapshots[viewTag] = volumeName
+    viewWidget.threeDView().scheduleRender()
+    return True
+
+  def hideSnapshots(self):
+    """
+    Hides snapshot images in all 3D views. Volume rendering visibility is not changed.
+    """
+    for viewTag, actor in self.snapshotActors.items():
+      actor.SetVisibility(False)
+      viewWidget = self.getThreeDViewWidget(viewTag)
+      if viewWidget is not None:
+        viewWidget.threeDView().scheduleRender()
+    self.displayedSnapshots = {}
+
+  def showLiveRendering(self):
+    """
+    Replaces the displayed snapshots with volume rendering of the same volumes.
+    """
+    parameterNode = self.getParameterNode()
+    volumeRenderingLogic = slicer.modules.volumerendering.logic()
+    volumeNames = list(self.displayedSnapshots.values())
+    self.hideSnapshots()
+    for volumeName in volumeNames:
+      volumeNode = parameterNode.GetNodeReference(volumeName)
+      if volumeNode is None:
+        continue
+      displayNode = volumeRenderingLogic.GetFirstVolumeRenderingDisplayNode(volumeNode)
+      if displayNode is not None:
+        displayNode.SetVisibility(True)
+
+  def invalidateSnapshots(self):
+    """
+    Deletes all pre-rendered snapshots, e.g. because the threshold or camera settings changed.
+    Snapshots currently shown are replaced by live rendering.
+    """
+    self.snapshotCache.clear()
+    self.snapshotQueue = []
+    if self.displayedSnapshots:
+      self.showLiveRendering()
 
   def nameFromPatientSequenceAndModel(self, patientSequence, model):
     # Get the full volume name by combining elements of patientSequence and model
@@ -1674,37 +5450,235 @@ class SegmentationComparisonLogic(ScriptedLoadableModuleLogic):
     volumeName = str(patientId) + "_" + model + "_" + "_".join(patientSequence.split("_")[1:])
     return volumeName
 
-  def hideCurrentVolumes(self):
+  def patientSequenceAndModelFromName(self, volumeName):
+    # Inverse of nameFromPatientSequenceAndModel
+    nameParts = volumeName.split("_")
+    return nameParts[0] + "_" + "_".join(nameParts[2:]), nameParts[1]
+
+  @profiler.profiled
+  def getPairDifference(self, scanName, modelA, modelB):
     """
-    Hides current pair of volumes.
+    Computes where the predictions of two models on a scan disagree. Predictions are thresholded at the same level as
+    for the similarity metrics. Cropped 3D predictions are placed in the union of their crop extents, where voxels
+    outside a crop count as empty. Differences are kept in a least recently used cache, in the alphabetical order of
+    the models, so each one is computed once whichever side the models are shown on.
+    :param scanName: patient_sequence name
+    :param modelA: name of one model
+    :param modelB: name of the other model
+    :returns: (vtkImageData, vtkMatrix4x4 IJK to RAS) of a label image with 1 where only the alphabetically first
+      model has the voxel and 2 where only the other has it, or None if the predictions are not loaded
+    """
+    modelA, modelB = sorted([modelA, modelB])
+    key = (scanName, modelA, modelB)
+    if key in self.differenceCache:
+      self.differenceCache.move_to_end(key)
+      return self.differenceCache[key]
+
+    parameterNode = self.getParameterNode()
+    volumeNodes = [parameterNode.GetNodeReference(self.nameFromPatientSequenceAndModel(scanName, modelName))
+                   for modelName in [modelA, modelB]]
+    if any(volumeNode is None or volumeNode.GetImageData() is None for volumeNode in volumeNodes):
+      return None
+
+    from vtk.util.numpy_support import numpy_to_vtk
+
+    with profiler.span("difference.compute", scan=scanName):
+      volumeStatisticsDict = self.getVolumeStatisticsDict()
+      masks = []
+      offsets = []  # First voxel of each prediction in the uncropped volume, as [k, j, i]
+      for volumeNode in volumeNodes:
+        array = slicer.util.arrayFromVolume(volumeNode)
+        maximum = array.max() if array.size else 0
+        masks.append(array > self.SIMILARITY_MASK_LEVEL * maximum if maximum > 0 else np.zeros(array.shape, dtype=bool))
+        cropExtent = volumeStatisticsDict.get(volumeNode.GetName(), {}).get("cropExtent")  # Only 3D volumes are cropped
+        offsets.append(np.array([cropExtent[4], cropExtent[2], cropExtent[0]] if cropExtent else [0, 0, 0]))
+
+      lower = np.minimum(offsets[0], offsets[1])
+      upper = np.maximum(offsets[0] + masks[0].shape, offsets[1] + masks[1].shape)
+      difference = np.zeros(upper - lower, dtype=np.uint8)
+      for label, mask, offset in zip([1, 2], masks, offsets):
+        start = offset - lower
+        region = tuple(slice(start[axis], start[axis] + mask.shape[axis]) for axis in range(3))
+        difference[region] += mask.astype(np.uint8) * np.uint8(label)
+      difference[difference == 3] = 0  # Voxels in both predictions
+
+      imageData = vtk.vtkImageData()
+      imageData.SetDimensions(difference.shape[2], difference.shape[1], difference.shape[0])
+      imageData.GetPointData().SetScalars(numpy_to_vtk(difference.ravel(), deep=True, array_type=vtk.VTK_UNSIGNED_CHAR))
+
+      # The union starts at a different voxel than the first prediction, but has the same spacing and directions
+      ijkToRas = vtk.vtkMatrix4x4()
+      volumeNodes[0].GetIJKToRASMatrix(ijkToRas)
+      start = lower - offsets[0]
+      origin = ijkToRas.MultiplyPoint([start[2], start[1], start[0], 1])
+      for row in range(3):
+        ijkToRas.SetElement(row, 3, origin[row])
+
+    self.differenceCache[key] = (imageData, ijkToRas)
+    while len(self.differenceCache) > self.DIFFERENCE_CACHE_SIZE:
+      self.differenceCache.popitem(last=False)
+    return self.differenceCache[key]
+
+  def prefetchPairDifference(self):
+    """
+    Computes the differences of the current pair, and of the next scheduled pair if its volumes are already loaded,
+    so showing the difference overlay does not slow down switching to a pair. Nothing is computed while the overlay
+    is hidden, because the computation runs in the main thread.
+    :returns: None
+    """
+    if not self.differenceOverlayVisible or not self.getParameterNode().GetParameter(self.SCANS_AND_MODELS_DICT):
+      return
+    pairs = [nextPair for nextPair in [self.getNextPair()] if len(nextPair) == 3]
+    if self.schedule is not None and not self.isScheduleComplete():
+      pairs.append(self.schedule[self.schedulePosition])
+    for scanName, leftModel, rightModel in pairs:
+      self.getPairDifference(scanName, leftModel, rightModel)
+
+  def setDifferenceOverlayVisible(self, visible):
+    """
+    Shows or hides the voxels where the predictions of the current pair disagree, in both comparison views.
+    :param visible: bool
+    :returns: None
+    """
+    self.differenceOverlayVisible = visible
+    self.updateDifferenceOverlay()
+
+  def getDifferenceNode(self):
+    """
+    Returns the label volume of the difference overlay, created with its own color table on first use.
+    :returns: vtkMRMLLabelMapVolumeNode
+    """
+    parameterNode = self.getParameterNode()
+    differenceNode = parameterNode.GetNodeReference(self.DIFFERENCE_VOLUME)
+    if differenceNode is not None:
+      return differenceNode
+
+    colorNode = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLColorTableNode", self.DIFFERENCE_VOLUME + "Colors")
+    colorNode.SetTypeToUser()
+    colorNode.SetNumberOfColors(3)
+    colorNode.SetColor(0, "Agreement", 0.0, 0.0, 0.0, 0.0)
+    colorNode.SetColor(1, "FirstModelOnly", *self.DIFFERENCE_LEFT_COLOR, 1.0)
+    colorNode.SetColor(2, "SecondModelOnly", *self.DIFFERENCE_RIGHT_COLOR, 1.0)
+
+    differenceNode = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLLabelMapVolumeNode", self.DIFFERENCE_VOLUME)
+    differenceNode.CreateDefaultDisplayNodes()
+    differenceNode.GetDisplayNode().SetAndObserveColorNodeID(colorNode.GetID())
+    parameterNode.SetNodeReferenceID(self.DIFFERENCE_VOLUME, differenceNode.GetID())
+    return differenceNode
+
+  def updateDifferenceOverlay(self):
+    """
+    Shows the difference of the current pair as a label layer in the 2D views, or as a volume rendering in the 3D
+    views, with the colors of the sides the models are shown on. Hides the overlay if it is turned off.
     :returns: None
     """
     parameterNode = self.getParameterNode()
+    difference = None
     nextPair = self.getNextPair()
-    volumeName1 = self.nameFromPatientSequenceAndModel(nextPair[0], nextPair[1])
-    volumeName2 = self.nameFromPatientSequenceAndModel(nextPair[0], nextPair[2])
+    if self.differenceOverlayVisible and parameterNode.GetParameter(self.SCANS_AND_MODELS_DICT) and len(nextPair) == 3:
+      difference = self.getPairDifference(*nextPair)
+    if difference is None:
+      self.hideDifferenceOverlay()
+      return
+
+    differenceNode = self.getDifferenceNode()
+    imageData, ijkToRas = difference
+    differenceNode.SetAndObserveImageData(imageData)
+    differenceNode.SetIJKToRASMatrix(ijkToRas)
+
+    # Label 1 belongs to the alphabetically first model, which may be shown on either side
+    if nextPair[1] < nextPair[2]:
+      colors = [self.DIFFERENCE_LEFT_COLOR, self.DIFFERENCE_RIGHT_COLOR]
+    else:
+      colors = [self.DIFFERENCE_RIGHT_COLOR, self.DIFFERENCE_LEFT_COLOR]
 
     if parameterNode.GetParameter(self.INPUT_TYPE) == "3D":
       volumeRenderingLogic = slicer.modules.volumerendering.logic()
+      displayNode = volumeRenderingLogic.GetFirstVolumeRenderingDisplayNode(differenceNode)
+      if displayNode is None:
+        volumeRenderingLogic.CreateDefaultVolumeRenderingNodes(differenceNode)
+        displayNode = volumeRenderingLogic.GetFirstVolumeRenderingDisplayNode(differenceNode)
+      self.updateDifferenceVolumeProperty(displayNode.GetVolumePropertyNode().GetVolumeProperty(), colors)
+      displayNode.SetViewNodeIDs([slicer.mrmlScene.GetSingletonNode(tag, "vtkMRMLViewNode").GetID() for tag in ["1", "2"]])
+      displayNode.SetVisibility(True)
+    else:
+      colorNode = differenceNode.GetDisplayNode().GetColorNode()
+      colorNode.SetColor(1, "FirstModelOnly", *colors[0], 1.0)
+      colorNode.SetColor(2, "SecondModelOnly", *colors[1], 1.0)
+      layoutManager = slicer.app.layoutManager()
+      for tag in ["1", "2"]:
+        sliceWidget = layoutManager.sliceWidget(tag)
+        if sliceWidget is not None:
+          sliceWidget.mrmlSliceCompositeNode().SetLabelVolumeID(differenceNode.GetID())
+          sliceWidget.mrmlSliceCompositeNode().SetLabelOpacity(self.DIFFERENCE_OPACITY)
+
+  def updateDifferenceVolumeProperty(self, volumeProperty, colors):
+    """
+    Sets transfer functions that show the two labels of a difference volume in the given colors.
+    :param volumeProperty: vtkVolumeProperty
+    :param colors: RGB colors of label 1 and label 2
+    :returns: None
+    """
+    opacityTransferFunction = vtk.vtkPiecewiseFunction()
+    opacityTransferFunction.AddPoint(0, 0.0)
+    opacityTransferFunction.AddPoint(1, self.DIFFERENCE_OPACITY)
+    opacityTransferFunction.AddPoint(2, self.DIFFERENCE_OPACITY)
 
-      volumeNode1 = parameterNode.GetNodeReference(volumeName1)
-      displayNode1 = volumeRenderingLogic.GetFirstVolumeRenderingDisplayNode(volumeNode1)
-      displayNode1.SetVisibility(False)
+    colorTransferFunction = vtk.vtkColorTransferFunction()
+    colorTransferFunction.AddRGBPoint(0, 0.0, 0.0, 0.0)
+    colorTransferFunction.AddRGBPoint(1, *colors[0])
+    colorTransferFunction.AddRGBPoint(2, *colors[1])
 
-      volumeNode2 = parameterNode.GetNodeReference(volumeName2)
-      displayNode2 = volumeRenderingLogic.GetFirstVolumeRenderingDisplayNode(volumeNode2)
-      displayNode2.SetVisibility(False)
-    else:
-      modelNode1 = parameterNode.GetNodeReference(volumeName1 + self.MODEL_SUFFIX)
-      modelDisplayNode1 = modelNode1.GetDisplayNode()
-      modelDisplayNode1.SetVisibility2D(False)
-      modelDisplayNode1.RemoveAllViewNodeIDs()
+    volumeProperty.SetColor(colorTransferFunction)
+    volumeProperty.SetScalarOpacity(opacityTransferFunction)
+    volumeProperty.ShadeOff()
+    volumeProperty.SetInterpolationTypeToNearest()
 
-      modelNode2 = parameterNode.GetNodeReference(volumeName2 + self.MODEL_SUFFIX)
-      modelDisplayNode2 = modelNode2.GetDisplayNode()
-      modelDisplayNode2.SetVisibility2D(False)
-      modelDisplayNode2.RemoveAllViewNodeIDs()
+  def hideDifferenceOverlay(self):
+    """
+    Hides the difference overlay from all comparison views, without changing whether it is turned on.
+    :returns: None
+    """
+    differenceNode = self.getParameterNode().GetNodeReference(self.DIFFERENCE_VOLUME)
+    if differenceNode is None:
+      return
+    displayNode = slicer.modules.volumerendering.logic().GetFirstVolumeRenderingDisplayNode(differenceNode)
+    if displayNode is not None:
+      displayNode.SetVisibility(False)
+    layoutManager = slicer.app.layoutManager()
+    for tag in ["1", "2"]:
+      sliceWidget = layoutManager.sliceWidget(tag)
+      if sliceWidget is not None and sliceWidget.mrmlSliceCompositeNode().GetLabelVolumeID() == differenceNode.GetID():
+        sliceWidget.mrmlSliceCompositeNode().SetLabelVolumeID(None)
+
+  def hideCurrentVolumes(self):
+    """
+    Hides current pair of volumes.
+    :returns: None
+    """
+    parameterNode = self.getParameterNode()
+    nextPair = self.getNextPair()
+    volumeNames = [self.nameFromPatientSequenceAndModel(nextPair[0], modelName) for modelName in nextPair[1:]]
+    self.hideDifferenceOverlay()
+
+    if parameterNode.GetParameter(self.INPUT_TYPE) == "3D":
+      self.hideSnapshots()
+      self.hidePreviewVolumes()
+      volumeRenderingLogic = slicer.modules.volumerendering.logic()
 
+      for volumeName in volumeNames:
+        volumeNode = parameterNode.GetNodeReference(volumeName)
+        displayNode = volumeRenderingLogic.GetFirstVolumeRenderingDisplayNode(volumeNode)
+        displayNode.SetVisibility(False)
+    else:
+      self.stopCine()
+      for volumeName in volumeNames:
+        modelNode = parameterNode.GetNodeReference(volumeName + self.MODEL_SUFFIX)
+        modelDisplayNode = modelNode.GetDisplayNode()
+        modelDisplayNode.SetVisibility2D(False)
+        modelDisplayNode.RemoveAllViewNodeIDs()
+
+  @profiler.profiled
   def prepareDisplay(self, leftThreshold, rightThreshold):
     """
     Prepare views and show models in each view
@@ -1723,9 +5697,18 @@ class SegmentationComparisonLogic(ScriptedLoadableModuleLogic):
       return
 
     nextPair = self.getNextPair()
+    self.startPairTiming()
+    if len(nextPair) > 3:
+      self.prepareRankingDisplay(leftThreshold)
+      return
+    snapshotMode = slicer.util.settingsValue(self.SNAPSHOT_MODE_SETTING, self.SNAPSHOT_MODE_DEFAULT, converter=slicer.util.toBool)
+    progressiveDisplay = slicer.util.settingsValue(self.PROGRESSIVE_DISPLAY_SETTING, self.PROGRESSIVE_DISPLAY_DEFAULT, converter=slicer.util.toBool)
 
     slicer.app.setRenderPaused(True)
 
+    if inputType == "3D":
+      self.hidePreviewVolumes()  # Previews are shown again below if needed
+
     if inputType == "2D":
       # Set ultrasound frames as background in all slices
       scanNode = parameterNode.GetNodeReference(nextPair[0])
@@ -1742,8 +5725,14 @@ class SegmentationComparisonLogic(ScriptedLoadableModuleLogic):
       viewNode1.LinkedControlOn()
       volumeDisplayNode1 = self.setVolumeRenderingProperty(volumeNode1, self.WINDOW, leftThreshold)
       volumeDisplayNode1.SetViewNodeIDs([viewNode1.GetID()])
-      volumeDisplayNode1.SetVisibility(True)
       self.centerAndRotateCamera(volumeNode1, viewNode1)
+      snapshot1 = self.getSnapshot(volumeName1, self.getThresholdLevel(self.getParameter(self.LEFT_OPACITY_THRESHOLD) * 100, volumeName1))
+      if snapshotMode and snapshot1 is not None and self.showSnapshot("1", volumeName1, snapshot1):
+        volumeDisplayNode1.SetVisibility(False)
+      elif progressiveDisplay and self.showPreviewVolume("1", volumeNode1, volumeDisplayNode1):
+        volumeDisplayNode1.SetVisibility(False)
+      else:
+        volumeDisplayNode1.SetVisibility(True)
     else:
       sliceWidget = layoutManager.sliceWidget("1")
       sliceWidget.mrmlSliceCompositeNode().SetLinkedControl(True)
@@ -1767,8 +5756,14 @@ class SegmentationComparisonLogic(ScriptedLoadableModuleLogic):
       viewNode2.LinkedControlOn()
       volumeDisplayNode2 = self.setVolumeRenderingProperty(volumeNode2, self.WINDOW, rightThreshold)
       volumeDisplayNode2.SetViewNodeIDs([viewNode2.GetID()])
-      volumeDisplayNode2.SetVisibility(True)
       self.centerAndRotateCamera(volumeNode2, viewNode2)
+      snapshot2 = self.getSnapshot(volumeName2, self.getThresholdLevel(self.getParameter(self.RIGHT_OPACITY_THRESHOLD) * 100, volumeName2))
+      if snapshotMode and snapshot2 is not None and self.showSnapshot("2", volumeName2, snapshot2):
+        volumeDisplayNode2.SetVisibility(False)
+      elif progressiveDisplay and self.showPreviewVolume("2", volumeNode2, volumeDisplayNode2):
+        volumeDisplayNode2.SetVisibility(False)
+      else:
+        volumeDisplayNode2.SetVisibility(True)
     else:
       sliceWidget = layoutManager.sliceWidget("2")
       sliceWidget.mrmlSliceCompositeNode().SetLinkedControl(True)
@@ -1783,21 +5778,18 @@ class SegmentationComparisonLogic(ScriptedLoadableModuleLogic):
       modelDisplayNode2.AddViewNodeID(sliceNode.GetID())
       modelDisplayNode2.SetVisibility2D(True)
 
+    if inputType == "2D":
+      self.displayedContourFrames = {}
+      self.updateFrameContours()
+
+    if self.differenceOverlayVisible:
+      self.updateDifferenceOverlay()
+
     # Show volume IDs in views if setting is on
     showIds = slicer.util.settingsValue(self.SHOW_IDS_SETTING, False, converter=slicer.util.toBool)
 
-    layoutManager = slicer.app.layoutManager()
-    viewWidget1 = None
-    viewWidget2 = None
-    for viewNumber in range(layoutManager.threeDViewCount):
-      threeDWidget = layoutManager.threeDWidget(viewNumber)
-      viewNode = threeDWidget.mrmlViewNode()
-      if viewNode.GetSingletonTag() == "1":
-        viewWidget1 = threeDWidget
-      elif viewNode.GetSingletonTag() == "2":
-        viewWidget2 = threeDWidget
-      else:
-        pass
+    viewWidget1 = self.getThreeDViewWidget("1")
+    viewWidget2 = self.getThreeDViewWidget("2")
 
     if viewWidget1 is None:
       logging.error("View 1 not found!")
@@ -1824,18 +5816,191 @@ class SegmentationComparisonLogic(ScriptedLoadableModuleLogic):
 
     slicer.app.setRenderPaused(False)
 
-  def addRecordInTable(self, leftScore):
+    if self.pendingRefinements:
+      # Draw the downsampled volumes now, and switch to full resolution when control returns to the event loop
+      viewWidget1.threeDView().forceRender()
+      viewWidget2.threeDView().forceRender()
+      qt.QTimer.singleShot(0, self.refineDisplay)
+    else:
+      self.observeFirstRender()
+
+    self.scheduleSnapshots()
+    qt.QTimer.singleShot(0, self.prefetchPairDifference)
+
+  @profiler.profiled
+  def prepareRankingDisplay(self, threshold):
+    """
+    Shows each model of a ranking screen in its own view, with live rendering. Snapshots, previews and the difference
+    overlay are only used for pairs.
+    :param threshold: intensity value around which opaque voxels transition to transparent, in all views
+    :returns: None
+    """
+    parameterNode = self.getParameterNode()
+    inputType = parameterNode.GetParameter(self.INPUT_TYPE)
+    nextPair = self.getNextPair()
+    layoutManager = slicer.app.layoutManager()
+    showIds = slicer.util.settingsValue(self.SHOW_IDS_SETTING, False, converter=slicer.util.toBool)
+
+    slicer.app.setRenderPaused(True)
+
+    if inputType == "3D":
+      self.hidePreviewVolumes()
+      self.hideSnapshots()
+    else:
+      scanNode = parameterNode.GetNodeReference(nextPair[0])
+      slicer.util.setSliceViewerLayers(background=scanNode, fit=True)
+
+    for viewTag, modelName in self.getViewModels(nextPair):
+      volumeName = self.nameFromPatientSequenceAndModel(nextPair[0], modelName)
+      volumeNode = parameterNode.GetNodeReference(volumeName)
+      if inputType == "3D":
+        viewNode = slicer.mrmlScene.GetSingletonNode(viewTag, "vtkMRMLViewNode")
+        viewNode.LinkedControlOn()
+        volumeDisplayNode = self.setVolumeRenderingProperty(volumeNode, self.WINDOW, threshold)
+        volumeDisplayNode.SetViewNodeIDs([viewNode.GetID()])
+        self.centerAndRotateCamera(volumeNode, viewNode)
+        volumeDisplayNode.SetVisibility(True)
+        viewWidget = self.getThreeDViewWidget(viewTag)
+        if viewWidget is not None:
+          viewWidget.threeDView().cornerAnnotation().SetText(vtk.vtkCornerAnnotation.UpperRight, volumeName if showIds else "")
+          viewWidget.threeDView().cornerAnnotation().GetTextProperty().SetColor(1, 1, 1)
+      else:
+        sliceWidget = layoutManager.sliceWidget(viewTag)
+        sliceWidget.mrmlSliceCompositeNode().SetLinkedControl(True)
+        sliceWidget.sliceController().setCompositingToAdd()
+        sliceViewer = sliceWidget.mrmlSliceCompositeNode()
+        sliceViewer.SetForegroundVolumeID(volumeNode.GetID())
+        sliceViewer.SetForegroundOpacity(threshold / self.IMAGE_INTENSITY_MAX)
+        sliceWidget.sliceLogic().SetSliceOffset(1)  # Start at second frame since first is blank
+        modelDisplayNode = parameterNode.GetNodeReference(volumeName + self.MODEL_SUFFIX).GetDisplayNode()
+        modelDisplayNode.AddViewNodeID(sliceWidget.mrmlSliceNode().GetID())
+        modelDisplayNode.SetVisibility2D(True)
+
+    if inputType == "2D":
+      self.displayedContourFrames = {}
+      self.updateFrameContours()
+
+    slicer.app.setRenderPaused(False)
+    self.observeFirstRender()
+
+  @profiler.profiled
+  def addRecordInTable(self, leftScore, decisionTime=None, models=None):
+    """
+    Adds the result of the current comparison to the comparison history table, with display latency telemetry.
+    :param leftScore: 1.0 if left side is better, 0.0 if right side is better, 0.5 for equal
+    :param decisionTime: time of the click in seconds since epoch, or None to use the current time
+    :param models: [leftModel, rightModel] of one pair of a ranking screen, or None for the current pair
+    :returns: None
+    """
     nextPair = self.getNextPair()
+    if models is None:
+      models = nextPair[1:3]
     surveyTable = self.getParameterNode().GetNodeReference(self.SURVEY_RESULTS_TABLE)
     surveyTable.AddEmptyRow()
     rowIdx = surveyTable.GetNumberOfRows() - 1
-    namesVolumesToDisplay = [self.nameFromPatientSequenceAndModel(nextPair[0], nextPair[1]),
-                             self.nameFromPatientSequenceAndModel(nextPair[0], nextPair[2])]
-    surveyTable.SetCellText(rowIdx, 0, str(rowIdx + 1))
-    surveyTable.SetCellText(rowIdx, 1, namesVolumesToDisplay[0])
-    surveyTable.SetCellText(rowIdx, 2, str(leftScore))
-    surveyTable.SetCellText(rowIdx, 3, namesVolumesToDisplay[1])
-    surveyTable.SetCellText(rowIdx, 4, str(1.0 - leftScore))
+    namesVolumesToDisplay = [self.nameFromPatientSequenceAndModel(nextPair[0], models[0]),
+                             self.nameFromPatientSequenceAndModel(nextPair[0], models[1])]
+    if self.pairTiming["pairSerial"] == self.pairSerial:
+      displayStart, rendered = self.pairTiming["displayStart"], self.pairTiming["rendered"]
+    else:
+      displayStart, rendered = float("nan"), float("nan")  # Pair was not displayed by prepareDisplay
+
+    table = surveyTable.GetTable()
+    table.GetColumnByName("Comparison").SetValue(rowIdx, rowIdx + 1)
+    table.GetColumnByName("Model_L").SetValue(rowIdx, namesVolumesToDisplay[0])
+    table.GetColumnByName("Score_L").SetValue(rowIdx, leftScore)
+    table.GetColumnByName("Model_R").SetValue(rowIdx, namesVolumesToDisplay[1])
+    table.GetColumnByName("Score_R").SetValue(rowIdx, 1.0 - leftScore)
+    table.GetColumnByName("DisplayStartTime").SetValue(rowIdx, displayStart)
+    table.GetColumnByName("RenderedTime").SetValue(rowIdx, rendered)
+    table.GetColumnByName("DecisionTime").SetValue(rowIdx, time.time() if decisionTime is None else decisionTime)
+    table.Modified()
+
+  def startPairTiming(self):
+    """
+    Records the display start time of a newly selected pair. Nothing is done when the current pair is displayed
+    again, e.g. after a settings change, so the latency is measured from the first display.
+    :returns: None
+    """
+    if self.pairTiming["pairSerial"] == self.pairSerial:
+      return
+    self.pairTiming = {"pairSerial": self.pairSerial, "displayStart": time.time(), "rendered": float("nan")}
+
+  def observeFirstRender(self):
+    """
+    Observes all comparison views of the current screen to record when they have finished rendering its final images.
+    :returns: None
+    """
+    self.removeRenderObservers()
+    nextPair = self.getNextPair()
+    if not math.isnan(self.pairTiming["rendered"]) or nextPair is None:
+      return
+
+    layoutManager = slicer.app.layoutManager()
+    views = []
+    for viewTag, modelName in self.getViewModels(nextPair):
+      if self.getParameterNode().GetParameter(self.INPUT_TYPE) == "3D":
+        viewWidget = self.getThreeDViewWidget(viewTag)
+        views.append(viewWidget.threeDView() if viewWidget is not None else None)
+      else:
+        sliceWidget = layoutManager.sliceWidget(viewTag)
+        views.append(sliceWidget.sliceView() if sliceWidget is not None else None)
+
+    for view in views:
+      if view is None:
+        continue
+      renderWindow = view.renderWindow()
+      observerTag = renderWindow.AddObserver(vtk.vtkCommand.EndEvent, self.onComparisonViewRendered)
+      self.renderObservations.append((renderWindow, observerTag))
+      view.scheduleRender()
+
+  def removeRenderObservers(self):
+    for renderWindow, observerTag in self.renderObservations:
+      renderWindow.RemoveObserver(observerTag)
+    self.renderObservations = []
+
+  def onComparisonViewRendered(self, caller, event):
+    remainingObservations = []
+    for renderWindow, observerTag in self.renderObservations:
+      if renderWindow == caller:
+        renderWindow.RemoveObserver(observerTag)
+      else:
+        remainingObservations.append((renderWindow, observerTag))
+    self.renderObservations = remainingObservations
+    if not self.renderObservations:
+      self.pairTiming["rendered"] = time.time()
+
+  def getLatencySummary(self):
+    """
+    Computes median and 95th percentile of switch latency (display start to first full render) and decision time
+    (first full render to click) over the comparisons of this Slicer session.
+    :returns: dict with "p50" and "p95" in seconds for "switchLatency" and "decisionTime", NaN if not measured
+    """
+    summary = {"switchLatency": {"p50": float("nan"), "p95": float("nan")},
+               "decisionTime": {"p50": float("nan"), "p95": float("nan")}}
+    surveyTable = self.getParameterNode().GetNodeReference(self.SURVEY_RESULTS_TABLE)
+    if surveyTable is None or self.sessionComparisonCount == 0:
+      return summary
+
+    from vtk.util.numpy_support import vtk_to_numpy
+    table = surveyTable.GetTable()
+    numberOfRows = table.GetNumberOfRows()
+    firstRow = max(0, numberOfRows - self.sessionComparisonCount)
+    displayStart = vtk_to_numpy(table.GetColumnByName("DisplayStartTime"))[firstRow:numberOfRows]
+    rendered = vtk_to_numpy(table.GetColumnByName("RenderedTime"))[firstRow:numberOfRows]
+    decision = vtk_to_numpy(table.GetColumnByName("DecisionTime"))[firstRow:numberOfRows]
+
+    for key, values in [("switchLatency", rendered - displayStart), ("decisionTime", decision - rendered)]:
+      values = values[~np.isnan(values)]
+      if values.size > 0:
+        summary[key]["p50"] = float(np.percentile(values, 50))
+        summary[key]["p95"] = float(np.percentile(values, 95))
+    return summary
+
+  def getLatencySummaryText(self):
+    summary = self.getLatencySummary()
+    return (f"Switch latency p50/p95: {summary['switchLatency']['p50']:.3f} / {summary['switchLatency']['p95']:.3f} s\n"
+            f"Decision time p50/p95: {summary['decisionTime']['p50']:.1f} / {summary['decisionTime']['p95']:.1f} s")
 
   def setVolumeOpacityThreshold(self, inputVolume, imageThresholdPercent):
     """
@@ -1844,13 +6009,8 @@ class SegmentationComparisonLogic(ScriptedLoadableModuleLogic):
     @param imageThresholdPercent: opacity treshold in percentage [0..100] float
     @return: None
     """
-    # [0..100] >> [0..MAX], where MAX is typically IMAGE_INTENSITY_MAX + 25, if intensity window is 50.
-
-    maxThreshold = self.IMAGE_INTENSITY_MAX + self.WINDOW / 2.0
-    imageThreshold = imageThresholdPercent * maxThreshold / 100.0
-
     window = self.WINDOW
-    level = imageThreshold
+    level = self.getThresholdLevel(imageThresholdPercent, inputVolume.GetName())
 
     displayNode = self.setVolumeRenderingProperty(inputVolume, window, level)
     if not displayNode:
@@ -1875,6 +6035,13 @@ class SegmentationComparisonTest(ScriptedLoadableModuleTest):
   https://github.com/Slicer/Slicer/blob/master/Base/Python/slicer/ScriptedLoadableModule.py
   """
 
+  # Budgets for the end-to-end pair switch tests
+  PAIR_SWITCH_CLICKS = 300
+  PAIR_SWITCH_WARMUP_CLICKS = 20  # Caches and lazily created nodes are filled during these clicks
+  PAIR_SWITCH_LATENCY_BUDGET_P95 = {"2D": 0.25, "3D": 0.5}  # seconds, click to rendered views
+  MEMORY_GROWTH_BUDGET_MB = 200  # Process memory growth after warmup
+  NODE_GROWTH_BUDGET = 0  # Nodes added to the scene after warmup
+
   def setUp(self):
     """ Do whatever is needed to reset the state - typically a scene clear will be enough.
     """
@@ -1885,6 +6052,203 @@ class SegmentationComparisonTest(ScriptedLoadableModuleTest):
     """
     self.setUp()
     self.test_SegmentationComparison1()
+    self.setUp()
+    self.test_PairSwitchLatency3D()
+    self.setUp()
+    self.test_PairSwitchLatency2D()
+    self.setUp()
+    self.test_Glicko2RatingPeriod()
+    self.setUp()
+    self.test_GenerateSchedule()
+    self.setUp()
+    self.test_StudyCoordinator()
+    self.setUp()
+    self.test_UndoRedo()
+
+  def test_Glicko2RatingPeriod(self):
+    """
+    Checks the Glicko-2 engine against the worked example of Glickman, "Example of the Glicko-2 system".
+    """
+    self.delayDisplay("Starting Glicko-2 test")
+    engine = Glicko2RatingEngine(initialRating=1500)
+    surveyDF = pd.DataFrame({
+      "ModelName": ["Player", "A", "B", "C"],
+      "Glicko": [1500.0, 1400.0, 1550.0, 1700.0],
+      "GlickoRD": [200.0, 30.0, 100.0, 300.0],
+      "GlickoVolatility": [0.06] * 4,
+    })
+    engine.updateRatingPeriod(surveyDF, np.array([0, 0, 0]), np.array([1, 2, 3]), np.array([1.0, 0.0, 0.0]))
+    self.assertAlmostEqual(surveyDF.at[0, "Glicko"], 1464.06, places=1)
+    self.assertAlmostEqual(surveyDF.at[0, "GlickoRD"], 151.52, places=1)
+    self.assertAlmostEqual(surveyDF.at[0, "GlickoVolatility"], 0.05999, places=4)
+
+    # Older survey files without Glicko-2 columns
+    surveyDF = pd.DataFrame({"ModelName": ["A", "B"], "Elo": [1000.0, 1000.0]})
+    engine.initializeColumns(surveyDF)
+    self.assertEqual(surveyDF["GlickoRD"].tolist(), [engine.INITIAL_RD] * 2)
+    self.delayDisplay("Glicko-2 test passed")
+
+  def test_GenerateSchedule(self):
+    """
+    Checks that schedules are reproducible from their seed, and the balance of pairs and scans they guarantee.
+    """
+    self.delayDisplay("Starting schedule generation test")
+    logic = SegmentationComparisonLogic()
+    modelNames = [f"model{i}" for i in range(7)]
+    scanNames = [f"patient{i}_seq" for i in range(3)]
+    scansAndModelsDict = {modelName: {scanName: 0 for scanName in scanNames} for modelName in modelNames}
+    budget = 100
+
+    scheduleDF = logic.generateSchedule(scansAndModelsDict, budget, seed=1)
+    self.assertEqual(len(scheduleDF), budget)
+    self.assertEqual(scheduleDF["Comparison"].tolist(), list(range(1, budget + 1)))
+    self.assertTrue(scheduleDF.equals(logic.generateSchedule(scansAndModelsDict, budget, seed=1)))
+    self.assertFalse(scheduleDF.equals(logic.generateSchedule(scansAndModelsDict, budget, seed=2)))
+    self.assertTrue((scheduleDF["LeftModel"] != scheduleDF["RightModel"]).all())
+
+    # Every pair within one comparison of the others, and each pair within one comparison on each scan
+    pairs = scheduleDF[["LeftModel", "RightModel"]].apply(lambda row: tuple(sorted(row)), axis=1)
+    pairCounts = pairs.value_counts().reindex(list(itertools.combinations(modelNames, 2)), fill_value=0)
+    self.assertLessEqual(pairCounts.max() - pairCounts.min(), 1)
+    pairScanCounts = pd.DataFrame({"Pair": pairs, "ScanName": scheduleDF["ScanName"]}).value_counts().unstack(fill_value=0)
+    pairScanCounts = pairScanCounts.reindex(columns=scanNames, fill_value=0)
+    self.assertLessEqual((pairScanCounts.max(axis=1) - pairScanCounts.min(axis=1)).max(), 1)
+
+    # Models without a shared scan cannot be scheduled
+    with self.assertRaises(ValueError):
+      logic.generateSchedule({"model0": {scanNames[0]: 0}, "model1": {scanNames[1]: 0}}, budget)
+    self.delayDisplay("Schedule generation test passed")
+
+  def test_StudyCoordinator(self):
+    """
+    Checks leases and shared results between two raters of the same shared study database.
+    """
+    self.delayDisplay("Starting shared study test")
+    databaseDirectory = tempfile.mkdtemp(dir=slicer.app.temporaryPath)
+    databasePath = os.path.join(databaseDirectory, "study.sqlite")
+    surveyDF = pd.DataFrame({
+      "ModelName": ["A", "B", "C"],
+      "Elo": [1000.0] * 3,
+      "GamesPlayed": [0] * 3,
+      "TimeLastPlayed": pd.Series([pd.NaT] * 3, dtype="datetime64[ns]"),
+    })
+    coordinator1 = StudyCoordinator(databasePath, "rater1")
+    coordinator2 = StudyCoordinator(databasePath, "rater2")
+    try:
+      # The first rater creates the study with the comparisons of a resumed session
+      coordinator1.initializeModels(surveyDF, ["Elo"], history=[("scan1", "A", "B", 1.0)])
+      coordinator2.initializeModels(surveyDF, ["Elo"], history=[("scan1", "B", "C", 0.0)])
+      state = coordinator2.readState()
+      self.assertEqual(set(state["models"]), {"A", "B", "C"})
+      self.assertEqual(state["pairCounts"], [("scan1", "A", "B", 1)])
+      self.assertEqual(state["pending"], [])
+
+      # A pair leased to one rater is refused to the other, in either order of models
+      self.assertTrue(coordinator1.leaseScreen(["scan1", "A", "B"]))
+      self.assertFalse(coordinator2.leaseScreen(["scan1", "B", "A"]))
+      self.assertTrue(coordinator2.leaseScreen(["scan1", "A", "C"]))
+      self.assertEqual(coordinator2.readState()["leases"], [("scan1", "A", "B")])
+
+      # Results written by one rater are read by the other
+      surveyDF.loc[0, "Elo"] = 1016.0
+      surveyDF.loc[1, "Elo"] = 984.0
+      surveyDF.loc[[0, 1], "GamesPlayed"] = 1
+      surveyDF.loc[[0, 1], "TimeLastPlayed"] = pd.Timestamp("2024-01-01 12:00:00")
+      with coordinator1.transaction():
+        coordinator1.writeResults(surveyDF, ["Elo"], "scan1", [("A", "B", 1.0)], periodClosed=False)
+      state = coordinator2.readState()
+      self.assertEqual(state["models"]["A"]["Ratings"]["Elo"], 1016.0)
+      self.assertEqual(state["models"]["B"]["Ratings"]["Elo"], 984.0)
+      self.assertEqual(state["models"]["B"]["GamesPlayed"], 1)
+      self.assertEqual(pd.Timestamp(state["models"]["A"]["TimeLastPlayed"]), pd.Timestamp("2024-01-01 12:00:00"))
+      self.assertIsNone(state["models"]["C"]["TimeLastPlayed"])
+      self.assertEqual(state["pairCounts"], [("scan1", "A", "B", 2)])
+      self.assertEqual(state["pending"], [("A", "B", 1.0)])
+      self.assertEqual(state["leases"], [])  # Released by writeResults
+      self.assertTrue(coordinator2.leaseScreen(["scan1", "A", "B"]))
+
+      # Closing the rating period marks all comparisons as rated
+      with coordinator2.transaction():
+        coordinator2.writeResults(surveyDF, ["Elo"], "scan1", [], periodClosed=True)
+      self.assertEqual(coordinator1.readState()["pending"], [])
+    finally:
+      coordinator1.close()
+      coordinator2.close()
+      shutil.rmtree(databaseDirectory, ignore_errors=True)
+    self.delayDisplay("Shared study test passed")
+
+  def getUndoState(self, logic):
+    """
+    Returns a copy of the state that answering a screen changes, for comparing before and after undo and redo.
+    """
+    parameterNode = logic.getParameterNode()
+    return {
+      "survey": logic.getSurveyTable(),
+      "scansAndModels": logic.getScansAndModelsDict(),
+      "pairCoverage": dict(logic.pairCoverage),
+      "pairGames": dict(logic.pairGames),
+      "pending": list(logic.pendingRatingPeriod),
+      "rankingSnapshots": len(logic.rankingSnapshots),
+      "surveyRows": parameterNode.GetNodeReference(logic.SURVEY_RESULTS_TABLE).GetNumberOfRows(),
+      "eloHistoryRows": parameterNode.GetNodeReference(logic.ELO_HISTORY_TABLE).GetNumberOfRows(),
+      "sessionComparisonCount": logic.sessionComparisonCount,
+      "nextPair": list(logic.getNextPair()),
+    }
+
+  def assertUndoStateEqual(self, state, expectedState):
+    pd.testing.assert_frame_equal(state["survey"], expectedState["survey"])
+    for key in expectedState:
+      if key != "survey":
+        self.assertEqual(state[key], expectedState[key], key)
+
+  def test_UndoRedo(self):
+    """
+    Answers several screens, undoes some of them and redoes them, and checks that ratings, games played, coverage,
+    history tables and the pending rating period return to their earlier values each time.
+    """
+    self.delayDisplay("Starting undo test")
+    studyDirectory = tempfile.mkdtemp(dir=slicer.app.temporaryPath)
+    study = SyntheticStudyGenerator(seed=0).generate(studyDirectory, inputType="3D", numberOfModels=4, numberOfScans=2,
+                                                     frameSize=24)
+    logic = SegmentationComparisonLogic()
+    parameterNode = logic.getParameterNode()
+    logic.setDefaultParameters(parameterNode)
+    parameterNode.SetParameter(logic.INPUT_TYPE, "3D")
+    parameterNode.SetParameter(logic.RATING_PERIOD, "3")  # Some undone screens close a rating period, some do not
+    logic.loadVolumes(studyDirectory)
+    logic.setSurveyHistory(None)
+    logic.setEloHistoryTable(None)
+    logic.loadSurveyTable("")
+    logic.updateNextPair(True)
+
+    numberOfScreens = 7
+    numberOfUndos = 4
+    states = [self.getUndoState(logic)]
+    for i in range(numberOfScreens):
+      score = [1.0, 0.5, 0.0][i % 3]
+      logic.updateComparisonData(score)
+      logic.addRecordInTable(score)
+      logic.sessionComparisonCount += 1
+      logic.updateNextPair(True)
+      states.append(self.getUndoState(logic))
+    self.assertEqual(states[-1]["surveyRows"], numberOfScreens)
+
+    for i in range(1, numberOfUndos + 1):
+      self.assertTrue(logic.undoComparison())
+      self.assertUndoStateEqual(self.getUndoState(logic), states[numberOfScreens - i])
+    for i in range(numberOfUndos - 1, -1, -1):
+      self.assertTrue(logic.redoComparison())
+      self.assertUndoStateEqual(self.getUndoState(logic), states[numberOfScreens - i])
+    self.assertFalse(logic.redoComparison())
+
+    # A new answer after undo cannot be followed by redo
+    self.assertTrue(logic.undoComparison())
+    logic.updateComparisonData(1.0)
+    self.assertFalse(logic.canRedo())
+
+    logic.resetScene()
+    shutil.rmtree(studyDirectory, ignore_errors=True)
+    self.delayDisplay("Undo test passed")
 
   def test_SegmentationComparison1(self):
     """ Ideally you should have several levels of tests.  At the lowest level
@@ -1902,6 +6266,386 @@ class SegmentationComparisonTest(ScriptedLoadableModuleTest):
 
     # Get/create input data
 
+    studyDirectory = tempfile.mkdtemp(dir=slicer.app.temporaryPath)
+    outputDirectory = tempfile.mkdtemp(dir=slicer.app.temporaryPath)
+    study = SyntheticStudyGenerator(seed=0).generate(studyDirectory, inputType="3D", numberOfModels=3, numberOfScans=2,
+                                                     frameSize=24)
+    self.delayDisplay(f"Generated synthetic study with {len(study['files'])} files")
+
     # Test the module logic
 
+    logic = SegmentationComparisonLogic()
+    parameterNode = logic.getParameterNode()
+    logic.setDefaultParameters(parameterNode)
+    parameterNode.SetParameter(logic.INPUT_TYPE, "3D")
+
+    logic.loadVolumes(studyDirectory)
+    scansAndModelsDict = logic.getScansAndModelsDict()
+    self.assertEqual(set(scansAndModelsDict.keys()), set(study["modelNames"]))
+    for modelName in study["modelNames"]:
+      self.assertEqual(set(scansAndModelsDict[modelName].keys()), set(study["scanNames"]))
+
+    logic.setSurveyHistory(None)
+    logic.setEloHistoryTable(None)
+    logic.loadSurveyTable("")
+    logic.updateNextPair(True)
+    numberOfComparisons = 10
+    for i in range(numberOfComparisons):
+      score = [1.0, 0.5, 0.0][i % 3]
+      logic.updateComparisonData(score)
+      logic.addRecordInTable(score)
+      logic.sessionComparisonCount += 1
+      logic.updateNextPair(True)
+
+    self.assertEqual(logic.getTotalComparisonCount(), numberOfComparisons)
+    surveyDF = logic.getSurveyTable()
+    self.assertEqual(surveyDF["GamesPlayed"].sum(), 2 * numberOfComparisons)
+    self.assertAlmostEqual(surveyDF["Elo"].sum(), logic.DEFAULT_ELO * len(study["modelNames"]), places=6)
+
+    # Save and resume from the saved files
+
+    resultsSavePath = logic.saveResults(outputDirectory)
+    timestamp = os.path.basename(resultsSavePath).split("_")[-1]
+    logic.setSurveyHistory(os.path.join(outputDirectory, "comparison_history_" + timestamp))
+    logic.setEloHistoryTable(os.path.join(outputDirectory, "elo_history_" + timestamp))
+    logic.loadSurveyTable(resultsSavePath)
+    self.assertEqual(logic.getTotalComparisonCount(), numberOfComparisons)
+    self.assertEqual(logic.getSurveyTable()["GamesPlayed"].sum(), 2 * numberOfComparisons)
+
+    logic.resetScene()
+    shutil.rmtree(studyDirectory, ignore_errors=True)
+    shutil.rmtree(outputDirectory, ignore_errors=True)
+
+    self.delayDisplay('Test passed')
+
+  def getProcessMemory(self):
+    """
+    Returns the resident memory of the Slicer process in bytes, or None if psutil is not available.
+    """
+    try:
+      import psutil
+    except ImportError:
+      return None
+    return psutil.Process().memory_info().rss
+
+  def test_PairSwitchLatency3D(self):
+    self.runPairSwitchScenario("3D")
+
+  def test_PairSwitchLatency2D(self):
+    self.runPairSwitchScenario("2D")
+
+  def runPairSwitchScenario(self, inputType):
+    """ Loads a synthetic study through the module widget and rates many pairs with scripted clicks.
+    Fails if the time from click to rendered views or the growth of memory and scene nodes exceed their budgets.
+    """
+
+    self.delayDisplay(f"Starting the {inputType} pair switch latency test")
+
+    studyDirectory = tempfile.mkdtemp(dir=slicer.app.temporaryPath)
+    SyntheticStudyGenerator(seed=0).generate(studyDirectory, inputType=inputType, numberOfModels=5, numberOfScans=4,
+                                             numberOfFrames=32, frameSize=64)
+
+    slicer.util.selectModule("SegmentationComparison")
+    widget = slicer.util.getModuleWidget("SegmentationComparison")
+    widget.logic.surveyStarted = False  # Avoid the confirmation dialog for discarding progress
+    if inputType == "2D":
+      widget.ui.twoDRadioButton.click()
+    else:
+      widget.ui.threeDRadioButton.click()
+    widget.ui.inputDirectorySelector.directory = studyDirectory
+    widget.ui.csvPathSelector.currentPath = ""
+    widget.onLoadButton()
+    self.assertTrue(widget.logic.getScansAndModelsDict(), "Synthetic study was not loaded")
+    while widget.logic.isBackgroundLoading():  # Nodes of volumes loaded in the background would count as growth
+      slicer.app.processEvents()
+      time.sleep(0.01)
+
+    clickHandlers = [widget.onLeftBetterClicked, widget.onEqualClicked, widget.onRightBetterClicked]
+    switchTimes = []
+    warmupNodeCount = None
+    warmupMemory = None
+    for clickIdx in range(self.PAIR_SWITCH_CLICKS):
+      if clickIdx == self.PAIR_SWITCH_WARMUP_CLICKS:
+        warmupNodeCount = slicer.mrmlScene.GetNumberOfNodes()
+        warmupMemory = self.getProcessMemory()
+      startTime = time.perf_counter()
+      clickHandlers[clickIdx % len(clickHandlers)]()
+      slicer.util.forceRenderAllViews()
+      slicer.app.processEvents()  # Deferred work such as refinement of progressive display
+      switchTimes.append(time.perf_counter() - startTime)
+
+    measuredTimes = np.array(switchTimes[self.PAIR_SWITCH_WARMUP_CLICKS:])
+    p50, p95 = np.percentile(measuredTimes, 50), np.percentile(measuredTimes, 95)
+    nodeGrowth = slicer.mrmlScene.GetNumberOfNodes() - warmupNodeCount
+    endMemory = self.getProcessMemory()
+    logging.info(f"{inputType} pair switch p50: {p50:.3f} s, p95: {p95:.3f} s, max: {measuredTimes.max():.3f} s, "
+                 f"scene node growth: {nodeGrowth}")
+
+    widget.logic.surveyStarted = False
+    widget.logic.resetScene()
+    shutil.rmtree(studyDirectory, ignore_errors=True)
+
+    self.assertEqual(widget.logic.sessionComparisonCount, self.PAIR_SWITCH_CLICKS)
+    self.assertLessEqual(p95, self.PAIR_SWITCH_LATENCY_BUDGET_P95[inputType],
+                         f"Pair switch p95 latency {p95:.3f} s is over budget")
+    self.assertLessEqual(nodeGrowth, self.NODE_GROWTH_BUDGET,
+                         f"{nodeGrowth} nodes were added to the scene after warmup")
+    if warmupMemory is not None:
+      memoryGrowthMB = (endMemory - warmupMemory) / 1024 ** 2
+      logging.info(f"{inputType} process memory growth: {memoryGrowthMB:.1f} MB")
+      self.assertLessEqual(memoryGrowthMB, self.MEMORY_GROWTH_BUDGET_MB,
+                           f"Process memory grew by {memoryGrowthMB:.1f} MB after warmup")
+
     self.delayDisplay('Test passed')
+
+
+#
+# Synthetic data and benchmarks
+#
+
+class SyntheticStudyGenerator:
+  """
+  Writes synthetic studies that follow the input conventions of this module: [patient]_[model]_[sequence].nrrd files
+  for predictions, and for 2D studies also [patient]_[sequence].nrrd ultrasound files and [patient]_[sequence]_indices.json
+  files listing the frames to compare.
+  """
+
+  def __init__(self, seed=None):
+    self.rng = np.random.default_rng(seed)
+
+  def getModelNames(self, numberOfModels):
+    return [f"Model{modelIdx:04d}" for modelIdx in range(numberOfModels)]
+
+  def getScanNames(self, numberOfScans):
+    sequenceNames = ["axial", "sagittal"]
+    return [f"{1000 + scanIdx // 2}_{sequenceNames[scanIdx % 2]}" for scanIdx in range(numberOfScans)]
+
+  def generate(self, directory, inputType="3D", numberOfModels=5, numberOfScans=4, numberOfFrames=32, frameSize=64,
+               dtype="uint8", encoding="gzip"):
+    """
+    Writes a synthetic study.
+    :param directory: output folder, created if it does not exist
+    :param inputType: "2D" for ultrasound frame sequences, "3D" for volumes
+    :param numberOfModels: number of AI models, each with a prediction for every scan
+    :param numberOfScans: number of patient_sequence scans
+    :param numberOfFrames: number of ultrasound frames in 2D scans, half of them are listed in the indices files
+    :param frameSize: size of frames in pixels, or size of 3D volumes in voxels along each axis
+    :param dtype: numpy data type of the predictions
+    :param encoding: nrrd encoding, "gzip" or "raw"
+    :returns: dict with modelNames, scanNames, files, and bytesWritten
+    """
+    os.makedirs(directory, exist_ok=True)
+    modelNames = self.getModelNames(numberOfModels)
+    scanNames = self.getScanNames(numberOfScans)
+    header = {"encoding": encoding}
+    files = []
+
+    for scanName in scanNames:
+      patientId, sequenceName = scanName.split("_")
+      if inputType == "2D":
+        ultrasoundArray = self.rng.integers(0, 256, (numberOfFrames, frameSize, frameSize, 1), dtype=np.uint8)
+        filename = os.path.join(directory, f"{scanName}.nrrd")
+        nrrd.write(filename, ultrasoundArray, header)
+        files.append(filename)
+
+        indices = sorted(self.rng.choice(numberOfFrames, max(1, numberOfFrames // 2), replace=False).tolist())
+        filename = os.path.join(directory, f"{scanName}_indices.json")
+        with open(filename, "w") as f:
+          json.dump({"indices": indices}, f)
+        files.append(filename)
+
+      for modelName in modelNames:
+        if inputType == "2D":
+          predictionArray = np.stack([self.makeBlob((frameSize, frameSize), dtype)
+                                      for _ in range(numberOfFrames)])[..., np.newaxis]
+          nrrd.write(os.path.join(directory, f"{patientId}_{modelName}_{sequenceName}.nrrd"), predictionArray, header)
+        else:
+          volumeHeader = dict(header)
+          volumeHeader["space"] = "left-posterior-superior"
+          volumeHeader["space directions"] = np.eye(3)
+          volumeHeader["space origin"] = np.zeros(3)
+          predictionArray = self.makeBlob((frameSize, frameSize, frameSize), dtype)
+          nrrd.write(os.path.join(directory, f"{patientId}_{modelName}_{sequenceName}.nrrd"), predictionArray, volumeHeader)
+        files.append(os.path.join(directory, f"{patientId}_{modelName}_{sequenceName}.nrrd"))
+
+    return {
+      "modelNames": modelNames,
+      "scanNames": scanNames,
+      "files": files,
+      "bytesWritten": sum(os.path.getsize(filename) for filename in files),
+    }
+
+  def makeBlob(self, shape, dtype):
+    """
+    Makes an ellipsoid with random center and radii, surrounded by empty margins so volumes can be cropped.
+    Intensity decreases from the center to the surface, like a prediction in the 0-255 range.
+    """
+    shape = np.array(shape)
+    center = shape / 2 + self.rng.uniform(-0.1, 0.1, len(shape)) * shape
+    radii = self.rng.uniform(0.15, 0.3, len(shape)) * shape
+    grid = np.ogrid[tuple(slice(0, size) for size in shape)]
+    distance = np.sqrt(sum(((axis - c) / r) ** 2 for axis, c, r in zip(grid, center, radii)))
+    intensity = np.clip(1.0 - distance, 0.0, 1.0)
+    return (intensity * 2 * 255).clip(0, 255).astype(dtype)
+
+
+class SegmentationComparisonBenchmark(ScriptedLoadableModuleTest):
+  """
+  Measures the time of logic operations on synthetic studies of increasing size, and writes the results in a json
+  file so they can be compared between versions. Not run by default, because the large scales take long. Run it from
+  the Python console:
+    SegmentationComparison.SegmentationComparisonBenchmark().runTest()
+  """
+
+  # Number of models, scans and comparisons for logic operations. Volumes are not loaded for these.
+  COMPARISON_SCALES = [
+    {"models": 5, "scans": 10, "comparisons": 1000},
+    {"models": 50, "scans": 50, "comparisons": 10000},
+    {"models": 1000, "scans": 100, "comparisons": 100000},
+  ]
+
+  # Synthetic studies for timing loadVolumes
+  LOAD_SCALES = [
+    {"inputType": "3D", "models": 5, "scans": 4, "frameSize": 64, "dtype": "uint8", "encoding": "gzip"},
+    {"inputType": "3D", "models": 5, "scans": 4, "frameSize": 64, "dtype": "uint8", "encoding": "raw"},
+    {"inputType": "3D", "models": 50, "scans": 2, "frameSize": 32, "dtype": "float32", "encoding": "gzip"},
+    {"inputType": "3D", "models": 1000, "scans": 1, "frameSize": 16, "dtype": "uint8", "encoding": "gzip"},
+    {"inputType": "2D", "models": 5, "scans": 2, "frames": 32, "frameSize": 64, "dtype": "uint8", "encoding": "gzip"},
+    {"inputType": "2D", "models": 5, "scans": 2, "frames": 32, "frameSize": 64, "dtype": "float64", "encoding": "raw"},
+  ]
+
+  TIME_BUDGET_SECONDS = 600  # Comparisons stop after this time at each scale, the completed number is reported
+
+  def setUp(self):
+    slicer.mrmlScene.Clear()
+    self.logic = SegmentationComparisonLogic()
+    self.logic.setDefaultParameters(self.logic.getParameterNode())
+    self.results = []
+
+  def runTest(self, outputDirectory=None):
+    """
+    :param outputDirectory: folder for the results json file, the Slicer temporary folder by default
+    """
+    self.setUp()
+    for scale in self.LOAD_SCALES:
+      self.benchmarkLoadVolumes(scale)
+    for scale in self.COMPARISON_SCALES:
+      self.benchmarkComparisons(scale)
+    resultsPath = self.saveBenchmarkResults(outputDirectory or slicer.app.temporaryPath)
+    self.delayDisplay(f"Benchmark results saved to: {resultsPath}")
+
+  def summarizeTimes(self, times):
+    times = np.array(times, dtype=float)
+    if times.size == 0:
+      return {"count": 0}
+    return {
+      "count": int(times.size),
+      "total": float(times.sum()),
+      "mean": float(times.mean()),
+      "p50": float(np.percentile(times, 50)),
+      "p95": float(np.percentile(times, 95)),
+      "max": float(times.max()),
+    }
+
+  def timeCall(self, timings, name, function, *args):
+    startTime = time.perf_counter()
+    result = function(*args)
+    timings.setdefault(name, []).append(time.perf_counter() - startTime)
+    return result
+
+  def benchmarkLoadVolumes(self, scale):
+    studyDirectory = tempfile.mkdtemp(dir=slicer.app.temporaryPath)
+    try:
+      study = SyntheticStudyGenerator(seed=0).generate(
+        studyDirectory, inputType=scale["inputType"], numberOfModels=scale["models"], numberOfScans=scale["scans"],
+        numberOfFrames=scale.get("frames", 32), frameSize=scale["frameSize"], dtype=scale["dtype"],
+        encoding=scale["encoding"])
+      self.logic.resetScene()
+      self.logic.getParameterNode().SetParameter(self.logic.INPUT_TYPE, scale["inputType"])
+      timings = {}
+      self.timeCall(timings, "loadVolumes", self.logic.loadVolumes, studyDirectory)
+      self.results.append({
+        "scenario": "loadVolumes",
+        "scale": scale,
+        "bytesOnDisk": study["bytesWritten"],
+        "operations": {name: self.summarizeTimes(times) for name, times in timings.items()},
+      })
+      logging.info(f"loadVolumes {scale}: {timings['loadVolumes'][0]:.2f} s")
+    finally:
+      self.logic.resetScene()
+      shutil.rmtree(studyDirectory, ignore_errors=True)
+
+  def benchmarkComparisons(self, scale):
+    outputDirectory = tempfile.mkdtemp(dir=slicer.app.temporaryPath)
+    try:
+      generator = SyntheticStudyGenerator(seed=0)
+      modelNames = generator.getModelNames(scale["models"])
+      scanNames = generator.getScanNames(scale["scans"])
+      scansAndModelsDict = {modelName: {scanName: 0 for scanName in scanNames} for modelName in modelNames}
+
+      self.logic.resetScene()
+      self.logic.sessionComparisonCount = 0
+      self.logic.setScansAndModelsDict(scansAndModelsDict)
+      self.logic.setSurveyHistory(None)
+      self.logic.setEloHistoryTable(None)
+      self.logic.loadSurveyTable("")
+
+      timings = {}
+      self.timeCall(timings, "updateNextPair", self.logic.updateNextPair, True)
+      startTime = time.perf_counter()
+      completedComparisons = 0
+      scores = rng.choice([1.0, 0.5, 0.0], scale["comparisons"])
+      for score in scores:
+        self.timeCall(timings, "updateComparisonData", self.logic.updateComparisonData, score)
+        self.timeCall(timings, "addRecordInTable", self.logic.addRecordInTable, score)
+        self.logic.sessionComparisonCount += 1
+        self.timeCall(timings, "updateNextPair", self.logic.updateNextPair, True)
+        completedComparisons += 1
+        if time.perf_counter() - startTime > self.TIME_BUDGET_SECONDS:
+          logging.warning(f"Time budget exceeded after {completedComparisons} comparisons at scale {scale}")
+          break
+
+      resultsSavePath = self.timeCall(timings, "saveResults", self.logic.saveResults, outputDirectory)
+
+      # Resume the same way as loading a previous session from the Elo scores file
+      timestamp = os.path.basename(resultsSavePath).split("_")[-1]
+      self.logic.resetScene()
+      self.logic.setScansAndModelsDict(scansAndModelsDict)
+      self.timeCall(timings, "setSurveyHistory", self.logic.setSurveyHistory,
+                    os.path.join(outputDirectory, "comparison_history_" + timestamp))
+      self.timeCall(timings, "setEloHistoryTable", self.logic.setEloHistoryTable,
+                    os.path.join(outputDirectory, "elo_history_" + timestamp))
+      self.timeCall(timings, "loadSurveyTable", self.logic.loadSurveyTable, resultsSavePath)
+
+      self.results.append({
+        "scenario": "comparisons",
+        "scale": scale,
+        "completedComparisons": completedComparisons,
+        "operations": {name: self.summarizeTimes(times) for name, times in timings.items()},
+      })
+      logging.info(f"Comparisons {scale}: {completedComparisons} completed in {time.perf_counter() - startTime:.1f} s")
+    finally:
+      self.logic.resetScene()
+      shutil.rmtree(outputDirectory, ignore_errors=True)
+
+  def saveBenchmarkResults(self, outputDirectory):
+    """
+    Writes the benchmark results with enough context to compare runs: Slicer version, platform,
+    and a hash of this module file to tell versions of the module apart.
+    :returns: path of the results file
+    """
+    with open(__file__, "rb") as f:
+      moduleHash = hashlib.sha256(f.read()).hexdigest()
+    timestamp = time.strftime("%Y%m%d-%H%M%S")
+    benchmarkResults = {
+      "timestamp": timestamp,
+      "slicerVersion": slicer.app.applicationVersion,
+      "slicerRevision": slicer.app.repositoryRevision,
+      "platform": platform.platform(),
+      "moduleSha256": moduleHash,
+      "results": self.results,
+    }
+    resultsPath = os.path.join(outputDirectory, f"benchmark_{timestamp}.json")
+    with open(resultsPath, "w") as f:
+      json.dump(benchmarkResults, f, indent=2)
+    return resultsPath